@@ -0,0 +1,282 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import secrets
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import redis
+from fastapi import Depends, HTTPException, status
+from fastapi.security import APIKeyHeader
+from loguru import logger
+
+from core import config
+from core.metrics import REGISTRY
+
+API_KEY_NAME = "X-API-KEY"
+CLIENT_ID_NAME = "X-CLIENT-ID"
+
+api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
+client_id_header = APIKeyHeader(name=CLIENT_ID_NAME, auto_error=False)
+
+# Registered clients: a Redis hash of client id -> JSON record holding the
+# salted key hash. Every change is published on the channel so each
+# service's cache drops the client at once instead of after its TTL.
+CLIENTS_KEY = "relic:clients"
+CLIENTS_CHANNEL = "relic:clients:changed"
+
+AUTH_LOOKUPS = REGISTRY.counter(
+    "relic_auth_lookups_total",
+    "Client credential lookups by source (bootstrap, cache, store).",
+    ("source",),
+)
+
+
+class CredentialStoreUnavailable(Exception):
+    pass
+
+
+def _text(value):
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def generate_key():
+    return secrets.token_urlsafe(32)
+
+
+def hash_key(api_key, salt=None):
+    """
+    `sha256$<salt>$<digest>`. Keys are generated with 256 bits of entropy,
+    so a fast salted hash is enough and verifying a wrong key costs
+    nothing worth attacking.
+    """
+    salt = salt or secrets.token_hex(16)
+    digest = hashlib.sha256(f"{salt}:{api_key}".encode("utf-8")).hexdigest()
+    return f"sha256${salt}${digest}"
+
+
+def check_key(api_key, key_hash):
+    """Constant-time comparison of a presented key against a stored hash."""
+    try:
+        scheme, salt, _ = key_hash.split("$")
+    except ValueError:
+        return False
+    if scheme != "sha256":
+        return False
+    return hmac.compare_digest(
+        hash_key(api_key, salt).encode("ascii"), key_hash.encode("ascii")
+    )
+
+
+def check_bootstrap(client_id, api_key):
+    """The CLIENT_ID / CLIENT_API_KEY pair from the env, or None if it isn't that client."""
+    expected = config.INGRESS_CREDENTIALS.get(client_id)
+    if expected is None:
+        return None
+    return hmac.compare_digest(api_key.encode("utf-8"), expected.encode("utf-8"))
+
+
+class ClientCache:
+    """
+    LRU of client records (or None for unknown clients) that expire after
+    `ttl_s`, or `negative_ttl_s` for unknown ones. Revocations evict an
+    entry early; the TTL bounds how stale an entry can get if one is missed.
+    """
+
+    def __init__(self, max_entries, ttl_s, negative_ttl_s):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.negative_ttl_s = negative_ttl_s
+        self.entries = OrderedDict()
+        # Bumped by every eviction so a lookup racing one isn't cached
+        self.generation = 0
+
+    def get(self, client_id):
+        """(hit, record)."""
+        entry = self.entries.get(client_id)
+        if entry is not None:
+            expires, record = entry
+            if time.monotonic() < expires:
+                self.entries.move_to_end(client_id)
+                return True, record
+            del self.entries[client_id]
+        return False, None
+
+    def put(self, client_id, record, generation):
+        if generation != self.generation:
+            return
+        ttl = self.ttl_s if record is not None else self.negative_ttl_s
+        self.entries[client_id] = (time.monotonic() + ttl, record)
+        self.entries.move_to_end(client_id)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def evict(self, client_id=None):
+        """Drops one client, or every client when `client_id` is None."""
+        self.generation += 1
+        if client_id is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(client_id, None)
+
+
+class ClientRegistry:
+    """
+    Verifies ingress clients against the registered ones in Redis. Known
+    clients are served from an in-process cache, so the hot path costs a
+    hash and a comparison, no round trip. A subscriber task evicts clients
+    as they are revoked or rotated; it starts with the first lookup.
+
+    Pass the service's own async Redis client as `conn`, or leave it None
+    to open a connection on first use.
+    """
+
+    def __init__(
+        self,
+        conn=None,
+        max_entries=config.AUTH_CACHE_SIZE,
+        ttl_s=config.AUTH_CACHE_TTL_S,
+        negative_ttl_s=config.AUTH_NEGATIVE_TTL_S,
+    ):
+        self.conn = conn
+        self.cache = ClientCache(max_entries, ttl_s, negative_ttl_s)
+        self._listener = None
+
+    async def _redis(self):
+        if self.conn is None:
+            from core.stores.redis import async_connect
+
+            connection = await async_connect(
+                config.REDIS_HOST, config.REDIS_PORT, max_connections=4
+            )
+            if connection is None:
+                raise CredentialStoreUnavailable("Redis is unreachable")
+            self.conn = connection.conn
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+        return self.conn
+
+    async def _listen(self):
+        while True:
+            pubsub = self.conn.pubsub()
+            try:
+                await pubsub.subscribe(CLIENTS_CHANNEL)
+                # Anything may have changed while we weren't subscribed
+                self.cache.evict()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.cache.evict(_text(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Client revocation feed lost ({e}); resubscribing.")
+                self.cache.evict()
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    async def lookup(self, client_id):
+        """The client's record, or None if it isn't registered."""
+        hit, record = self.cache.get(client_id)
+        if hit:
+            AUTH_LOOKUPS.inc(source="cache")
+            return record
+        AUTH_LOOKUPS.inc(source="store")
+        generation = self.cache.generation
+        try:
+            conn = await self._redis()
+            raw = await conn.hget(CLIENTS_KEY, client_id)
+        except (redis.exceptions.RedisError, OSError) as e:
+            raise CredentialStoreUnavailable(str(e))
+        record = json.loads(raw) if raw else None
+        self.cache.put(client_id, record, generation)
+        return record
+
+    async def verify(self, client_id, api_key):
+        if not client_id or not api_key:
+            return False
+        bootstrap = check_bootstrap(client_id, api_key)
+        if bootstrap is not None:
+            AUTH_LOOKUPS.inc(source="bootstrap")
+            return bootstrap
+        record = await self.lookup(client_id)
+        return record is not None and check_key(api_key, record["key_hash"])
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+
+
+def make_is_auth(on_failure=None, registry=None):
+    """
+    FastAPI dependency checking the client id / API key headers against
+    the bootstrap INGRESS_CREDENTIALS and the registered clients. Returns
+    the client id; `on_failure()` runs before a rejected request gets its
+    401 (e.g. to count it).
+    """
+    registry = registry or ClientRegistry()
+
+    async def is_auth(
+        api_key: str = Depends(api_key_header),
+        client_id: str = Depends(client_id_header),
+    ):
+        try:
+            if await registry.verify(client_id, api_key):
+                return client_id
+        except CredentialStoreUnavailable as e:
+            logger.error(f"Cannot verify client {client_id!r}: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Credential store unavailable.",
+                headers={"Retry-After": "5"},
+            )
+        if on_failure:
+            on_failure()
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid Client ID or API Key",
+        )
+
+    return is_auth
+
+
+# --- Administration (devtools/clients.py), on a synchronous Redis client ---
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def register_client(conn, client_id, label="", api_key=None):
+    """Registers a client, or replaces its key. Returns the (new) API key."""
+    api_key = api_key or generate_key()
+    existing = conn.hget(CLIENTS_KEY, client_id)
+    record = json.loads(existing) if existing else {"created_at": _now()}
+    if existing:
+        record["rotated_at"] = _now()
+    record["key_hash"] = hash_key(api_key)
+    record["label"] = label or record.get("label", "")
+    pipe = conn.pipeline()
+    pipe.hset(CLIENTS_KEY, client_id, json.dumps(record))
+    pipe.publish(CLIENTS_CHANNEL, client_id)
+    pipe.execute()
+    return api_key
+
+
+def revoke_client(conn, client_id):
+    """Removes a client; services drop it from their caches at once."""
+    pipe = conn.pipeline()
+    pipe.hdel(CLIENTS_KEY, client_id)
+    pipe.publish(CLIENTS_CHANNEL, client_id)
+    removed, _ = pipe.execute()
+    return bool(removed)
+
+
+def list_clients(conn):
+    """{client_id: record} without the key hashes."""
+    return {
+        _text(client_id): {k: v for k, v in json.loads(raw).items() if k != "key_hash"}
+        for client_id, raw in conn.hgetall(CLIENTS_KEY).items()
+    }
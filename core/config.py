@@ -5,14 +5,108 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
-INGRESS_CREDENTIALS = {os.getenv("CLIENT_ID"): os.getenv("CLIENT_API_KEY")}
+# Bootstrap client from the env; register the rest with devtools/clients.py
+_client_id, _api_key = os.getenv("CLIENT_ID"), os.getenv("CLIENT_API_KEY")
+INGRESS_CREDENTIALS = {_client_id: _api_key} if _client_id and _api_key else {}
+# In-process cache of registered clients (entries, seconds; unknown ids
+# are remembered for AUTH_NEGATIVE_TTL_S)
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", 10000))
+AUTH_CACHE_TTL_S = float(os.getenv("AUTH_CACHE_TTL_S", 300))
+AUTH_NEGATIVE_TTL_S = float(os.getenv("AUTH_NEGATIVE_TTL_S", 10))
+
 REDIS_HOST = os.getenv("REDIS_HOST")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+
+# "list" (RPUSH/BLPOP) or "stream" (XADD/XREADGROUP with acks)
+QUEUE_BACKEND = os.getenv("QUEUE_BACKEND", "list")
+QUEUE_NAME = os.getenv(
+    "QUEUE_NAME", "hub-stream" if QUEUE_BACKEND == "stream" else "hub-inbox"
+)
+STREAM_GROUP = os.getenv("STREAM_GROUP", "pipeline")
+STREAM_CLAIM_IDLE_MS = int(os.getenv("STREAM_CLAIM_IDLE_MS", 60000))
+
+# With more than one worker, metrics are kept in PROMETHEUS_MULTIPROC_DIR
+# (a fresh temp dir when unset) and summed over the workers on /metrics
+INGRESS_WORKERS = int(os.getenv("INGRESS_WORKERS", 1))
+INGRESS_MAX_BATCH_ITEMS = int(os.getenv("INGRESS_MAX_BATCH_ITEMS", 1000))
+# Upper bound on a request body, after gzip/zstd decoding (/upload uses
+# BLOB_MAX_BYTES instead)
+INGRESS_MAX_BODY_BYTES = int(os.getenv("INGRESS_MAX_BODY_BYTES", 10 * 1024 * 1024))
+# Per-client token bucket (datums/s and burst; 0 disables), with
+# `client:rate:burst,...` overrides
+RATE_LIMIT_PER_S = float(os.getenv("RATE_LIMIT_PER_S", 20))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", 200))
+RATE_LIMIT_OVERRIDES = os.getenv("RATE_LIMIT_OVERRIDES", "")
+# Ingress answers 503 once this many messages await the pipeline (0 = no limit)
+QUEUE_HIGH_WATER = int(os.getenv("QUEUE_HIGH_WATER", 100000))
+BACKPRESSURE_RETRY_AFTER_S = float(os.getenv("BACKPRESSURE_RETRY_AFTER_S", 30))
+QUEUE_DEPTH_CACHE_MS = int(os.getenv("QUEUE_DEPTH_CACHE_MS", 250))
+# Queue messages at least this large are stored gzipped (0 = never)
+QUEUE_COMPRESS_MIN_BYTES = int(os.getenv("QUEUE_COMPRESS_MIN_BYTES", 0))
+# Queue message format: "binary" datum envelope, or "json" for older pipelines
+QUEUE_CODEC = os.getenv("QUEUE_CODEC", "binary")
+# Content-addressed store for /upload media, shared by ingress and pipeline
+BLOB_STORE_PATH = os.getenv("BLOB_STORE_PATH", "core/stores/data/blobs")
+BLOB_MAX_BYTES = int(os.getenv("BLOB_MAX_BYTES", 200 * 1024 * 1024))
+
+# Read API over datum/engram (core/services/data-api)
+DATA_API_PORT = int(os.getenv("DATA_API_PORT", 8001))
+DATA_API_MAX_PAGE = int(os.getenv("DATA_API_MAX_PAGE", 1000))
+
+# RAG service (core/services/rag). Models are a built-in name or module:factory
+RAG_PORT = int(os.getenv("RAG_PORT", 8002))
+RAG_LLM = os.getenv("RAG_LLM", "gemini")
+RAG_LLM_MODEL = os.getenv("RAG_LLM_MODEL", "gemini-2.0-flash")
+# Query embedder for vector retrieval ("none" disables it)
+RAG_EMBEDDER = os.getenv("RAG_EMBEDDER", "none")
+RAG_EMBEDDING_MODEL = os.getenv("RAG_EMBEDDING_MODEL", "embedding-001")
+RAG_GRAPH = os.getenv("RAG_GRAPH", "false").lower() == "true"
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", 8))
+# Retrievers slower than this are left out of the answer
+RAG_RETRIEVAL_TIMEOUT_S = float(os.getenv("RAG_RETRIEVAL_TIMEOUT_S", 0.5))
+RAG_CONTEXT_CHARS = int(os.getenv("RAG_CONTEXT_CHARS", 6000))
+RAG_CACHE_SIZE = int(os.getenv("RAG_CACHE_SIZE", 256))
+RAG_CACHE_TTL_S = int(os.getenv("RAG_CACHE_TTL_S", 3600))
+
+# Ingest dedup: "drop" exact repeats, "flag" them for the pipeline, or "off"
+DEDUP_MODE = os.getenv("DEDUP_MODE", "drop")
+DEDUP_TTL_S = int(os.getenv("DEDUP_TTL_S", 7 * 86400))
+# Max simhash bit distance for two texts to count as near duplicates (0-3:
+# fingerprints are split into 4 bands, which only catches up to 3 bits)
+DEDUP_NEAR_DISTANCE = int(os.getenv("DEDUP_NEAR_DISTANCE", 3))
+# data_json fields that vary between saves of the same content
+DEDUP_IGNORE_FIELDS = os.getenv(
+    "DEDUP_IGNORE_FIELDS", "device,location,timestamp,client_ts"
+).split(",")
 
 GRAPHITI_LLM_API_KEY = os.getenv("GRAPHITI_LLM_API_KEY")
 NEO4J_URI = os.getenv("NEO4J_URI")
 NEO4J_USER = os.getenv("NEO4J_USER")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+# Bulk replay ingestion into Graphiti
+GRAPHITI_CONCURRENCY = int(os.getenv("GRAPHITI_CONCURRENCY", 4))
+GRAPHITI_LLM_RPM = float(os.getenv("GRAPHITI_LLM_RPM", 60))
+GRAPHITI_EMBED_RPM = float(os.getenv("GRAPHITI_EMBED_RPM", 300))
+# Content-addressed cache for LLM/embedding calls: sqlite, redis or none
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "sqlite")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "core/stores/data/llm_cache.db")
+LLM_CACHE_MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", 512))
+LLM_CACHE_MAX_AGE_DAYS = int(os.getenv("LLM_CACHE_MAX_AGE_DAYS", 30))
+# Local engram vector index (core/stores/vectors.py)
+VECTOR_INDEX_PATH = os.getenv("VECTOR_INDEX_PATH", "core/stores/data/vectors")
+VECTOR_INDEX_NPROBE = int(os.getenv("VECTOR_INDEX_NPROBE", 8))
+
+# Record store for the pipeline and data API: postgres, or sqlite for a
+# single node without a database server
+STORE_BACKEND = os.getenv("STORE_BACKEND", "postgres")
+SQLITE_PATH = os.getenv("SQLITE_PATH", "core/stores/data/relic.db")
+SQLITE_READERS = int(os.getenv("SQLITE_READERS", 4))
+SQLITE_CACHE_MB = int(os.getenv("SQLITE_CACHE_MB", 64))
+SQLITE_MMAP_MB = int(os.getenv("SQLITE_MMAP_MB", 256))
+# NORMAL is safe in WAL mode (a power cut can only lose the last commits);
+# FULL also syncs the WAL on every commit
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
 
 POSTGRES_USER = os.getenv("POSTGRES_USER")
 POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
@@ -20,3 +114,55 @@ POSTGRES_DB = os.getenv("POSTGRES_DB", "relic")
 POSTGRES_HOST = os.getenv("POSTGRES_HOST", "postgres")
 POSTGRES_PORT = os.getenv("POSTGRES_PORT", 5432)
 POSTGRES_CONNECTION_STRING = os.getenv("POSTGRES_CONNECTION_STRING")
+POSTGRES_POOL_MIN = int(os.getenv("POSTGRES_POOL_MIN", 1))
+POSTGRES_POOL_MAX = int(os.getenv("POSTGRES_POOL_MAX", 10))
+POSTGRES_RETRIES = int(os.getenv("POSTGRES_RETRIES", 5))
+POSTGRES_BACKOFF_BASE = float(os.getenv("POSTGRES_BACKOFF_BASE", 0.2))
+POSTGRES_BACKOFF_MAX = float(os.getenv("POSTGRES_BACKOFF_MAX", 10))
+# Range-partition datum/engram by month on unix_ts (applies when tables are created)
+POSTGRES_PARTITIONED = os.getenv("POSTGRES_PARTITIONED", "false").lower() == "true"
+POSTGRES_PARTITION_MONTHS_AHEAD = int(os.getenv("POSTGRES_PARTITION_MONTHS_AHEAD", 3))
+# Detach partitions older than this many months; 0 keeps everything attached
+POSTGRES_PARTITION_RETENTION_MONTHS = int(
+    os.getenv("POSTGRES_PARTITION_RETENTION_MONTHS", 0)
+)
+PARTITION_MAINTENANCE_INTERVAL_S = int(
+    os.getenv("PARTITION_MAINTENANCE_INTERVAL_S", 3600)
+)
+# Connections idle longer than this are pinged before being handed out
+POSTGRES_HEALTHCHECK_IDLE_S = float(os.getenv("POSTGRES_HEALTHCHECK_IDLE_S", 30))
+# Text search configuration for the full-text index ("simple" doesn't stem,
+# so mixed-language notes match as typed); fixed when the column is created
+POSTGRES_FTS_CONFIG = os.getenv("POSTGRES_FTS_CONFIG", "simple")
+
+PIPELINE_BATCH_SIZE = int(os.getenv("PIPELINE_BATCH_SIZE", 100))
+PIPELINE_LINGER_MS = int(os.getenv("PIPELINE_LINGER_MS", 50))
+PIPELINE_METRICS_PORT = int(os.getenv("PIPELINE_METRICS_PORT", 9100))
+# Failed messages are retried with exponential backoff from a Redis sorted
+# set; after PIPELINE_MAX_ATTEMPTS they go to the dead-letter stream
+PIPELINE_MAX_ATTEMPTS = int(os.getenv("PIPELINE_MAX_ATTEMPTS", 5))
+PIPELINE_RETRY_BASE_S = float(os.getenv("PIPELINE_RETRY_BASE_S", 5))
+PIPELINE_RETRY_MAX_S = float(os.getenv("PIPELINE_RETRY_MAX_S", 3600))
+PIPELINE_RETRY_POLL_MS = int(os.getenv("PIPELINE_RETRY_POLL_MS", 1000))
+PIPELINE_RETRY_BATCH = int(os.getenv("PIPELINE_RETRY_BATCH", 500))
+# While the store is unreachable, messages go back to the queue without
+# using an attempt and reading pauses: PIPELINE_RETRY_BASE_S doubling up
+# to this many seconds
+PIPELINE_OUTAGE_MAX_S = float(os.getenv("PIPELINE_OUTAGE_MAX_S", 60))
+# Async worker (main.py --async): messages in flight per process, collectors
+# whose messages must be processed in queue order ("*" for all), and how
+# long shutdown waits for in-flight messages
+PIPELINE_CONCURRENCY = int(os.getenv("PIPELINE_CONCURRENCY", 32))
+PIPELINE_ORDERED_COLLECTORS = os.getenv("PIPELINE_ORDERED_COLLECTORS", "")
+PIPELINE_DRAIN_TIMEOUT_S = float(os.getenv("PIPELINE_DRAIN_TIMEOUT_S", 30))
+
+# Comma-separated enricher names, run as a DAG (see core/pipeline/enrichment)
+PIPELINE_ENRICHERS = [
+    e.strip()
+    for e in os.getenv(
+        "PIPELINE_ENRICHERS", "url_extraction,language_detection,ner,summary,media"
+    ).split(",")
+    if e.strip()
+]
+# Process pool size for enrichers marked cpu_bound; 0 runs them inline
+ENRICHMENT_WORKERS = int(os.getenv("ENRICHMENT_WORKERS", 2))
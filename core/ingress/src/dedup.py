@@ -0,0 +1,297 @@
+import hashlib
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from core import config
+from core.pipeline.enrichment.base import iter_text
+
+URL_RE = re.compile(r"https?://\S+", re.IGNORECASE)
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# Query parameters that differ between shares of the same link
+TRACKING_PARAMS = re.compile(r"^(utm_\w+|fbclid|gclid|igshid|mc_cid|mc_eid|si|ref)$")
+SIMHASH_BITS = 64
+BANDS = 4
+BAND_BITS = SIMHASH_BITS // BANDS
+# Texts shorter than this (in tokens) are too small to fingerprint reliably
+MIN_SIMHASH_TOKENS = 8
+
+
+def normalise_url(url):
+    """Lowercases scheme/host and drops fragments, tracking params and trailing slashes."""
+    parts = urlsplit(url.rstrip(".,;:"))
+    query = [(k, v) for k, v in parse_qsl(parts.query) if not TRACKING_PARAMS.match(k)]
+    path = parts.path.rstrip("/")
+    return urlunsplit(
+        (parts.scheme.lower(), parts.netloc.lower(), path, urlencode(sorted(query)), "")
+    )
+
+
+def normalise(value, ignore=()):
+    """
+    Canonical form of a data_json value: top-level keys in `ignore` dropped
+    (device, location...), whitespace collapsed and URLs normalised, so the
+    same content saved from different devices compares equal.
+    """
+    if isinstance(value, dict):
+        return {k: normalise(v) for k, v in value.items() if k not in ignore}
+    if isinstance(value, list):
+        return [normalise(v) for v in value]
+    if isinstance(value, str):
+        text = " ".join(value.split())
+        return URL_RE.sub(lambda m: normalise_url(m.group(0)), text)
+    return value
+
+
+def content_hash(data_json, ignore=config.DEDUP_IGNORE_FIELDS):
+    canonical = json.dumps(
+        normalise(data_json, set(ignore)),
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def simhash(text):
+    """
+    64-bit simhash over word tokens, or None for very short texts. Single
+    words rather than shingles: quicklogs are short, and one edited word
+    should only move the fingerprint by a few bits.
+    """
+    tokens = [t.lower() for t in TOKEN_RE.findall(text)]
+    if len(tokens) < MIN_SIMHASH_TOKENS:
+        return None
+    weights = [0] * SIMHASH_BITS
+    for token in tokens:
+        h = int.from_bytes(
+            hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big"
+        )
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit, w in enumerate(weights) if w > 0)
+
+
+def bands(fingerprint):
+    """
+    Splits a fingerprint into BANDS chunks. Fingerprints within BANDS - 1
+    bits of each other always share at least one chunk.
+    """
+    mask = (1 << BAND_BITS) - 1
+    return [(fingerprint >> (i * BAND_BITS)) & mask for i in range(BANDS)]
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+@dataclass
+class DedupResult:
+    # "new", "duplicate" (drop, already queued) or "flagged" (queue with meta)
+    status: str
+    duplicate_of: str = None
+    reason: str = None
+    meta: dict = field(default_factory=dict)
+
+
+class Deduplicator:
+    """
+    Redis-backed seen-sets for ingress. Idempotency keys and exact content
+    hashes are TTL'd keys set with SET NX, so the first writer wins without
+    a separate lookup. Near duplicates are found by simhash banding: each
+    fingerprint is added to BANDS sorted sets scored by insert time, and
+    candidates from the last `ttl_s` sharing a band within `near_distance`
+    bits are flagged for the pipeline. Older entries are trimmed on write.
+
+    With mode "drop" exact repeats are not enqueued; with "flag" they are
+    enqueued with `meta["duplicate_of"]` so the pipeline can skip them.
+    """
+
+    def __init__(
+        self,
+        connection,
+        ttl_s=config.DEDUP_TTL_S,
+        mode=config.DEDUP_MODE,
+        near_distance=config.DEDUP_NEAR_DISTANCE,
+        ignore=config.DEDUP_IGNORE_FIELDS,
+        prefix="dedup:",
+    ):
+        if not 0 <= near_distance <= BANDS - 1:
+            # Banding only guarantees a shared band up to BANDS - 1 bits
+            raise ValueError(
+                f"near_distance must be between 0 and {BANDS - 1}, got {near_distance}"
+            )
+        self.conn = connection
+        self.ttl_s = ttl_s
+        self.mode = mode
+        self.near_distance = near_distance
+        self.ignore = set(ignore)
+        self.prefix = prefix
+
+    def _decode(self, value):
+        return value.decode() if isinstance(value, bytes) else value
+
+    def _band_keys(self, fingerprint):
+        return [
+            f"{self.prefix}near:{i}:{value:04x}"
+            for i, value in enumerate(bands(fingerprint))
+        ]
+
+    async def _claim_many(self, claims):
+        """
+        SET NX for (key, uuid) pairs in one round trip, in order. Returns
+        None per claimed key, else the uuid that holds it.
+        """
+        if not claims:
+            return []
+        pipe = self.conn.pipeline(transaction=False)
+        for key, uuid in claims:
+            pipe.set(key, uuid, nx=True, ex=self.ttl_s)
+            pipe.get(key)
+        replies = await pipe.execute()
+        return [
+            None if claimed else self._decode(existing)
+            for claimed, existing in zip(replies[::2], replies[1::2])
+        ]
+
+    def _closest(self, fingerprint, candidates):
+        """(uuid, distance) of the nearest (fingerprint, uuid) within near_distance."""
+        best = None
+        for other_fp, other_uuid in candidates:
+            distance = hamming(fingerprint, other_fp)
+            if distance <= self.near_distance and (best is None or distance < best[1]):
+                best = (other_uuid, distance)
+        return best
+
+    async def check(self, datum, client_id=None, idempotency_key=None):
+        return (await self.check_batch([(datum, idempotency_key)], client_id))[0]
+
+    async def check_batch(self, items, client_id=None):
+        """
+        `check` for (datum, idempotency_key) pairs, in a few pipelined round
+        trips for the whole list instead of several per datum. Items are
+        judged in order, so repeats within the list are caught as well.
+        """
+        if self.mode == "off":
+            return [DedupResult("new") for _ in items]
+        results = [None] * len(items)
+
+        idem_keys = {
+            i: f"{self.prefix}idem:{client_id}:{key}"
+            for i, (_, key) in enumerate(items)
+            if key
+        }
+        originals = await self._claim_many(
+            [(key, items[i][0].uuid) for i, key in idem_keys.items()]
+        )
+        for i, original in zip(idem_keys, originals):
+            if original:
+                results[i] = DedupResult("duplicate", original, "idempotency_key")
+
+        pending = [i for i, result in enumerate(results) if result is None]
+        metas = {}
+        for i in pending:
+            metas[i] = {
+                "content_hash": content_hash(items[i][0].data_json, self.ignore)
+            }
+        originals = await self._claim_many(
+            [
+                (f"{self.prefix}hash:{metas[i]['content_hash']}", items[i][0].uuid)
+                for i in pending
+            ]
+        )
+        # Idempotency keys to point at the kept datum, so a retry resolves to it
+        repoint = []
+        fingerprints = {}
+        for i, original in zip(pending, originals):
+            meta = metas[i]
+            if original and self.mode == "drop":
+                if i in idem_keys:
+                    repoint.append((idem_keys[i], original))
+                results[i] = DedupResult("duplicate", original, "content_hash", meta)
+            elif original:
+                meta["duplicate_of"] = original
+                results[i] = DedupResult("flagged", original, "content_hash", meta)
+            else:
+                fingerprint = simhash(
+                    "\n".join(iter_text(normalise(items[i][0].data_json, self.ignore)))
+                )
+                if fingerprint is None:
+                    results[i] = DedupResult("new", meta=meta)
+                else:
+                    meta["simhash"] = f"{fingerprint:016x}"
+                    fingerprints[i] = fingerprint
+
+        now = time.time()
+        members = []
+        if fingerprints:
+            pipe = self.conn.pipeline(transaction=False)
+            for fingerprint in fingerprints.values():
+                for key in self._band_keys(fingerprint):
+                    pipe.zrangebyscore(key, now - self.ttl_s, "+inf")
+            members = await pipe.execute()
+
+        pipe = self.conn.pipeline(transaction=False)
+        for key, original in repoint:
+            pipe.set(key, original, xx=True, keepttl=True)
+        earlier = []
+        for n, (i, fingerprint) in enumerate(fingerprints.items()):
+            candidates = list(earlier)
+            for member in set().union(*members[n * BANDS : (n + 1) * BANDS]):
+                other_fp, other_uuid = self._decode(member).split(":", 1)
+                candidates.append((int(other_fp, 16), other_uuid))
+            uuid = items[i][0].uuid
+            near = self._closest(fingerprint, candidates)
+            earlier.append((fingerprint, uuid))
+            for key in self._band_keys(fingerprint):
+                pipe.zadd(key, {f"{fingerprint:016x}:{uuid}": now})
+                pipe.zremrangebyscore(key, "-inf", now - self.ttl_s)
+                pipe.expire(key, self.ttl_s)
+            meta = metas[i]
+            if near:
+                meta["near_duplicate_of"], meta["near_distance"] = near
+                results[i] = DedupResult("flagged", near[0], "near_duplicate", meta)
+            else:
+                results[i] = DedupResult("new", meta=meta)
+        if repoint or fingerprints:
+            await pipe.execute()
+        return results
+
+    async def forget(self, datum, client_id=None, idempotency_key=None):
+        """Releases the keys claimed for a datum that could not be enqueued."""
+        await self.forget_batch([(datum, idempotency_key)], client_id)
+
+    async def forget_batch(self, items, client_id=None):
+        """`forget` for (datum, idempotency_key) pairs, in two round trips."""
+        if self.mode == "off" or not items:
+            return
+        owned = []
+        for datum, idempotency_key in items:
+            owned.append(
+                (
+                    f"{self.prefix}hash:{content_hash(datum.data_json, self.ignore)}",
+                    datum.uuid,
+                )
+            )
+            if idempotency_key:
+                owned.append(
+                    (f"{self.prefix}idem:{client_id}:{idempotency_key}", datum.uuid)
+                )
+        pipe = self.conn.pipeline(transaction=False)
+        for key, _ in owned:
+            pipe.get(key)
+        holders = await pipe.execute()
+
+        pipe = self.conn.pipeline(transaction=False)
+        for (key, uuid), holder in zip(owned, holders):
+            # Only release keys this datum claimed, not an earlier original's
+            if self._decode(holder) == uuid:
+                pipe.delete(key)
+        for datum, _ in items:
+            if "simhash" in datum.meta:
+                member = f"{datum.meta['simhash']}:{datum.uuid}"
+                for key in self._band_keys(int(datum.meta["simhash"], 16)):
+                    pipe.zrem(key, member)
+        await pipe.execute()
@@ -0,0 +1,189 @@
+import zlib
+
+from starlette.responses import JSONResponse
+
+from core import config
+
+SUPPORTED_ENCODINGS = ("gzip", "zstd", "identity")
+# Read size when inflating zstd bodies
+ZSTD_READ_SIZE = 65536
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+class _IdentityDecoder:
+    """Plain bodies of unknown length (chunked), counted against `limit`."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.size = 0
+
+    def feed(self, chunk):
+        self.size += len(chunk)
+        if self.size > self.limit:
+            raise BodyTooLarge()
+        return chunk
+
+    def finish(self):
+        return b""
+
+
+class _GzipDecoder:
+    """Incremental gzip inflate that never produces more than `limit` bytes."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.size = 0
+        self.inflate = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def feed(self, chunk):
+        out = self.inflate.decompress(chunk, self.limit - self.size + 1)
+        self.size += len(out)
+        if self.size > self.limit or self.inflate.unconsumed_tail:
+            raise BodyTooLarge()
+        return out
+
+    def finish(self):
+        if not self.inflate.eof:
+            raise zlib.error("truncated gzip stream")
+        return b""
+
+
+class _ZstdDecoder:
+    """
+    zstd has no bounded incremental API in `zstandard`, so the (small)
+    compressed body is buffered and then read back through a bounded
+    stream reader.
+    """
+
+    def __init__(self, limit):
+        import zstandard
+
+        self.zstandard = zstandard
+        self.limit = limit
+        self.compressed = []
+
+    def feed(self, chunk):
+        self.compressed.append(chunk)
+        return b""
+
+    def finish(self):
+        reader = self.zstandard.ZstdDecompressor().stream_reader(
+            b"".join(self.compressed)
+        )
+        out = []
+        size = 0
+        while chunk := reader.read(ZSTD_READ_SIZE):
+            size += len(chunk)
+            if size > self.limit:
+                raise BodyTooLarge()
+            out.append(chunk)
+        return b"".join(out)
+
+
+def _error(status_code, detail):
+    return JSONResponse({"detail": detail}, status_code=status_code)
+
+
+class DecompressionMiddleware:
+    """
+    ASGI middleware that inflates `Content-Encoding: gzip`/`zstd` request
+    bodies as they are received, rejecting bodies larger than `max_bytes`
+    (413), decoded or not. Routes in `exempt_paths` enforce their own limit
+    and get plain bodies streamed through uncapped. Every request also gets
+    `request.state.wire_bytes` (bytes received) and
+    `request.state.body_bytes` (decoded size), so handlers can account for
+    payload size without re-serialising.
+    """
+
+    def __init__(self, app, max_bytes=config.INGRESS_MAX_BODY_BYTES, exempt_paths=()):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.exempt_paths = frozenset(exempt_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        state = scope.setdefault("state", {})
+        state["wire_bytes"] = state["body_bytes"] = 0
+        headers = [(k, v) for k, v in scope["headers"] if k != b"content-encoding"]
+        request_headers = dict(scope["headers"])
+        encoding = request_headers.get(b"content-encoding", b"identity")
+        encoding = encoding.decode("latin-1").strip().lower()
+        length = request_headers.get(b"content-length", b"")
+        length = int(length) if length.isdigit() else None
+        exempt = scope["path"] in self.exempt_paths
+
+        if encoding == "identity" and not exempt and (length or 0) > self.max_bytes:
+            return await _error(413, f"Body exceeds {self.max_bytes} bytes.")(
+                scope, receive, send
+            )
+        # The server holds a plain body to its Content-Length, so only
+        # chunked ones are buffered below to enforce the limit
+        if encoding == "identity" and (exempt or length is not None):
+
+            async def counting_receive():
+                message = await receive()
+                if message["type"] == "http.request":
+                    size = len(message.get("body", b""))
+                    state["wire_bytes"] += size
+                    state["body_bytes"] += size
+                return message
+
+            return await self.app(scope, counting_receive, send)
+
+        if encoding not in SUPPORTED_ENCODINGS:
+            return await _error(415, f"Unsupported Content-Encoding: {encoding}")(
+                scope, receive, send
+            )
+        decoders = {
+            "identity": _IdentityDecoder,
+            "gzip": _GzipDecoder,
+            "zstd": _ZstdDecoder,
+        }
+        try:
+            decoder = decoders[encoding](self.max_bytes)
+        except ImportError:
+            return await _error(415, "zstd bodies need the 'zstandard' package")(
+                scope, receive, send
+            )
+
+        parts = []
+        try:
+            more = True
+            while more:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    return
+                chunk = message.get("body", b"")
+                state["wire_bytes"] += len(chunk)
+                if state["wire_bytes"] > self.max_bytes:
+                    raise BodyTooLarge()
+                parts.append(decoder.feed(chunk))
+                more = message.get("more_body", False)
+            parts.append(decoder.finish())
+        except BodyTooLarge:
+            return await _error(413, f"Body exceeds {self.max_bytes} bytes.")(
+                scope, receive, send
+            )
+        except Exception as e:
+            return await _error(400, f"Invalid {encoding} body: {e}")(
+                scope, receive, send
+            )
+
+        body = b"".join(parts)
+        state["body_bytes"] = len(body)
+        headers = [(k, v) for k, v in headers if k != b"content-length"]
+        headers.append((b"content-length", str(len(body)).encode()))
+        sent = False
+
+        async def replay_receive():
+            nonlocal sent
+            if sent:
+                return await receive()
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        await self.app({**scope, "headers": headers}, replay_receive, send)
@@ -0,0 +1,153 @@
+import math
+import time
+from dataclasses import dataclass
+
+from core import config
+
+# Token bucket refilled at ARGV[1] tokens/s up to ARGV[2], charged ARGV[3].
+# Runs atomically in Redis on the server clock, so every ingress worker
+# shares one bucket per client. A request is admitted if the bucket holds
+# min(cost, capacity) tokens; large batches may drive it negative, and the
+# client then waits off the debt. Returns {allowed, tokens, retry_after}
+# with floats as strings (Lua numbers are truncated to integers on return).
+TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= math.min(cost, capacity) then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (math.min(cost, capacity) - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil((capacity - math.min(tokens, 0)) / rate) + 1)
+return {allowed, tostring(tokens), tostring(retry_after)}
+"""
+
+
+def parse_overrides(value):
+    """`client:rate:burst,...` -> {client: (rate, burst)}."""
+    overrides = {}
+    for item in value.split(","):
+        if item.strip():
+            client, rate, burst = item.strip().rsplit(":", 2)
+            overrides[client] = (float(rate), float(burst))
+    return overrides
+
+
+@dataclass
+class LimitResult:
+    allowed: bool
+    # 429 (client over its rate) or 503 (pipeline behind) when not allowed
+    status_code: int = 200
+    retry_after_s: float = 0.0
+    reason: str = None
+    tokens: float = None
+
+    @property
+    def headers(self):
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after_s)))}
+
+
+class Limiter:
+    """
+    Admission control for ingress: a per-client token bucket (429) and a
+    queue-depth high-water mark (503), checked before anything is queued so
+    a stalled pipeline or a runaway collector is pushed back to the client
+    instead of into Redis memory.
+
+    The queue depth is read at most every `depth_ttl_s` per worker, so
+    checking it costs no extra round trip per request under load. Redis
+    errors fail open: enqueueing will surface a real outage anyway.
+    """
+
+    def __init__(
+        self,
+        connection,
+        rate=config.RATE_LIMIT_PER_S,
+        burst=config.RATE_LIMIT_BURST,
+        overrides=config.RATE_LIMIT_OVERRIDES,
+        high_water=config.QUEUE_HIGH_WATER,
+        retry_after_s=config.BACKPRESSURE_RETRY_AFTER_S,
+        depth_ttl_s=config.QUEUE_DEPTH_CACHE_MS / 1000,
+        prefix="ratelimit:",
+    ):
+        self.connection = connection
+        self.rate = rate
+        self.burst = burst
+        self.overrides = parse_overrides(overrides)
+        self.high_water = high_water
+        self.retry_after_s = retry_after_s
+        self.depth_ttl_s = depth_ttl_s
+        self.prefix = prefix
+        self._script = connection.conn.register_script(TOKEN_BUCKET_LUA)
+        self._depth = (0.0, 0)
+
+    def limits_for(self, client_id):
+        """(tokens per second, burst) for a client; a rate of 0 disables its limit."""
+        return self.overrides.get(client_id, (self.rate, self.burst))
+
+    async def queue_depth(self, queue=config.QUEUE_NAME):
+        checked, depth = self._depth
+        if time.monotonic() - checked > self.depth_ttl_s:
+            depth = await self.connection.consumer_lag(queue, config.STREAM_GROUP)
+            self._depth = (time.monotonic(), depth)
+        return depth
+
+    async def check(self, client_id, cost=1):
+        rate, burst = self.limits_for(client_id)
+        try:
+            if self.high_water and await self.queue_depth() >= self.high_water:
+                return LimitResult(False, 503, self.retry_after_s, "queue_full")
+            if not rate:
+                return LimitResult(True)
+            allowed, tokens, retry_after = await self._script(
+                keys=[f"{self.prefix}{client_id}"], args=[rate, burst, cost]
+            )
+        except Exception:
+            return LimitResult(True, reason="limiter_error")
+        if allowed:
+            return LimitResult(True, tokens=float(tokens))
+        return LimitResult(
+            False, 429, float(retry_after), "rate_limited", tokens=float(tokens)
+        )
+
+    async def snapshot(self):
+        """Configured limits and current bucket fill per client, for operators."""
+        now = time.time()
+        clients = {}
+        async for key in self.connection.conn.scan_iter(match=f"{self.prefix}*"):
+            key = key.decode() if isinstance(key, bytes) else key
+            client_id = key[len(self.prefix) :]
+            tokens, ts = await self.connection.conn.hmget(key, "tokens", "ts")
+            if tokens is None:
+                continue
+            rate, burst = self.limits_for(client_id)
+            # Refill up to now, as the script would on the next request
+            tokens = min(burst, float(tokens) + max(0.0, now - float(ts)) * rate)
+            clients[client_id] = {
+                "rate_per_s": rate,
+                "burst": burst,
+                "tokens": round(tokens, 2),
+                "fill": round(tokens / burst, 3) if burst else None,
+            }
+        depth = await self.queue_depth()
+        return {
+            "default": {"rate_per_s": self.rate, "burst": self.burst},
+            "clients": clients,
+            "queue": {
+                "depth": depth,
+                "high_water": self.high_water,
+                "fill": round(depth / self.high_water, 3) if self.high_water else None,
+                "accepting": not self.high_water or depth < self.high_water,
+            },
+        }
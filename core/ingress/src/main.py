@@ -1,30 +1,44 @@
 import argparse
+import asyncio
+import json
 import os
 import random
 import sys
+import tempfile
 import time
 from hashlib import sha256
 
 # Add the parent directory to the Python path to allow for absolute imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
 
-from fastapi import Depends, FastAPI, HTTPException, status
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.security import APIKeyHeader
-from pydantic import BaseModel
+from typing import Optional
 
-from core import config
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, status
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
+from pydantic import BaseModel, Field, ValidationError
+
+from core import config, metrics
+from core.auth import ClientRegistry, make_is_auth
+from core.ingress.src.dedup import Deduplicator
+from core.ingress.src.encoding import DecompressionMiddleware
+from core.ingress.src.limits import Limiter
+from core.metrics import CONTENT_TYPE, REGISTRY
 from core.stores import redis
-from core.types.base import Datum
+from core.stores.blobs import BLOB_KEY, BlobStore, BlobTooLarge
+from core.types.base import DatumRecord
+from core.types.codec import NAME_FIELD_MAX_BYTES, encode_datum
 
 
 # --- Mock Collector ---
 def mock_collector():
     """
     This is a mock collector that simulates data collection.
-    It generates a Datum object with random values for testing purposes.
+    It generates a DatumRecord with random values for testing purposes.
     """
-    return Datum(
+    return DatumRecord.new(
         collector="mock_collector",
         source_type="test_source",
         data_json={
@@ -34,28 +48,72 @@ def mock_collector():
     )
 
 
-# --- Authentication ---
-API_KEY_NAME = "X-API-KEY"
-CLIENT_ID_NAME = "X-CLIENT-ID"
+# Upload bytes gathered before each blob write
+UPLOAD_WRITE_BYTES = 1024 * 1024
 
-api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
-client_id_header = APIKeyHeader(name=CLIENT_ID_NAME, auto_error=False)
 
+# --- Metrics ---
+REQUESTS = REGISTRY.counter(
+    "relic_ingress_requests_total",
+    "Ingress requests by endpoint, collector and outcome.",
+    ("endpoint", "collector", "status"),
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "relic_ingress_request_seconds",
+    "Time spent handling an ingress request (after body validation).",
+    ("endpoint", "collector"),
+)
+ERRORS = REGISTRY.counter(
+    "relic_ingress_errors_total", "Ingress errors by type.", ("type",)
+)
+QUEUE_DEPTH = REGISTRY.gauge(
+    "relic_queue_depth", "Messages waiting in the hub queue.", ("queue",)
+)
+CONSUMER_LAG = REGISTRY.gauge(
+    "relic_queue_consumer_lag",
+    "Messages not yet processed by the pipeline consumer group.",
+    ("queue",),
+)
+REQUEST_BYTES = REGISTRY.histogram(
+    "relic_ingress_request_bytes",
+    "Request body size in bytes, as received (wire) and after decoding (body).",
+    ("endpoint", "kind"),
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+REJECTED = REGISTRY.counter(
+    "relic_ingress_rejected_total",
+    "Requests turned away by rate limiting (429) or queue backpressure (503).",
+    ("endpoint", "reason", "client"),
+)
+DUPLICATES = REGISTRY.counter(
+    "relic_ingress_duplicates_total",
+    "Repeat saves caught at ingress, by reason and whether they were dropped.",
+    ("reason", "action"),
+)
 
-def is_auth(
-    api_key: str = Depends(api_key_header),
-    client_id: str = Depends(client_id_header),
-):
-    if (
-        client_id in config.INGRESS_CREDENTIALS
-        and api_key == config.INGRESS_CREDENTIALS[client_id]
-    ):
-        return True
-    else:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid Client ID or API Key",
-        )
+
+def observe_request(endpoint, collector, outcome, start):
+    REQUESTS.inc(endpoint=endpoint, collector=collector, status=outcome)
+    REQUEST_SECONDS.observe(
+        time.perf_counter() - start, endpoint=endpoint, collector=collector
+    )
+
+
+def observe_bytes(endpoint, request):
+    """Records the body size measured by DecompressionMiddleware; returns (wire, body)."""
+    wire = getattr(request.state, "wire_bytes", 0)
+    body = getattr(request.state, "body_bytes", 0)
+    REQUEST_BYTES.observe(wire, endpoint=endpoint, kind="wire")
+    REQUEST_BYTES.observe(body, endpoint=endpoint, kind="body")
+    return wire, body
+
+
+# --- Authentication ---
+# Shares the ingress Redis pool once startup has opened it
+client_registry = ClientRegistry()
+is_auth = make_is_auth(
+    on_failure=lambda: ERRORS.inc(type="unauthorized"), registry=client_registry
+)
 
 
 # --- FastAPI App ---
@@ -67,6 +125,13 @@ origins = [
     "https://webapp.relic.apps.oliverq.io",  # deployed version
 ]
 
+# Added first so it sits inside CORS and its 413/415/400 responses get CORS
+# headers too; /upload streams its body and enforces BLOB_MAX_BYTES itself
+app.add_middleware(
+    DecompressionMiddleware,
+    max_bytes=config.INGRESS_MAX_BODY_BYTES,
+    exempt_paths=("/upload",),
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -76,95 +141,465 @@ app.add_middleware(
 )
 
 redis_client = None  # Global variable to hold the Redis connection
+blob_store = None
+limiter = None
 
 
 @app.on_event("startup")
 async def startup_event():
-    global redis_client
-    redis_client = redis.connect(config.REDIS_HOST, config.REDIS_PORT)
-    print("Redis connection established.")
+    # Runs once per worker process, so every worker owns its own pool.
+    global redis_client, blob_store, limiter
+    redis_client = await redis.async_connect(
+        config.REDIS_HOST,
+        config.REDIS_PORT,
+        max_connections=config.REDIS_MAX_CONNECTIONS,
+        queue_backend=config.QUEUE_BACKEND,
+    )
+    blob_store = BlobStore(config.BLOB_STORE_PATH)
+    if redis_client:
+        limiter = Limiter(redis_client)
+        client_registry.conn = redis_client.conn
+        print(f"Redis connection established (pid {os.getpid()}).")
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     global redis_client
+    await client_registry.close()
     if redis_client:
-        # Assuming there's a close method or similar for the Redis client
-        # If redis-py client, it might not need explicit closing for simple cases
-        # but for robust applications, managing connection lifecycle is important.
-        # For now, we'll just set it to None.
+        await redis_client.close()
         redis_client = None
         print("Redis connection closed.")
 
 
 # Dependency to get Redis connection
-def get_redis_connection():
+async def get_redis_connection():
     global redis_client
     if not redis_client:
         # This case should ideally not happen if startup_event runs correctly
         # but as a fallback or for testing outside FastAPI context.
-        redis_client = redis.connect(config.REDIS_HOST, config.REDIS_PORT)
+        redis_client = await redis.async_connect(
+            config.REDIS_HOST,
+            config.REDIS_PORT,
+            max_connections=config.REDIS_MAX_CONNECTIONS,
+            queue_backend=config.QUEUE_BACKEND,
+        )
     return redis_client
 
 
+def get_blob_store():
+    global blob_store
+    if not blob_store:
+        blob_store = BlobStore(config.BLOB_STORE_PATH)
+    return blob_store
+
+
+async def get_limiter(conn=Depends(get_redis_connection)):
+    """The shared Limiter, or None while Redis is unreachable."""
+    global limiter
+    if not limiter and conn:
+        limiter = Limiter(conn)
+    return limiter
+
+
+async def admit(limiter, endpoint, client_id, cost=1):
+    """Raises 429/503 with Retry-After when the client or the queue is over its limit."""
+    if limiter is None:
+        # No Redis: fail open like Limiter does on Redis errors
+        ERRORS.inc(type="limiter_error")
+        return
+    result = await limiter.check(client_id, cost)
+    if result.reason == "limiter_error":
+        ERRORS.inc(type="limiter_error")
+    if not result.allowed:
+        REJECTED.inc(endpoint=endpoint, reason=result.reason, client=client_id)
+        detail = (
+            "Rate limit exceeded."
+            if result.status_code == 429
+            else "Ingress queue is full; the pipeline is behind."
+        )
+        raise HTTPException(
+            status_code=result.status_code, detail=detail, headers=result.headers
+        )
+
+
+async def get_deduplicator(conn=Depends(get_redis_connection)):
+    """A Deduplicator, or None while Redis is unreachable (checks are skipped)."""
+    return Deduplicator(conn.conn) if conn else None
+
+
+async def dedup_datums(dedup, datums, client_id):
+    """
+    Runs the dedup checks for (datum, idempotency_key) pairs in one batch.
+    Returns per datum the uuid of the original for dropped repeats, else
+    None after attaching any flags to `datum.meta`.
+    """
+    if dedup is None:
+        return [None] * len(datums)
+    originals = []
+    for (datum, _), result in zip(datums, await dedup.check_batch(datums, client_id)):
+        if result.status == "duplicate":
+            DUPLICATES.inc(reason=result.reason, action="dropped")
+            originals.append(result.duplicate_of)
+            continue
+        if result.status == "flagged":
+            DUPLICATES.inc(reason=result.reason, action="flagged")
+        datum.meta.update(result.meta)
+        originals.append(None)
+    return originals
+
+
+async def dedup_datum(dedup, datum, client_id, idempotency_key):
+    """`dedup_datums` for a single datum."""
+    return (await dedup_datums(dedup, [(datum, idempotency_key)], client_id))[0]
+
+
+async def forget_datums(dedup, datums, client_id):
+    """
+    Releases the dedup keys of (datum, idempotency_key) pairs that were not
+    enqueued, so a retry isn't dropped as a duplicate. Best effort: the
+    original error is what the client needs to see.
+    """
+    if dedup is None or not datums:
+        return
+    try:
+        await dedup.forget_batch(datums, client_id)
+    except Exception as e:
+        ERRORS.inc(type=type(e).__name__)
+
+
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    ERRORS.inc(type="validation")
+    return await request_validation_exception_handler(request, exc)
+
+
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
 
 
-class SendRequest(BaseModel):
-    collector: str
-    source_type: str
-    data_json: dict
+@app.get("/metrics")
+async def metrics(conn=Depends(get_redis_connection)):
+    try:
+        QUEUE_DEPTH.set(await conn.depth(config.QUEUE_NAME), queue=config.QUEUE_NAME)
+        CONSUMER_LAG.set(
+            await conn.consumer_lag(config.QUEUE_NAME, config.STREAM_GROUP),
+            queue=config.QUEUE_NAME,
+        )
+    except Exception as e:
+        ERRORS.inc(type=type(e).__name__)
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
 
 
-def get_json_kb(data_json: dict) -> int:
-    """
-    Helper function to get the size of the JSON data in kbs.
-    """
-    return len(str(data_json).encode("utf-8")) // 1024  # Convert bytes to kilobytes
+@app.get("/limits")
+async def limits(client_id: str = Depends(is_auth), limiter=Depends(get_limiter)):
+    """Rate limits, per-client bucket fill and queue headroom."""
+    if limiter is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Redis is unavailable.",
+        )
+    return await limiter.snapshot()
+
+
+# In characters, so any UTF-8 text this long fits the queue envelope's
+# collector/source_type length fields
+NAME_MAX_LENGTH = NAME_FIELD_MAX_BYTES // 4
+
+
+class SendRequest(BaseModel):
+    collector: str = Field(max_length=NAME_MAX_LENGTH)
+    source_type: str = Field(max_length=NAME_MAX_LENGTH)
+    data_json: dict
+    # Per-item alternative to the Idempotency-Key header (used by /send/batch)
+    idempotency_key: Optional[str] = None
 
 
 @app.post("/send")
 async def send_data(
+    request: Request,
     data: SendRequest,
-    is_auth: str = Depends(is_auth),
+    client_id: str = Depends(is_auth),
     conn=Depends(get_redis_connection),
+    dedup=Depends(get_deduplicator),
+    limiter=Depends(get_limiter),
+    idempotency_key: Optional[str] = Header(None),
 ):
-
-    datum = Datum(
-        collector=data.collector,
-        source_type=data.source_type,
-        data_json=data.data_json,
+    start = time.perf_counter()
+    await admit(limiter, "/send", client_id)
+    datum = DatumRecord.new(
+        data.collector, data.source_type, data.data_json, meta={"client_id": client_id}
     )
+    idempotency_key = idempotency_key or data.idempotency_key
     try:
-        conn.put("hub-inbox", datum.model_dump_json())
+        original = await dedup_datum(dedup, datum, client_id, idempotency_key)
+        if original:
+            print(f"DUPLICATE -> {datum.collector}: {original}")
+            observe_request("/send", datum.collector, "duplicate", start)
+            return {"status": "duplicate", "uuid": original}
+        await conn.enqueue(config.QUEUE_NAME, [encode_datum(datum)])
+        wire, body = observe_bytes("/send", request)
         print(
-            f"PUT -> {datum.collector}: {datum.uuid} [{get_json_kb(datum.data_json)} KB]"
+            f"PUT -> {datum.collector}: {datum.uuid} [{body / 1024:.1f} KB, {wire / 1024:.1f} KB on the wire]"
+        )
+        observe_request("/send", datum.collector, "queued", start)
+        return {"status": "data queued", "uuid": datum.uuid}
+    except Exception as e:
+        ERRORS.inc(type=type(e).__name__)
+        await forget_datums(dedup, [(datum, idempotency_key)], client_id)
+        observe_request("/send", datum.collector, "error", start)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to send data to Redis.",
+        )
+
+
+def parse_batch_body(body: bytes, content_type: str) -> list:
+    """
+    Splits a batch body into raw items. NDJSON bodies yield one item per
+    non-empty line (undecodable lines are kept as errors); anything else
+    must be a JSON array.
+    """
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        items = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                items.append(e)
+        return items
+    try:
+        items = json.loads(body)
+    except json.JSONDecodeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid JSON body: {e}",
+        )
+    if not isinstance(items, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Batch body must be a JSON array or NDJSON.",
+        )
+    return items
+
+
+@app.post("/send/batch")
+async def send_batch(
+    request: Request,
+    client_id: str = Depends(is_auth),
+    conn=Depends(get_redis_connection),
+    dedup=Depends(get_deduplicator),
+    limiter=Depends(get_limiter),
+):
+    start = time.perf_counter()
+    items = parse_batch_body(
+        await request.body(), request.headers.get("content-type", "")
+    )
+    if len(items) > config.INGRESS_MAX_BATCH_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds {config.INGRESS_MAX_BATCH_ITEMS} items.",
+        )
+    await admit(limiter, "/send/batch", client_id, cost=len(items))
+
+    results = []
+    messages = []
+    # Everything that went through dedup, so any claims can be released
+    checked = []
+    collectors = set()
+    duplicates = 0
+    try:
+        indices = []
+        for i, item in enumerate(items):
+            try:
+                if isinstance(item, Exception):
+                    raise item
+                data = SendRequest.model_validate(item)
+            except ValidationError as e:
+                errors = e.errors(include_url=False, include_input=False)
+                results.append({"index": i, "status": "invalid", "error": errors})
+                continue
+            except json.JSONDecodeError as e:
+                results.append({"index": i, "status": "invalid", "error": str(e)})
+                continue
+            datum = DatumRecord.new(
+                data.collector,
+                data.source_type,
+                data.data_json,
+                meta={"client_id": client_id},
+            )
+            collectors.add(datum.collector)
+            indices.append(i)
+            checked.append((datum, data.idempotency_key))
+
+        originals = await dedup_datums(dedup, checked, client_id)
+        for i, (datum, _), original in zip(indices, checked, originals):
+            if original:
+                duplicates += 1
+                results.append({"index": i, "status": "duplicate", "uuid": original})
+                continue
+            messages.append(encode_datum(datum))
+            results.append({"index": i, "status": "queued", "uuid": datum.uuid})
+        await conn.enqueue(config.QUEUE_NAME, messages)
+    except Exception as e:
+        ERRORS.inc(type=type(e).__name__)
+        await forget_datums(dedup, checked, client_id)
+        collector = collectors.pop() if len(collectors) == 1 else "mixed"
+        observe_request("/send/batch", collector, "error", start)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to send data to Redis.",
+        )
+    results.sort(key=lambda result: result["index"])
+    # One label per batch: its collector, or "mixed" when a batch spans several
+    collector = collectors.pop() if len(collectors) == 1 else "mixed"
+    invalid = len(items) - len(messages) - duplicates
+    if invalid:
+        ERRORS.inc(invalid, type="validation")
+    observe_request("/send/batch", collector, "queued", start)
+    observe_bytes("/send/batch", request)
+    print(
+        f"PUT BATCH -> {len(messages)}/{len(items)} queued, {duplicates} duplicate(s)"
+    )
+    return {
+        "status": "batch processed",
+        "queued": len(messages),
+        "duplicate": duplicates,
+        "invalid": invalid,
+        "results": results,
+    }
+
+
+@app.post("/upload")
+async def upload(
+    request: Request,
+    collector: str = Query(..., max_length=NAME_MAX_LENGTH),
+    source_type: str = Query("media", max_length=NAME_MAX_LENGTH),
+    filename: Optional[str] = None,
+    data_json: Optional[str] = Query(
+        None, description="Extra data_json fields (a JSON object) for the datum."
+    ),
+    client_id: str = Depends(is_auth),
+    conn=Depends(get_redis_connection),
+    dedup=Depends(get_deduplicator),
+    store=Depends(get_blob_store),
+    limiter=Depends(get_limiter),
+    idempotency_key: Optional[str] = Header(None),
+):
+    """
+    Streams the raw request body (any size up to BLOB_MAX_BYTES, chunked
+    transfer encoding welcome) into the content-addressed blob store and
+    queues a datum that carries only a reference to it, so media never
+    passes through the queue or a JSON decoder.
+    """
+    start = time.perf_counter()
+    try:
+        extra = json.loads(data_json) if data_json else {}
+    except json.JSONDecodeError as e:
+        extra = e
+    if not isinstance(extra, dict):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="data_json must be a JSON object.",
         )
-        return {"status": "data queued"}
-    except:
+    await admit(limiter, "/upload", client_id)
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > config.BLOB_MAX_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Upload exceeds {config.BLOB_MAX_BYTES} bytes.",
+        )
+
+    # File I/O and hashing run in a thread, a few socket reads at a time
+    writer = await asyncio.to_thread(store.writer, config.BLOB_MAX_BYTES)
+    committed = False
+    try:
+        pending = []
+        pending_bytes = 0
+        async for chunk in request.stream():
+            pending.append(chunk)
+            pending_bytes += len(chunk)
+            if pending_bytes >= UPLOAD_WRITE_BYTES:
+                await asyncio.to_thread(writer.write, b"".join(pending))
+                pending, pending_bytes = [], 0
+        if pending:
+            await asyncio.to_thread(writer.write, b"".join(pending))
+        ref, deduplicated = await asyncio.to_thread(writer.commit)
+        committed = True
+    except BlobTooLarge as e:
+        ERRORS.inc(type="blob_too_large")
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e)
+        )
+    finally:
+        # Disconnects, cancellation and failed writes or commits included
+        if not committed:
+            writer.abort()
+
+    ref["content_type"] = request.headers.get(
+        "content-type", "application/octet-stream"
+    )
+    if filename:
+        ref["filename"] = filename
+    datum = DatumRecord.new(
+        collector, source_type, {**extra, BLOB_KEY: ref}, meta={"client_id": client_id}
+    )
+    try:
+        original = await dedup_datum(dedup, datum, client_id, idempotency_key)
+        if original:
+            observe_request("/upload", collector, "duplicate", start)
+            return {"status": "duplicate", "uuid": original, BLOB_KEY: ref}
+        await conn.enqueue(config.QUEUE_NAME, [encode_datum(datum)])
+    except Exception as e:
+        ERRORS.inc(type=type(e).__name__)
+        await forget_datums(dedup, [(datum, idempotency_key)], client_id)
+        observe_request("/upload", collector, "error", start)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to send data to Redis.",
         )
+    observe_bytes("/upload", request)
+    print(
+        f"UPLOAD -> {collector}: {datum.uuid} [{ref['size'] / 1024:.1f} KB, "
+        f"{'existing' if deduplicated else 'new'} blob {ref['sha256'][:12]}]"
+    )
+    observe_request("/upload", collector, "queued", start)
+    return {"status": "data queued", "uuid": datum.uuid, BLOB_KEY: ref}
 
 
 # --- Main Execution ---
-def run_mock_sender():
-    """Runs the mock data sender loop."""
+def run_mock_sender(conn=None, count=None, interval=1.0, on_sent=None, verbose=True):
+    """
+    Runs the mock data sender loop. Sends forever at one datum per
+    `interval` seconds unless `count` is given; `on_sent(datum)` is called
+    after each enqueue (used by the benchmarks to timestamp messages).
+    """
     print("Running in mock sender mode...")
     # Use a single connection for the mock sender as well
-    mock_sender_conn = redis.connect(config.REDIS_HOST, config.REDIS_PORT)
-    # Empty the queue before starting
-    # Assuming mock_sender_conn.conn is the underlying redis-py client
-    mock_sender_conn.conn.delete("hub-inbox")
-    print("Starting to send mock data to 'hub-inbox'...")
-    while True:
+    mock_sender_conn = conn or redis.connect(
+        config.REDIS_HOST, config.REDIS_PORT, queue_backend=config.QUEUE_BACKEND
+    )
+    if conn is None:
+        # Empty the queue before starting (a stream is kept, deleting it drops the group)
+        # Assuming mock_sender_conn.conn is the underlying redis-py client
+        if config.QUEUE_BACKEND == "list":
+            mock_sender_conn.conn.delete(config.QUEUE_NAME)
+    print(f"Starting to send mock data to '{config.QUEUE_NAME}'...")
+    sent = 0
+    while count is None or sent < count:
         data = mock_collector()
-        mock_sender_conn.put("hub-inbox", data.model_dump_json())
-        print(f"Sent: {data.model_dump_json()}")
-        time.sleep(1)
+        mock_sender_conn.enqueue(config.QUEUE_NAME, [encode_datum(data)])
+        sent += 1
+        if on_sent:
+            on_sent(data)
+        if verbose:
+            print(f"Sent: {data.uuid} {data.data_json}")
+        if interval:
+            time.sleep(interval)
+    return sent
 
 
 if __name__ == "__main__":
@@ -174,6 +609,12 @@ if __name__ == "__main__":
         action="store_true",
         help="Run in mock sender mode instead of as a FastAPI server.",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=config.INGRESS_WORKERS,
+        help="Number of uvicorn worker processes (each with its own Redis pool).",
+    )
     args = parser.parse_args()
 
     if args.mock:
@@ -181,5 +622,22 @@ if __name__ == "__main__":
     else:
         import uvicorn
 
-        print("Running FastAPI server...")
-        uvicorn.run(app, host="0.0.0.0", port=8000)
+        print(f"Running FastAPI server with {args.workers} worker(s)...")
+        if args.workers > 1:
+            # Workers write their metrics under PROMETHEUS_MULTIPROC_DIR so
+            # /metrics reports all of them, whichever worker is scraped. The
+            # workers import prometheus_client after this is set
+            if not metrics.multiprocess_dir():
+                os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(
+                    prefix="relic-ingress-metrics-"
+                )
+            metrics.reset_multiprocess_dir()
+            # Multiple workers need an import string so each process builds its own app.
+            uvicorn.run(
+                "core.ingress.src.main:app",
+                host="0.0.0.0",
+                port=8000,
+                workers=args.workers,
+            )
+        else:
+            uvicorn.run(app, host="0.0.0.0", port=8000)
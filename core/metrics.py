@@ -0,0 +1,214 @@
+import glob
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Loads .env first: prometheus_client picks its value store from
+# PROMETHEUS_MULTIPROC_DIR when it is imported
+from core import config  # noqa: F401
+
+import prometheus_client
+from prometheus_client import CollectorRegistry, generate_latest, multiprocess
+
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Only the samples we define, not a `_created` twin per series
+prometheus_client.disable_created_metrics()
+
+
+def multiprocess_dir():
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+
+def reset_multiprocess_dir():
+    """
+    Clears the values left by an earlier run. Call once before starting
+    the worker processes; the directory must not be shared with another
+    service.
+    """
+    path = multiprocess_dir()
+    if path:
+        os.makedirs(path, exist_ok=True)
+        for name in glob.glob(os.path.join(path, "*.db")):
+            os.remove(name)
+
+
+class _Metric:
+    def __init__(self, name, metric, labelnames):
+        self.name = name
+        self._metric = metric
+        self.labelnames = tuple(labelnames)
+
+    def _child(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, " f"got {tuple(labels)}"
+            )
+        return self._metric.labels(**labels) if self.labelnames else self._metric
+
+
+class Counter(_Metric):
+    def inc(self, amount=1, **labels):
+        self._child(labels).inc(amount)
+
+
+class Gauge(_Metric):
+    """A settable value, or one computed at scrape time with `set_function`."""
+
+    def __init__(self, name, metric, labelnames):
+        super().__init__(name, metric, labelnames)
+        self._function = None
+
+    def set(self, value, **labels):
+        self._child(labels).set(value)
+
+    def set_function(self, function):
+        """`function()` returns a number, or a {label_tuple: number} dict."""
+        self._function = function
+
+    def refresh(self):
+        if self._function is None:
+            return
+        try:
+            result = self._function()
+        except Exception:
+            return
+        if isinstance(result, dict):
+            for key, value in result.items():
+                self._metric.labels(*key).set(value)
+        elif result is not None:
+            self._metric.set(result)
+
+
+class Histogram(_Metric):
+    def observe(self, value, **labels):
+        self._child(labels).observe(value)
+
+    def time(self, **labels):
+        """Context manager observing the elapsed wall time in seconds."""
+        return self._child(labels).time()
+
+
+class Registry:
+    """
+    Prometheus metrics rendered in the text exposition format. Within one
+    process that is just its own values. Services that run several worker
+    processes (ingress with --workers) set PROMETHEUS_MULTIPROC_DIR, where
+    each process keeps its values in a file, and every scrape adds up all
+    of them, so it doesn't matter which worker answers it.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._registry = CollectorRegistry()
+
+    def _register(self, name, factory):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = factory()
+            return self._metrics[name]
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(
+            name,
+            lambda: Counter(
+                name,
+                prometheus_client.Counter(
+                    name, help_text, labelnames, registry=self._registry
+                ),
+                labelnames,
+            ),
+        )
+
+    def gauge(self, name, help_text, labelnames=(), multiprocess_mode="mostrecent"):
+        """
+        Across worker processes a gauge reports the most recently set
+        value by default, as ours describe shared state (queue depth);
+        pass "livesum" for per-process amounts.
+        """
+        return self._register(
+            name,
+            lambda: Gauge(
+                name,
+                prometheus_client.Gauge(
+                    name,
+                    help_text,
+                    labelnames,
+                    registry=self._registry,
+                    multiprocess_mode=multiprocess_mode,
+                ),
+                labelnames,
+            ),
+        )
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(
+            name,
+            lambda: Histogram(
+                name,
+                prometheus_client.Histogram(
+                    name,
+                    help_text,
+                    labelnames,
+                    registry=self._registry,
+                    buckets=buckets,
+                ),
+                labelnames,
+            ),
+        )
+
+    def render(self):
+        for metric in list(self._metrics.values()):
+            if isinstance(metric, Gauge):
+                metric.refresh()
+        if multiprocess_dir():
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = self._registry
+        return generate_latest(registry).decode("utf-8")
+
+
+REGISTRY = Registry()
+
+
+def start_http_server(port, registry=REGISTRY, host="0.0.0.0"):
+    """Serves `registry` on http://host:port/metrics from a daemon thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,228 @@
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from loguru import logger
+
+# name -> Enricher subclass, filled by the @register decorator
+ENRICHERS = {}
+
+
+def register(cls):
+    """Class decorator that adds an Enricher to the registry under `cls.name`."""
+    if not cls.name:
+        raise ValueError(f"{cls.__name__} must define a name to be registered.")
+    ENRICHERS[cls.name] = cls
+    return cls
+
+
+class Enricher:
+    """
+    Base class for a pipeline enrichment stage.
+
+    Subclasses set `name`, list the enrichers whose output they need in
+    `depends_on`, and implement `enrich(datum, upstream)` returning a
+    JSON-serialisable dict (or None). A plain `def enrich` runs inline; set
+    `cpu_bound` for heavy ones (a real model, not a regex pass) to run them
+    in the process pool, where the datum has to be pickled over. An
+    `async def enrich` is treated as I/O-bound and runs concurrently on the
+    event loop. `upstream` maps each dependency's name to its output.
+    Expensive enrichers set `skip_near_duplicates` to be skipped for datums
+    ingress flagged as near duplicates.
+    """
+
+    name = ""
+    depends_on = ()
+    skip_near_duplicates = False
+    cpu_bound = False
+
+    def enrich(self, datum, upstream):
+        raise NotImplementedError
+
+    @property
+    def is_async(self):
+        return asyncio.iscoroutinefunction(self.enrich)
+
+
+@dataclass
+class EnrichmentResult:
+    outputs: dict = field(default_factory=dict)
+    timings_ms: dict = field(default_factory=dict)
+    errors: dict = field(default_factory=dict)
+
+
+def iter_text(value):
+    """Yields every string found in a (nested) data_json value."""
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for v in value.values():
+            yield from iter_text(v)
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            yield from iter_text(v)
+
+
+def build_stages(enrichers):
+    """
+    Orders enrichers into stages: every enricher in a stage only depends on
+    enrichers from earlier stages, so a stage can run fully in parallel.
+    Raises ValueError on unknown dependencies or cycles.
+    """
+    by_name = {e.name: e for e in enrichers}
+    for e in enrichers:
+        missing = [d for d in e.depends_on if d not in by_name]
+        if missing:
+            raise ValueError(f"Enricher '{e.name}' depends on unknown {missing}")
+
+    stages = []
+    done = set()
+    pending = list(enrichers)
+    while pending:
+        ready = [e for e in pending if all(d in done for d in e.depends_on)]
+        if not ready:
+            names = [e.name for e in pending]
+            raise ValueError(f"Enricher dependency cycle between {names}")
+        stages.append(ready)
+        done.update(e.name for e in ready)
+        pending = [e for e in pending if e.name not in done]
+    return stages
+
+
+def load_enrichers(names):
+    """Instantiates registered enrichers by name."""
+    # Importing the built-ins registers them.
+    from core.pipeline.enrichment import builtin  # noqa: F401
+
+    unknown = [n for n in names if n not in ENRICHERS]
+    if unknown:
+        raise ValueError(f"Unknown enrichers {unknown}; known: {sorted(ENRICHERS)}")
+    return [ENRICHERS[n]() for n in names]
+
+
+def _timed_enrich(enricher, datum, upstream):
+    """Runs a sync enricher and measures it where it runs (inside the worker)."""
+    start = time.perf_counter()
+    output = enricher.enrich(datum, upstream)
+    return output, (time.perf_counter() - start) * 1000
+
+
+def _timed_enrich_all(enrichers, datum, upstreams):
+    """
+    `_timed_enrich` for several enrichers in one trip to the pool, so the
+    datum is pickled once. Returns (output, ms, error) per enricher.
+    """
+    outcomes = []
+    for enricher, upstream in zip(enrichers, upstreams):
+        try:
+            output, elapsed_ms = _timed_enrich(enricher, datum, upstream)
+        except Exception as e:
+            outcomes.append((None, 0.0, f"{type(e).__name__}: {e}"))
+        else:
+            outcomes.append((output, elapsed_ms, None))
+    return outcomes
+
+
+class EnrichmentRunner:
+    """
+    Runs a set of enrichers as a DAG of stages over datums. Enrichers
+    marked `cpu_bound` go to a ProcessPoolExecutor (all of a stage's in
+    one call per datum, or inline when `max_workers` is 0), other sync
+    ones run inline, I/O-bound ones are awaited concurrently, and each
+    enricher's wall time is recorded per datum.
+    """
+
+    def __init__(self, enrichers, max_workers=None):
+        self.enrichers = list(enrichers)
+        self.stages = build_stages(self.enrichers)
+        has_cpu = any(e.cpu_bound and not e.is_async for e in self.enrichers)
+        self.pool = (
+            ProcessPoolExecutor(max_workers=max_workers)
+            if has_cpu and max_workers != 0
+            else None
+        )
+        self._loop = None
+
+    @staticmethod
+    def _record(enricher, result, output, elapsed_ms, error=None):
+        if error is not None:
+            logger.warning(f"Enricher '{enricher.name}' failed: {error}")
+            result.errors[enricher.name] = error
+            return
+        result.outputs[enricher.name] = output
+        result.timings_ms[enricher.name] = round(elapsed_ms, 3)
+
+    async def _run_one(self, enricher, datum, result):
+        upstream = {d: result.outputs.get(d) for d in enricher.depends_on}
+        try:
+            if enricher.is_async:
+                start = time.perf_counter()
+                output = await enricher.enrich(datum, upstream)
+                elapsed_ms = (time.perf_counter() - start) * 1000
+            else:
+                output, elapsed_ms = _timed_enrich(enricher, datum, upstream)
+        except Exception as e:
+            self._record(enricher, result, None, 0, f"{type(e).__name__}: {e}")
+            return
+        self._record(enricher, result, output, elapsed_ms)
+
+    async def _run_pooled(self, enrichers, datum, result):
+        upstreams = [
+            {d: result.outputs.get(d) for d in e.depends_on} for e in enrichers
+        ]
+        loop = asyncio.get_running_loop()
+        try:
+            outcomes = await loop.run_in_executor(
+                self.pool, _timed_enrich_all, enrichers, datum, upstreams
+            )
+        except Exception as e:
+            # The pool itself failed (e.g. a worker died)
+            outcomes = [(None, 0, f"{type(e).__name__}: {e}")] * len(enrichers)
+        for enricher, outcome in zip(enrichers, outcomes):
+            self._record(enricher, result, *outcome)
+
+    async def _run_stage(self, stage, datum, result, near_duplicate):
+        ready = []
+        for enricher in stage:
+            if near_duplicate and enricher.skip_near_duplicates:
+                continue
+            if any(d in result.errors for d in enricher.depends_on):
+                result.errors[enricher.name] = "skipped: upstream enricher failed"
+                continue
+            ready.append(enricher)
+        pooled = [e for e in ready if self.pool and e.cpu_bound and not e.is_async]
+        jobs = [self._run_one(e, datum, result) for e in ready if e not in pooled]
+        if pooled:
+            jobs.append(self._run_pooled(pooled, datum, result))
+        await asyncio.gather(*jobs)
+
+    async def run(self, datum):
+        """
+        Runs every stage over a single datum. Exact duplicates flagged by
+        ingress are not enriched at all.
+        """
+        result = EnrichmentResult()
+        meta = datum.get("meta") or {}
+        if meta.get("duplicate_of"):
+            return result
+        near_duplicate = bool(meta.get("near_duplicate_of"))
+        for stage in self.stages:
+            await self._run_stage(stage, datum, result, near_duplicate)
+        return result
+
+    async def run_batch(self, datums):
+        """Enriches a batch of datums concurrently."""
+        return await asyncio.gather(*(self.run(d) for d in datums))
+
+    def enrich_batch(self, datums):
+        """Synchronous entry point for the (non-async) pipeline loop."""
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(self.run_batch(datums))
+
+    def close(self):
+        if self.pool:
+            self.pool.shutdown()
+        if self._loop:
+            self._loop.close()
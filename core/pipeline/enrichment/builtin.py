@@ -0,0 +1,241 @@
+import re
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+from core.pipeline.enrichment.base import Enricher, iter_text, register
+from core.stores.blobs import BlobStore, blob_ref
+
+URL_RE = re.compile(r"https?://[^\s<>\"')\]]+", re.IGNORECASE)
+WORD_RE = re.compile(r"[^\W\d_]+", re.UNICODE)
+# Runs of capitalised words, e.g. "Jane Street" or "Kill Chain"
+ENTITY_RE = re.compile(r"\b(?:[A-Z][\w'-]+)(?:\s+[A-Z][\w'-]+)*")
+TAG_RE = re.compile(r"(?<!\w)([#@])(\w{2,})")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+STOPWORDS = {
+    "en": set("the and is of to in it that for this with on".split()),
+    "es": set("el la de que y en los es por para con una".split()),
+    "fr": set("le la les de et est un une pour dans que pas".split()),
+    "de": set("der die das und ist nicht ein eine mit zu auf den".split()),
+    "id": set("yang dan di ini itu dengan untuk tidak dari ke saya ada".split()),
+}
+
+PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+# JPEG start-of-frame markers (C4, C8 and CC are other segment types)
+JPEG_SOF = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+PDF_PAGE_RE = re.compile(rb"/Type\s*/Page(?![s\w])")
+# /Count of a page tree node, on either side of its /Type
+PDF_PAGES_COUNT_RE = re.compile(
+    rb"/Type\s*/Pages(?!\w)[^>]*?/Count\s+(\d+)|/Count\s+(\d+)[^>]*?/Type\s*/Pages(?!\w)"
+)
+# How much of each end of a PDF is searched for the page tree root
+PDF_SCAN_BYTES = 1024 * 1024
+
+
+def datum_text(datum):
+    return "\n".join(iter_text(datum.get("data_json", {})))
+
+
+@register
+class UrlExtractor(Enricher):
+    """Pulls links (and their domains) out of every text field."""
+
+    name = "url_extraction"
+
+    def enrich(self, datum, upstream):
+        urls = list(
+            dict.fromkeys(u.rstrip(".,;:") for u in URL_RE.findall(datum_text(datum)))
+        )
+        domains = list(dict.fromkeys(urlsplit(u).netloc.lower() for u in urls))
+        return {"urls": urls, "domains": domains}
+
+
+@register
+class LanguageDetector(Enricher):
+    """Guesses the language from stopword overlap. Cheap, good enough for notes."""
+
+    name = "language_detection"
+
+    def enrich(self, datum, upstream):
+        text = URL_RE.sub(" ", datum_text(datum))
+        words = [w.lower() for w in WORD_RE.findall(text)]
+        if not words:
+            return {"language": None, "confidence": 0.0}
+        scores = {
+            lang: sum(w in stop for w in words) for lang, stop in STOPWORDS.items()
+        }
+        lang, hits = max(scores.items(), key=lambda kv: kv[1])
+        if not hits:
+            return {"language": None, "confidence": 0.0}
+        return {"language": lang, "confidence": round(hits / len(words), 3)}
+
+
+@register
+class NerTagger(Enricher):
+    """
+    Heuristic entity tagger: capitalised phrases, #tags and @mentions.
+    Subclass and override `tag` to plug in a real NER model.
+    """
+
+    name = "ner"
+    depends_on = ("language_detection",)
+
+    def tag(self, text, language):
+        entities = []
+        for sentence in SENTENCE_RE.split(URL_RE.sub(" ", text)):
+            for match in ENTITY_RE.finditer(sentence):
+                phrase = match.group(0)
+                # A single capitalised word opening a sentence is usually not a name
+                if match.start() == 0 and " " not in phrase:
+                    continue
+                entities.append({"text": phrase, "label": "PROPER_NOUN"})
+        for sigil, tag in TAG_RE.findall(text):
+            entities.append(
+                {"text": tag, "label": "HASHTAG" if sigil == "#" else "MENTION"}
+            )
+        return entities
+
+    def enrich(self, datum, upstream):
+        language = (upstream.get("language_detection") or {}).get("language")
+        seen = set()
+        entities = []
+        for entity in self.tag(datum_text(datum), language):
+            key = (entity["text"], entity["label"])
+            if key not in seen:
+                seen.add(key)
+                entities.append(entity)
+        return {"entities": entities}
+
+
+@register
+class Summariser(Enricher):
+    """
+    Summarisation hook. Without a `summarise` coroutine it falls back to an
+    extractive lead (first sentences up to `max_chars`); pass an async
+    callable (e.g. an LLM client) to produce real summaries.
+    """
+
+    name = "summary"
+    depends_on = ("language_detection",)
+    skip_near_duplicates = True
+    max_chars = 280
+
+    def __init__(self, summarise=None):
+        self.summarise = summarise
+
+    async def enrich(self, datum, upstream):
+        text = URL_RE.sub("", datum_text(datum)).strip()
+        if not text:
+            return {"summary": ""}
+        if self.summarise:
+            return {"summary": await self.summarise(text)}
+        summary = ""
+        for sentence in SENTENCE_RE.split(text):
+            if summary and len(summary) + len(sentence) + 1 > self.max_chars:
+                break
+            summary = f"{summary} {sentence}".strip()
+        return {"summary": summary[: self.max_chars]}
+
+
+@lru_cache(maxsize=1)
+def blob_store():
+    return BlobStore()
+
+
+def jpeg_size(data):
+    """(width, height) from the first start-of-frame segment, or None."""
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            i += 2
+            continue
+        if marker in JPEG_SOF:
+            height = int.from_bytes(data[i + 5 : i + 7], "big")
+            width = int.from_bytes(data[i + 7 : i + 9], "big")
+            return width, height
+        i += 2 + int.from_bytes(data[i + 2 : i + 4], "big")
+    return None
+
+
+def pdf_page_count(data, window=PDF_SCAN_BYTES):
+    """
+    Page count from the /Count of the page tree root, the largest of any
+    /Pages node, searched for in the first and last `window` bytes only:
+    linearized files keep the root at the start, most others near the
+    trailer. Smaller files are read whole, and without a root there (it
+    may sit in a compressed object stream) their /Page objects are
+    counted instead. None if a large file has no root near either end.
+    """
+    if len(data) <= 2 * window:
+        chunks = [data[:]]
+    else:
+        chunks = [data[:window], data[-window:]]
+    counts = [
+        int(before or after)
+        for chunk in chunks
+        for before, after in PDF_PAGES_COUNT_RE.findall(chunk)
+    ]
+    if counts:
+        return max(counts)
+    if len(chunks) == 1:
+        return len(PDF_PAGE_RE.findall(chunks[0]))
+    return None
+
+
+def inspect_blob(data):
+    """Type and basic properties of a blob from its leading bytes."""
+    if data[:8] == PNG_MAGIC:
+        return {
+            "type": "image/png",
+            "width": int.from_bytes(data[16:20], "big"),
+            "height": int.from_bytes(data[20:24], "big"),
+        }
+    if data[:3] == b"\xff\xd8\xff":
+        size = jpeg_size(data)
+        info = {"type": "image/jpeg"}
+        if size:
+            info["width"], info["height"] = size
+        return info
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return {
+            "type": "image/gif",
+            "width": int.from_bytes(data[6:8], "little"),
+            "height": int.from_bytes(data[8:10], "little"),
+        }
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return {"type": "image/webp"}
+    if data[:5] == b"%PDF-":
+        info = {"type": "application/pdf"}
+        pages = pdf_page_count(data)
+        if pages is not None:
+            info["pages"] = pages
+        return info
+    return {"type": None}
+
+
+@register
+class MediaInspector(Enricher):
+    """
+    Describes the blob an uploaded datum references: sniffed type, image
+    dimensions, PDF page count. The blob is memory-mapped from the store,
+    so its bytes never travel through the queue and only the pages a check
+    touches are read. Datums without a blob are skipped.
+    """
+
+    name = "media"
+
+    def enrich(self, datum, upstream):
+        ref = blob_ref(datum.get("data_json", {}))
+        if ref is None:
+            return None
+        with blob_store().open(ref["sha256"]) as data:
+            info = inspect_blob(data)
+            info["size"] = len(data)
+        info["type"] = info["type"] or ref.get("content_type")
+        return info
@@ -1,7 +1,13 @@
 import argparse
+import asyncio
 import json
 import os
+import socket
+import sqlite3
+import struct
 import sys
+import threading
+import time
 import uuid
 from datetime import datetime, timezone
 from loguru import logger
@@ -10,84 +16,477 @@ from loguru import logger
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 import traceback
 
+import psycopg2
+
 from core import config
+from core.metrics import REGISTRY, start_http_server
+from core.pipeline.enrichment.base import EnrichmentRunner, load_enrichers
+from core.pipeline.retry import RetryQueue
 from core.stores import redis
 from core.stores.redis import connect as redis_connect
-from core.stores.postgres import PgClient
-from core.types.base import Datum
+from core.stores.base import open_store
+from core.stores.postgres import CONNECTION_ERRORS
+from core.types.codec import decode_message
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "relic_pipeline_stage_seconds",
+    "Time spent per pipeline stage.",
+    ("stage",),
+)
+ENRICHER_SECONDS = REGISTRY.histogram(
+    "relic_pipeline_enricher_seconds",
+    "Time spent per enricher and datum.",
+    ("enricher",),
+)
+MESSAGES = REGISTRY.counter(
+    "relic_pipeline_messages_total", "Messages processed by outcome.", ("status",)
+)
+ERRORS = REGISTRY.counter(
+    "relic_pipeline_errors_total", "Pipeline errors by type.", ("type",)
+)
+BATCH_SIZE = REGISTRY.histogram(
+    "relic_pipeline_batch_size",
+    "Messages per batch read from the queue.",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+QUEUE_DEPTH = REGISTRY.gauge(
+    "relic_queue_depth", "Messages waiting in the hub queue.", ("queue",)
+)
+CONSUMER_LAG = REGISTRY.gauge(
+    "relic_queue_consumer_lag",
+    "Messages not yet processed by the pipeline consumer group.",
+    ("queue",),
+)
+RETRY_PENDING = REGISTRY.gauge(
+    "relic_pipeline_retry_pending", "Failed messages waiting for a retry.", ("queue",)
+)
+DEAD_LETTERS = REGISTRY.gauge(
+    "relic_pipeline_dead_letters", "Messages in the dead-letter queue.", ("queue",)
+)
+
+# Failures retrying can't fix: undecodable messages and rows the store
+# rejects. Inserts skip records already stored, so a redelivered message
+# never fails on a duplicate key.
+PERMANENT_ERRORS = (
+    ValueError,
+    KeyError,
+    struct.error,
+    psycopg2.DataError,
+    sqlite3.DataError,
+)
+
+
+def store_unavailable(error):
+    """
+    Whether `error` means the store is down, or for SQLite busy or locked
+    by another writer: the whole batch can wait rather than be failed.
+    Other SQLite OperationalErrors (a bad query, a full disk) are ordinary
+    failures.
+    """
+    if isinstance(error, sqlite3.OperationalError):
+        return (getattr(error, "sqlite_errorname", None) or "").startswith(
+            ("SQLITE_BUSY", "SQLITE_LOCKED")
+        )
+    return isinstance(error, CONNECTION_ERRORS)
+
+
+def outage_pause(outages):
+    """Seconds to stop reading after the `outages`-th store outage in a row."""
+    return min(
+        config.PIPELINE_OUTAGE_MAX_S,
+        config.PIPELINE_RETRY_BASE_S * 2 ** (outages - 1),
+    )
+
+
+def build_engram(datum_json, result):
+    """Turn a decoded datum and its enrichment result into an engram record."""
+    engram_data = {
+        k: datum_json[k]
+        for k in ("uuid", "unix_ts", "iso_ts", "collector", "source_type")
+    }
+    engram_data["data_json"] = {
+        "enrichments": result.outputs,
+        "errors": result.errors,
+    }
+    meta = dict(datum_json.get("meta") or {})
+    # The ingress client that sent the datum; the rest is dedup flags
+    client_id = meta.pop("client_id", None)
+    if client_id:
+        engram_data["data_json"]["client_id"] = client_id
+    if meta:
+        engram_data["data_json"]["dedup"] = meta
+    return engram_data
+
+
+def log_timings(results):
+    """Record and log the mean time each enricher took over a batch."""
+    totals = {}
+    for result in results:
+        for name, ms in result.timings_ms.items():
+            totals.setdefault(name, []).append(ms)
+            ENRICHER_SECONDS.observe(ms / 1000, enricher=name)
+        for name in result.errors:
+            ERRORS.inc(type=f"enricher:{name}")
+    if totals:
+        summary = ", ".join(
+            f"{name}={sum(ms) / len(ms):.2f}ms" for name, ms in totals.items()
+        )
+        logger.info(f"Enricher timings (mean over {len(results)}): {summary}")
+
+
+def process_batch(store, runner, messages):
+    """
+    Decode a batch of raw queue messages, enrich them concurrently and write
+    all datums and engrams in one transaction. Returns the number of
+    messages written.
+    """
+    with STAGE_SECONDS.time(stage="decode"):
+        datums = [decode_message(m) for m in messages]
+    with STAGE_SECONDS.time(stage="enrichment"):
+        results = runner.enrich_batch(datums)
+    log_timings(results)
+    engrams = [build_engram(d, r) for d, r in zip(datums, results)]
+    store.insert_batch(datums, engrams)
+    return len(datums)
+
+
+def describe_payload(payload):
+    """A queue message as readable text for the error table."""
+    try:
+        return json.dumps(decode_message(payload).to_dict(), default=str)
+    except Exception:
+        return repr(payload)
+
+
+def error_record(payload, error):
+    """An `error` table row for a message that was dead-lettered."""
+    now = datetime.now(timezone.utc)
+    return {
+        "id": str(uuid.uuid4()),
+        "unix_ts": int(now.timestamp()),
+        "iso_ts": now.isoformat(),
+        "input_data": describe_payload(payload),
+        "error_message": "".join(
+            traceback.format_exception(type(error), error, error.__traceback__)
+        ),
+    }
+
+
+def park_failure(retries, payload, error, permanent=False):
+    """
+    Schedules a failed message for a retry, or dead-letters it once its
+    attempts are used up (at once if retrying can't help). Returns
+    "retry", "dead", or None if the message could not be parked, in which
+    case it must not be acked.
+    """
+    ERRORS.inc(type=type(error).__name__)
+    permanent = permanent or isinstance(error, PERMANENT_ERRORS)
+    try:
+        outcome, value = retries.fail(payload, error, permanent=permanent)
+    except Exception as e:
+        ERRORS.inc(type="retry_schedule")
+        logger.error(f"Could not schedule a retry ({e}); leaving message unacked.")
+        return None
+    if outcome == "retry":
+        MESSAGES.inc(status="retried")
+        logger.warning(f"Message failed ({error}); retrying in {value:.1f}s.")
+    else:
+        MESSAGES.inc(status="dead_lettered")
+        logger.error(f"Message dead-lettered after {value} attempts: {error}")
+    return outcome
+
+
+def record_failure(retries, store, payload, error):
+    """
+    `park_failure`, logging dead letters to the error table. Returns False
+    if the message could not be parked and must not be acked.
+    """
+    outcome = park_failure(retries, payload, error)
+    if outcome == "dead":
+        try:
+            store.insert_error(error_record(payload, error))
+        except Exception as e:
+            # The DLQ holds the payload; the error table is only a record of it
+            logger.warning(f"Could not log dead letter to the error table: {e}")
+    return outcome is not None
+
+
+def run_batched(consumer, store, runner, retries, batch_size, linger_ms):
+    """
+    Read the queue in batches, bulk insert each batch and ack it once the
+    store commit succeeded. A failed batch is retried message by message
+    to isolate the bad ones, which go to the retry queue. If the store is
+    unreachable the batch is handed back without using any attempts and
+    reading pauses with a growing backoff until the store is back.
+    """
+    logger.info(
+        f"Batch mode: up to {batch_size} messages, linger {linger_ms} ms per batch."
+    )
+    outages = 0
+    while True:
+        batch = consumer.read(batch_size, linger_ms)
+        if not batch:
+            continue
+        BATCH_SIZE.observe(len(batch))
+        start = time.perf_counter()
+        written = 0
+        acked = []
+        failed = []
+        unavailable = None
+        try:
+            written = process_batch(store, runner, [m for _, m in batch])
+            acked = [mid for mid, _ in batch]
+        except Exception as e:
+            ERRORS.inc(type=type(e).__name__)
+            if store_unavailable(e):
+                unavailable = e
+                failed = list(batch)
+            else:
+                logger.error(f"Batch of {len(batch)} failed: {e}. Retrying one by one.")
+                for mid, m in batch:
+                    if unavailable:
+                        failed.append((mid, m))
+                        continue
+                    try:
+                        written += process_batch(store, runner, [m])
+                        acked.append(mid)
+                    except Exception as e:
+                        if store_unavailable(e):
+                            ERRORS.inc(type=type(e).__name__)
+                            unavailable = e
+                            failed.append((mid, m))
+                        elif record_failure(retries, store, m, e):
+                            acked.append(mid)
+                        else:
+                            failed.append((mid, m))
+        consumer.ack(acked)
+        MESSAGES.inc(written, status="ok")
+        if failed:
+            # Not written and not parked: back to the list, or left pending
+            # on a stream until reclaimed. Either way no attempt is used
+            consumer.nack(failed)
+        if unavailable:
+            outages += 1
+            pause = outage_pause(outages)
+            logger.error(
+                f"Store unavailable: {unavailable}. Returned {len(failed)} "
+                f"messages, pausing reads for {pause:.0f}s."
+            )
+            time.sleep(pause)
+            continue
+        outages = 0
+        if failed:
+            time.sleep(1)
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"Batch committed: {written}/{len(batch)} messages in "
+            f"{elapsed * 1000:.1f} ms ({written / elapsed:.0f} msg/s)"
+        )
+
+
+def start_retry_scheduler(retries, interval_s):
+    """Re-enqueue due retries in the background, in batches."""
+
+    def loop():
+        while True:
+            try:
+                moved = retries.release_due()
+                if moved:
+                    logger.info(f"Re-enqueued {moved} messages for retry.")
+            except Exception as e:
+                ERRORS.inc(type=type(e).__name__)
+                logger.error(f"Retry scheduler failed: {e}")
+                moved = 0
+            # Keep going while there is a backlog of due retries
+            if moved < config.PIPELINE_RETRY_BATCH:
+                time.sleep(interval_s)
+
+    threading.Thread(target=loop, name="retry-scheduler", daemon=True).start()
+
+
+def start_partition_maintenance(store, interval_s):
+    """Create upcoming partitions and detach expired ones in the background."""
+
+    def loop():
+        while True:
+            try:
+                store.maintain_partitions()
+            except Exception as e:
+                ERRORS.inc(type=type(e).__name__)
+                logger.error(f"Partition maintenance failed: {e}")
+            time.sleep(interval_s)
+
+    threading.Thread(target=loop, name="partition-maintenance", daemon=True).start()
+
+
+def make_consumer(redis_client, queue_name, consumer_name):
+    """Build the queue consumer for the configured backend."""
+    if config.QUEUE_BACKEND == "stream":
+        consumer = redis.StreamConsumer(
+            redis_client,
+            queue_name,
+            config.STREAM_GROUP,
+            consumer_name,
+            claim_idle_ms=config.STREAM_CLAIM_IDLE_MS,
+        )
+        consumer.ensure_group()
+        logger.info(
+            f"Consuming stream {queue_name} as {config.STREAM_GROUP}/{consumer_name}"
+        )
+        return consumer
+    return redis.ListConsumer(redis_client, queue_name)
 
 
 def main():
-    """Main function to listen to Redis and forward to Postgres."""
+    """Main function to listen to Redis and forward to the store."""
     parser = argparse.ArgumentParser(
-        description="Relic Pipeline to listen to Redis and forward to Postgres."
+        description="Relic Pipeline to listen to Redis and forward to the store."
     )
     parser.add_argument(
         "--network",
         type=str,
         help="Network configuration (e.g., 'localhost' for local Redis)",
     )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Drain the queue in batches and write each batch in one transaction.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=config.PIPELINE_BATCH_SIZE,
+        help="Maximum number of messages per batch (batch mode only).",
+    )
+    parser.add_argument(
+        "--linger-ms",
+        type=int,
+        default=config.PIPELINE_LINGER_MS,
+        help="How long to wait for a batch to fill after the first message.",
+    )
+    parser.add_argument(
+        "--async",
+        dest="async_mode",
+        action="store_true",
+        help="Process up to --concurrency messages at once on asyncio.",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=config.PIPELINE_CONCURRENCY,
+        help="Messages in flight at once (async mode only).",
+    )
+    parser.add_argument(
+        "--consumer",
+        type=str,
+        default=f"{socket.gethostname()}-{os.getpid()}",
+        help="Consumer name within the stream consumer group (stream backend only).",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=config.PIPELINE_METRICS_PORT,
+        help="Port for the Prometheus /metrics listener (0 disables it).",
+    )
     args = parser.parse_args()
 
     if args.network == "localhost":
         config.REDIS_HOST = "localhost"
         logger.info(f"Using local Redis host: {config.REDIS_HOST}")
 
-    redis_client = redis_connect(config.REDIS_HOST, config.REDIS_PORT)
+    redis_client = redis_connect(
+        config.REDIS_HOST, config.REDIS_PORT, queue_backend=config.QUEUE_BACKEND
+    )
     if not redis_client:
         return
 
-    pg_client = PgClient()
-    if not pg_client.conn:
-        logger.error("Could not connect to Postgres.")
+    store = open_store()
+    if store is None:
+        logger.error(f"Could not open the {config.STORE_BACKEND} store.")
         return
 
-    queue_name = "hub-inbox"
+    if store.is_partitioned():
+        start_partition_maintenance(store, config.PARTITION_MAINTENANCE_INTERVAL_S)
+
+    runner = EnrichmentRunner(
+        load_enrichers(config.PIPELINE_ENRICHERS),
+        max_workers=config.ENRICHMENT_WORKERS,
+    )
+    logger.info(f"Enrichment stages: {[[e.name for e in s] for s in runner.stages]}")
+
+    queue_name = config.QUEUE_NAME
     logger.info(f"Listening on Redis queue: {queue_name}")
 
-    while True:
-        message_json = None
-        try:
-            # Blocking pop from the Redis list
-            _, d = redis_client.blpop(queue_name)
-            datum_json = json.loads(d)
-            logger.info(f"Received message: {datum_json}")
-            pg_client.insert_datum(datum_json)
-            logger.info(f"datum logged to db")
-
-            ##################################
-            # Do some engram processing here #
-            logger.info(
-                f"Processing message <{datum_json['uuid'][0:8]}> into an engram..."
+    retries = RetryQueue(redis_client, queue_name)
+    start_retry_scheduler(retries, config.PIPELINE_RETRY_POLL_MS / 1000)
+
+    if args.metrics_port:
+        QUEUE_DEPTH.set_function(
+            lambda: {(queue_name,): redis_client.depth(queue_name)}
+        )
+        CONSUMER_LAG.set_function(
+            lambda: {
+                (queue_name,): redis_client.consumer_lag(
+                    queue_name, config.STREAM_GROUP
+                )
+            }
+        )
+        RETRY_PENDING.set_function(lambda: {(queue_name,): retries.pending()})
+        DEAD_LETTERS.set_function(lambda: {(queue_name,): retries.dead_count()})
+        start_http_server(args.metrics_port)
+        logger.info(f"Serving metrics on :{args.metrics_port}/metrics")
+
+    if args.async_mode:
+        from core.pipeline.worker import run_async
+
+        asyncio.run(run_async(redis_client, store, runner, retries, args))
+        runner.close()
+        store.close()
+        return
+
+    if args.batch or config.QUEUE_BACKEND == "stream":
+        # Streams always go through the acking batch loop; without --batch
+        # each batch is a single message.
+        consumer = make_consumer(redis_client, queue_name, args.consumer)
+        if args.batch:
+            run_batched(
+                consumer,
+                store,
+                runner,
+                retries,
+                args.batch_size,
+                args.linger_ms,
             )
-            engram_data = datum_json
-            engram_data["data_json"] = {"some_new_key": "some_processed_values"}
-            logger.info("Done!")
-            ##################################
-
-            # Insert into Postgres
-            if engram_data:
-                pg_client.insert_engram(engram_data)
-                logger.info("Inserted engram to Postgres.")
-            else:
-                logger.warning("No engram data to insert.")
+        else:
+            run_batched(consumer, store, runner, retries, 1, 0)
 
+    outages = 0
+    while True:
+        # Blocking pop from the Redis list
+        _, d = redis_client.blpop(queue_name)
+        try:
+            # Datum and engram are written in one transaction, so a retried
+            # message never finds its datum already inserted
+            process_batch(store, runner, [d])
+            logger.info("Inserted datum and engram to the store.")
+            MESSAGES.inc(status="ok")
+            outages = 0
         except Exception as e:
+            if store_unavailable(e):
+                # Back to the head of the list without using an attempt
+                ERRORS.inc(type=type(e).__name__)
+                redis_client.conn.lpush(queue_name, d)
+                outages += 1
+                pause = outage_pause(outages)
+                logger.error(f"Store unavailable: {e}. Pausing reads for {pause:.0f}s.")
+                time.sleep(pause)
+                continue
             logger.error(f"An unexpected error occurred: {e}")
             traceback.print_exc()
-            if message_json:
-                now = datetime.now(timezone.utc)
-                error_data = {
-                    "id": str(uuid.uuid4()),
-                    "unix_ts": int(now.timestamp()),
-                    "iso_ts": now.isoformat(),
-                    "input_data": message_json,
-                    "error_message": f"{e}\n{traceback.format_exc()}",
-                }
-                pg_client.insert_error(error_data)
-                logger.info("Error logged to Postgres.")
-
-    pg_client.close()
+            record_failure(retries, store, d, e)
+
+    runner.close()
+    store.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,175 @@
+import hashlib
+import random
+import time
+from datetime import datetime, timezone
+
+from core import config
+from core.stores.redis import STREAM_FIELD
+
+# Per-message retry state (attempts, last error, payload while scheduled)
+# outlives the longest backoff, then expires on its own, so messages that
+# eventually succeed need no cleanup on the hot path.
+STATE_TTL_S = 7 * 24 * 3600
+MAX_ERROR_CHARS = 4000
+
+# Moves up to ARGV[2] messages due by ARGV[1] from the retry set back onto
+# the hub queue (RPUSH for lists, XADD for streams) in one atomic step, so
+# schedulers on several pipeline workers never re-enqueue a message twice.
+RELEASE_DUE_LUA = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+local moved = 0
+for _, digest in ipairs(due) do
+    redis.call('ZREM', KEYS[1], digest)
+    local state = ARGV[4] .. digest
+    local payload = redis.call('HGET', state, 'payload')
+    if payload then
+        if ARGV[3] == 'stream' then
+            redis.call('XADD', KEYS[2], '*', ARGV[5], payload)
+        else
+            redis.call('RPUSH', KEYS[2], payload)
+        end
+        redis.call('HDEL', state, 'payload')
+        moved = moved + 1
+    end
+end
+return moved
+"""
+
+
+def payload_digest(payload):
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def retry_delay(attempt, base, cap):
+    """
+    Exponential backoff with equal jitter: between half and all of
+    min(cap, base * 2**(attempt - 1)), so a retry never comes straight
+    back while the cause (usually Postgres) is still down.
+    """
+    delay = min(cap, base * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def _text(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class RetryQueue:
+    """
+    Delayed retries and a dead-letter queue for messages the pipeline failed
+    to process.
+
+    A failed message is parked in the `<queue>:retry` sorted set, scored by
+    when it is due, and `release_due()` moves due messages back onto the
+    hub queue in batches. Once a message has failed `max_attempts` times it
+    is appended, with its original payload, to the `<queue>:dlq` stream,
+    from where `redrive()` can push it back. Attempts are counted per
+    payload digest, so they survive the trip through the hub queue.
+    """
+
+    def __init__(
+        self,
+        redis_conn,
+        queue=config.QUEUE_NAME,
+        max_attempts=config.PIPELINE_MAX_ATTEMPTS,
+        base_s=config.PIPELINE_RETRY_BASE_S,
+        max_s=config.PIPELINE_RETRY_MAX_S,
+    ):
+        self.redis = redis_conn
+        self.conn = redis_conn.conn
+        self.queue = queue
+        self.max_attempts = max_attempts
+        self.base_s = base_s
+        self.max_s = max_s
+        self.retry_key = f"{queue}:retry"
+        self.dlq_key = f"{queue}:dlq"
+        self.state_prefix = f"{queue}:retry:msg:"
+        self._release = self.conn.register_script(RELEASE_DUE_LUA)
+
+    def fail(self, payload, error, permanent=False):
+        """
+        Records a failed attempt. Schedules the message for another one
+        after a backoff, or dead-letters it when it has run out of attempts
+        (or straight away if the failure is `permanent`). Returns
+        ("retry", delay_s) or ("dead", attempts).
+        """
+        digest = payload_digest(payload)
+        state = self.state_prefix + digest
+        attempts = self.conn.hincrby(state, "attempts", 1)
+        error = str(error)[:MAX_ERROR_CHARS]
+        if permanent or attempts >= self.max_attempts:
+            pipe = self.conn.pipeline()
+            pipe.xadd(
+                self.dlq_key,
+                {
+                    STREAM_FIELD: payload,
+                    "digest": digest,
+                    "attempts": attempts,
+                    "error": error,
+                    "failed_at": datetime.now(timezone.utc).isoformat(),
+                },
+            )
+            pipe.delete(state)
+            pipe.execute()
+            return "dead", attempts
+        delay = retry_delay(attempts, self.base_s, self.max_s)
+        pipe = self.conn.pipeline()
+        pipe.hset(state, mapping={"payload": payload, "error": error})
+        pipe.expire(state, STATE_TTL_S)
+        pipe.zadd(self.retry_key, {digest: time.time() + delay})
+        pipe.execute()
+        return "retry", delay
+
+    def release_due(self, count=config.PIPELINE_RETRY_BATCH):
+        """Re-enqueues up to `count` messages whose retry is due. Returns how many."""
+        return self._release(
+            keys=[self.retry_key, self.queue],
+            args=[
+                time.time(),
+                count,
+                self.redis.queue_backend,
+                self.state_prefix,
+                STREAM_FIELD,
+            ],
+        )
+
+    def pending(self):
+        """Messages waiting for a retry."""
+        return self.conn.zcard(self.retry_key)
+
+    def dead_count(self):
+        return self.conn.xlen(self.dlq_key)
+
+    def dead_letters(self, count=None, start="-"):
+        """Dead-lettered messages, oldest first, as dicts with their stream `id`."""
+        entries = self.conn.xrange(self.dlq_key, min=start, count=count)
+        return [
+            {
+                "id": _text(entry_id),
+                "payload": fields.get(STREAM_FIELD),
+                "digest": _text(fields.get(b"digest")),
+                "attempts": int(fields.get(b"attempts") or 0),
+                "error": _text(fields.get(b"error")),
+                "failed_at": _text(fields.get(b"failed_at")),
+            }
+            for entry_id, fields in entries
+        ]
+
+    def redrive(self, entries):
+        """
+        Pushes dead-lettered messages back onto the hub queue with a fresh
+        set of attempts and removes them from the DLQ. Returns how many.
+        """
+        entries = [e for e in entries if e["payload"] is not None]
+        if not entries:
+            return 0
+        self.redis.enqueue(self.queue, [e["payload"] for e in entries])
+        self.discard(entries)
+        return len(entries)
+
+    def discard(self, entries):
+        """Deletes dead-lettered messages for good."""
+        if entries:
+            self.conn.xdel(self.dlq_key, *[e["id"] for e in entries])
@@ -0,0 +1,307 @@
+import asyncio
+import signal
+import time
+
+from loguru import logger
+
+from core import config
+from core.metrics import REGISTRY
+from core.pipeline.main import (
+    ERRORS,
+    MESSAGES,
+    STAGE_SECONDS,
+    build_engram,
+    error_record,
+    log_timings,
+    outage_pause,
+    park_failure,
+    store_unavailable,
+)
+from core.stores import redis
+from core.types.codec import decode_message
+
+IN_FLIGHT = REGISTRY.gauge(
+    "relic_pipeline_in_flight", "Messages being processed by the async worker."
+)
+
+
+class ThreadedStore:
+    """
+    Async face of a synchronous store (PgClient, SqliteClient): each call
+    runs in a worker thread, so a thread-safe store still gets concurrent
+    writes when asyncpg isn't available or the backend is SQLite.
+    """
+
+    permanent_errors = ()
+    is_unavailable = staticmethod(store_unavailable)
+
+    def __init__(self, store):
+        self.store = store
+
+    async def insert_batch(self, datums, engrams):
+        await asyncio.to_thread(self.store.insert_batch, datums, engrams)
+
+    async def insert_error(self, error_data):
+        await asyncio.to_thread(self.store.insert_error, error_data)
+
+    async def close(self):
+        pass
+
+
+def ordered_collectors(value=config.PIPELINE_ORDERED_COLLECTORS):
+    """`*` for every collector, else the comma-separated collector names."""
+    names = {c.strip() for c in value.split(",") if c.strip()}
+    return True if "*" in names else names
+
+
+class AsyncWorker:
+    """
+    Consumes the hub queue with up to `concurrency` messages in flight:
+    while one message waits on Postgres or an I/O-bound enricher, others
+    make progress. Messages from collectors in `ordered` are processed one
+    after another in queue order; everything else runs freely.
+
+    Each message is decoded, enriched, written (datum and engram in one
+    transaction) and acked on its own. Failures go to the retry queue; when
+    the store is unreachable messages are handed back without using an
+    attempt and the worker stops taking new ones for a backoff. `stop()` stops reading
+    and lets in-flight messages finish for up to `drain_timeout_s`.
+    """
+
+    def __init__(
+        self,
+        consumer,
+        store,
+        runner,
+        retries,
+        concurrency=config.PIPELINE_CONCURRENCY,
+        ordered=None,
+        drain_timeout_s=config.PIPELINE_DRAIN_TIMEOUT_S,
+    ):
+        self.consumer = consumer
+        self.store = store
+        self.runner = runner
+        self.retries = retries
+        self.concurrency = concurrency
+        self.ordered = ordered_collectors() if ordered is None else ordered
+        self.drain_timeout_s = drain_timeout_s
+        self.in_flight = {}
+        # Last task per ordered collector; the next message waits for it
+        self._tails = {}
+        self._stopping = asyncio.Event()
+        self._paused_until = 0.0
+        self._outage = 0
+
+    def stop(self):
+        if not self._stopping.is_set():
+            logger.info(f"Stopping: draining {len(self.in_flight)} in-flight messages.")
+            self._stopping.set()
+
+    def _is_ordered(self, collector):
+        return self.ordered is True or collector in self.ordered
+
+    async def run(self):
+        logger.info(
+            f"Async mode: up to {self.concurrency} messages in flight"
+            + (
+                f", ordered collectors: {'*' if self.ordered is True else sorted(self.ordered)}"
+                if self.ordered
+                else ""
+            )
+        )
+        try:
+            while not self._stopping.is_set():
+                if self._paused_until > time.monotonic():
+                    await self._sleep(self._paused_until - time.monotonic())
+                    continue
+                free = self.concurrency - len(self.in_flight)
+                if free <= 0:
+                    await asyncio.wait(
+                        list(self.in_flight.values()),
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                    continue
+                try:
+                    batch = await self.consumer.read(free, timeout=1)
+                except Exception as e:
+                    ERRORS.inc(type=type(e).__name__)
+                    logger.error(f"Queue read failed: {e}")
+                    await self._sleep(1)
+                    continue
+                for message_id, payload in batch:
+                    self._start(message_id, payload)
+        finally:
+            await self._drain()
+
+    async def _sleep(self, seconds):
+        try:
+            await asyncio.wait_for(self._stopping.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    def _start(self, message_id, payload):
+        key = message_id if message_id is not None else object()
+        if key in self.in_flight:
+            # Reclaimed while still being processed here
+            return
+        task = asyncio.create_task(self._process(message_id, payload))
+        self.in_flight[key] = task
+        IN_FLIGHT.set(len(self.in_flight))
+
+        def done(_):
+            self.in_flight.pop(key, None)
+            IN_FLIGHT.set(len(self.in_flight))
+
+        task.add_done_callback(done)
+
+    async def _process(self, message_id, payload):
+        previous = None
+        collector = None
+        try:
+            with STAGE_SECONDS.time(stage="decode"):
+                datum = decode_message(payload)
+            collector = datum["collector"]
+            if self._is_ordered(collector):
+                previous = self._tails.get(collector)
+                self._tails[collector] = asyncio.current_task()
+                if previous is not None:
+                    # Its outcome doesn't matter, only that it went first
+                    await asyncio.wait([previous])
+            with STAGE_SECONDS.time(stage="enrichment"):
+                result = await self.runner.run(datum)
+            log_timings([result])
+            await self.store.insert_batch([datum], [build_engram(datum, result)])
+        except asyncio.CancelledError:
+            # Drain timed out: hand the message back rather than drop it
+            await self._nack(message_id, payload)
+            raise
+        except Exception as e:
+            if self.store.is_unavailable(e):
+                ERRORS.inc(type=type(e).__name__)
+                self._pause(e)
+                await self._nack(message_id, payload)
+            elif await self._fail(payload, e):
+                await self._ack(message_id)
+            else:
+                await self._nack(message_id, payload)
+            return
+        finally:
+            if (
+                collector is not None
+                and self._tails.get(collector) is asyncio.current_task()
+            ):
+                del self._tails[collector]
+        self._outage = 0
+        MESSAGES.inc(status="ok")
+        await self._ack(message_id)
+
+    async def _ack(self, message_id):
+        try:
+            await self.consumer.ack([message_id])
+        except Exception as e:
+            # Left pending, so another read will hand it out again
+            ERRORS.inc(type=type(e).__name__)
+            logger.error(f"Ack failed: {e}")
+
+    async def _nack(self, message_id, payload):
+        """Returns a message to the queue (list) or leaves it pending (stream)."""
+        try:
+            await self.consumer.nack([(message_id, payload)])
+        except Exception as e:
+            ERRORS.inc(type=type(e).__name__)
+            logger.error(f"Nack failed, message lost: {e}")
+
+    def _pause(self, error):
+        """Stops reading for a backoff while the store is unreachable."""
+        # The other in-flight messages failing too is the same outage
+        if time.monotonic() >= self._paused_until:
+            self._outage += 1
+            pause = outage_pause(self._outage)
+            self._paused_until = time.monotonic() + pause
+            logger.error(f"Store unavailable: {error}. Pausing reads for {pause:.0f}s.")
+
+    async def _fail(self, payload, error):
+        """Parks a failed message; returns whether it may be acked."""
+        outcome = await asyncio.to_thread(
+            park_failure,
+            self.retries,
+            payload,
+            error,
+            isinstance(error, self.store.permanent_errors),
+        )
+        if outcome == "dead":
+            try:
+                await self.store.insert_error(error_record(payload, error))
+            except Exception as e:
+                logger.warning(f"Could not log dead letter to the error table: {e}")
+        return outcome is not None
+
+    async def _drain(self):
+        if self.in_flight:
+            done, pending = await asyncio.wait(
+                list(self.in_flight.values()), timeout=self.drain_timeout_s
+            )
+            if pending:
+                logger.warning(
+                    f"{len(pending)} messages still in flight after "
+                    f"{self.drain_timeout_s}s; returning them to the queue."
+                )
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+        logger.info("Async worker stopped.")
+
+
+async def open_async_store(store, use_asyncpg=True):
+    """
+    asyncpg for Postgres when it is installed and can connect, else `store`
+    run in threads (whose own reconnect handling then takes over).
+    """
+    if config.STORE_BACKEND == "postgres" and use_asyncpg:
+        from core.stores.postgres_async import AsyncPgClient
+
+        try:
+            return await AsyncPgClient.connect(
+                min_size=1, max_size=config.POSTGRES_POOL_MAX
+            )
+        except RuntimeError as e:
+            logger.warning(f"{e} Falling back to threads.")
+        except OSError as e:
+            logger.warning(f"{e}. Falling back to threads.")
+    return ThreadedStore(store)
+
+
+async def run_async(redis_client, store, runner, retries, args):
+    """Entry point of `main.py --async`."""
+    conn = await redis.async_connect(
+        config.REDIS_HOST,
+        config.REDIS_PORT,
+        max_connections=args.concurrency + 4,
+        queue_backend=config.QUEUE_BACKEND,
+    )
+    if conn is None:
+        return
+    if config.QUEUE_BACKEND == "stream":
+        consumer = redis.AsyncStreamConsumer(
+            conn,
+            config.QUEUE_NAME,
+            config.STREAM_GROUP,
+            args.consumer,
+            claim_idle_ms=config.STREAM_CLAIM_IDLE_MS,
+        )
+        await consumer.ensure_group()
+    else:
+        consumer = redis.AsyncListConsumer(conn, config.QUEUE_NAME)
+
+    async_store = await open_async_store(store)
+    worker = AsyncWorker(
+        consumer, async_store, runner, retries, concurrency=args.concurrency
+    )
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    try:
+        await worker.run()
+    finally:
+        await async_store.close()
+        await conn.close()
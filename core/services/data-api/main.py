@@ -0,0 +1,197 @@
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+from typing import Literal, Optional
+
+# Add the parent directory to the Python path to allow for absolute imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+
+from fastapi import Depends, FastAPI, HTTPException, Query, status
+from fastapi.responses import Response, StreamingResponse
+
+from core import config
+from core.auth import make_is_auth
+from core.stores.base import open_store
+
+COLUMNS = ("uuid", "unix_ts", "iso_ts", "collector", "source_type")
+NDJSON = "application/x-ndjson"
+
+is_auth = make_is_auth()
+app = FastAPI()
+store = None
+
+
+@app.on_event("startup")
+def startup_event():
+    global store
+    store = open_store()
+    if store is None:
+        raise RuntimeError(f"Could not open the {config.STORE_BACKEND} store")
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    if store:
+        store.close()
+
+
+def get_store():
+    return store
+
+
+# --- Encoding ---
+def encode_cursor(row):
+    """Opaque keyset cursor for the (unix_ts, uuid) of a row."""
+    return base64.urlsafe_b64encode(f"{row[1]}:{row[0]}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        unix_ts, uuid = base64.urlsafe_b64decode(cursor.encode()).decode().split(":", 1)
+        return int(unix_ts), uuid
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor."
+        )
+
+
+def row_json(row):
+    """
+    JSON bytes for a record row. data_json arrives from the store as text and
+    is spliced in as is rather than parsed and re-serialised.
+    """
+    columns = json.dumps(dict(zip(COLUMNS, row)), separators=(",", ":"))
+    return f'{columns[:-1]},"data_json":{row[5]}}}'.encode("utf-8")
+
+
+class RecordFilters:
+    """Query parameters shared by the page and stream endpoints."""
+
+    def __init__(
+        self,
+        start: int = Query(0, description="Earliest unix_ts (inclusive)."),
+        end: Optional[int] = Query(None, description="Latest unix_ts (inclusive)."),
+        collector: Optional[str] = None,
+        source_type: Optional[str] = None,
+        fields: Optional[str] = Query(
+            None,
+            description="Comma-separated data_json keys (dotted for nested) to return instead of the whole document.",
+        ),
+        order: Literal["asc", "desc"] = "desc",
+        cursor: Optional[str] = Query(
+            None, description="next_cursor from the previous page."
+        ),
+    ):
+        self.start = start
+        self.end = end if end is not None else int(time.time())
+        self.filters = {
+            "collector": collector,
+            "source_type": source_type,
+            "fields": [f for f in fields.split(",") if f] if fields else None,
+            "descending": order == "desc",
+            "after": decode_cursor(cursor) if cursor else None,
+        }
+
+
+# --- Endpoints ---
+@app.get("/health")
+async def health_check():
+    return {"status": "ok"}
+
+
+@app.get("/records/{table}")
+def list_records(
+    table: Literal["datum", "engram"],
+    limit: int = Query(100, ge=1, le=config.DATA_API_MAX_PAGE),
+    params: RecordFilters = Depends(),
+    client_id: str = Depends(is_auth),
+    store=Depends(get_store),
+):
+    """
+    One page of records, newest first by default. Pass `next_cursor` back as
+    `cursor` for the next page; it is null on the last page.
+    """
+    rows = store.query_page(
+        params.start, params.end, table=table, limit=limit, **params.filters
+    )
+    next_cursor = encode_cursor(rows[-1]) if len(rows) == limit else None
+    body = b'{"items":[' + b",".join(row_json(r) for r in rows) + b'],"next_cursor":'
+    body += json.dumps(next_cursor).encode() + b"}"
+    return Response(body, media_type="application/json")
+
+
+@app.get("/records/{table}/stream")
+def stream_records(
+    table: Literal["datum", "engram"],
+    params: RecordFilters = Depends(),
+    client_id: str = Depends(is_auth),
+    store=Depends(get_store),
+):
+    """Every matching record as NDJSON, streamed from the store in chunks."""
+
+    def lines():
+        for row in store.stream_records(
+            params.start, params.end, table=table, **params.filters
+        ):
+            yield row_json(row) + b"\n"
+
+    return StreamingResponse(lines(), media_type=NDJSON)
+
+
+@app.get("/search/{table}")
+def search_records(
+    table: Literal["datum", "engram"],
+    q: str = Query(..., min_length=1, description='Words, "phrases", or, -excluded.'),
+    limit: int = Query(20, ge=1, le=config.DATA_API_MAX_PAGE),
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    collector: Optional[str] = None,
+    source_type: Optional[str] = None,
+    client_id: str = Depends(is_auth),
+    store=Depends(get_store),
+):
+    """
+    Full-text search, best match first. Each item carries its `rank` and a
+    `headline` with the matched words wrapped in <b></b>.
+    """
+    rows = store.search(
+        q,
+        table=table,
+        limit=limit,
+        ts_start=start,
+        ts_end=end,
+        collector=collector,
+        source_type=source_type,
+    )
+    items = []
+    for row in rows:
+        extra = json.dumps({"rank": row[6], "headline": row[7]}, separators=(",", ":"))
+        items.append(row_json(row)[:-1] + b"," + extra[1:].encode("utf-8"))
+    return Response(
+        b'{"items":[' + b",".join(items) + b"]}", media_type="application/json"
+    )
+
+
+@app.get("/records/{table}/{uuid}")
+def get_record(
+    table: Literal["datum", "engram"],
+    uuid: str,
+    client_id: str = Depends(is_auth),
+    store=Depends(get_store),
+):
+    row = store.get_record(uuid, table=table)
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found.")
+    return Response(row_json(row), media_type="application/json")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Relic data API")
+    parser.add_argument("--port", type=int, default=config.DATA_API_PORT)
+    args = parser.parse_args()
+    uvicorn.run(app, host="0.0.0.0", port=args.port)
@@ -0,0 +1,327 @@
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+# Add the parent directory to the Python path to allow for absolute imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+
+from fastapi import Depends, FastAPI
+from fastapi.responses import StreamingResponse
+from loguru import logger
+from pydantic import BaseModel, Field
+
+from core import config
+from core.auth import make_is_auth
+from core.services.rag.models import EMBEDDERS, LLMS, load_plugin, record_text
+from core.stores.postgres import PgClient
+from core.stores.vectors import META_FILE, IVFIndex, open_index
+
+NDJSON = "application/x-ndjson"
+# Reciprocal rank fusion constant; larger values flatten the top ranks
+RRF_K = 60
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+# Question words that would otherwise OR-match most of the corpus
+STOPWORDS = set(
+    "a an and are about did do does for from had has have how i in is it me my "
+    "of on or the to was were what when where which who why with you".split()
+)
+# Longest excerpt of a single record put into the prompt
+MAX_SOURCE_CHARS = 1000
+
+is_auth = make_is_auth()
+app = FastAPI()
+pg_client = None
+llm = None
+embedder = None
+graphiti = None
+retrievers = {}
+
+
+@dataclass
+class Candidate:
+    id: str
+    text: str
+    unix_ts: int = None
+    iso_ts: str = None
+    collector: str = None
+    score: float = 0.0
+    retrievers: list = field(default_factory=list)
+
+
+def from_row(row):
+    return Candidate(row[0], record_text(json.loads(row[5])), row[1], row[2], row[3])
+
+
+def normalise_query(query):
+    return " ".join(query.lower().split()).strip(" ?!.")
+
+
+def fulltext_query(query):
+    """OR of the query's content words in web search syntax, for ranked recall."""
+    words = dict.fromkeys(WORD_RE.findall(query.lower()))
+    return " or ".join(w for w in words if w not in STOPWORDS)
+
+
+def rrf_fuse(rankings, limit, k=RRF_K):
+    """
+    Reciprocal rank fusion: each candidate scores the sum of 1 / (k + rank)
+    over the retrievers that returned it, so agreement between retrievers
+    beats a high rank in one of them and raw scores never need comparing.
+    """
+    fused = {}
+    for name, candidates in rankings.items():
+        for rank, candidate in enumerate(candidates, 1):
+            entry = fused.setdefault(candidate.id, candidate)
+            entry.score += 1 / (k + rank)
+            entry.retrievers.append(name)
+    return sorted(fused.values(), key=lambda c: -c.score)[:limit]
+
+
+class RetrievalCache:
+    """
+    LRU of fused retrieval results keyed by normalised query. An entry is
+    only served while the data watermark it was stored under is current,
+    so new captures invalidate it without any explicit purge.
+    """
+
+    def __init__(self, max_entries, ttl_s):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, watermark):
+        entry = self.entries.get(key)
+        if entry is not None:
+            created, mark, value = entry
+            if mark == watermark and time.monotonic() - created <= self.ttl_s:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self.entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, watermark, value):
+        self.entries[key] = (time.monotonic(), watermark, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self):
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+cache = RetrievalCache(config.RAG_CACHE_SIZE, config.RAG_CACHE_TTL_S)
+
+
+# --- Retrievers ---
+async def retrieve_fulltext(query, limit):
+    q = fulltext_query(query)
+    if not q:
+        return []
+    rows = await asyncio.to_thread(pg_client.search, q, table="datum", limit=limit)
+    return [from_row(row) for row in rows]
+
+
+_vector_state = {"mtime": None, "index": None}
+
+
+def vector_index():
+    """The index at VECTOR_INDEX_PATH, reopened whenever it has been saved since."""
+    try:
+        mtime = os.path.getmtime(os.path.join(config.VECTOR_INDEX_PATH, META_FILE))
+    except FileNotFoundError:
+        return None
+    if mtime != _vector_state["mtime"]:
+        index = open_index(config.VECTOR_INDEX_PATH)
+        if isinstance(index, IVFIndex):
+            index.nprobe = config.VECTOR_INDEX_NPROBE
+        _vector_state.update(mtime=mtime, index=index)
+    return _vector_state["index"]
+
+
+async def retrieve_vector(query, limit):
+    index = vector_index()
+    if index is None:
+        return []
+    [embedding] = await embedder.embed([query])
+    hits = await asyncio.to_thread(index.search, embedding, limit)
+    rows = await asyncio.to_thread(pg_client.get_records, [uuid for uuid, _ in hits])
+    by_uuid = {row[0]: row for row in rows}
+    return [from_row(by_uuid[uuid]) for uuid, _ in hits if uuid in by_uuid]
+
+
+async def retrieve_graph(query, limit):
+    edges = await graphiti.search(query, num_results=limit)
+    return [
+        Candidate(
+            f"graph:{edge.uuid}",
+            edge.fact,
+            iso_ts=edge.valid_at.isoformat() if edge.valid_at else None,
+            collector="graph",
+        )
+        for edge in edges
+    ]
+
+
+async def retrieve(query, top_k):
+    """
+    Runs every retriever concurrently, each capped at RAG_RETRIEVAL_TIMEOUT_S
+    so one slow backend can't hold up the answer, and fuses the results.
+    Returns (sources, cached, per-retriever report).
+    """
+    watermark = await asyncio.to_thread(pg_client.watermark)
+    key = (normalise_query(query), top_k)
+    sources = cache.get(key, watermark)
+    if sources is not None:
+        return sources, True, {}
+
+    report = {}
+
+    async def run(name, retriever):
+        start = time.perf_counter()
+        try:
+            found = await asyncio.wait_for(
+                retriever(query, top_k * 2), config.RAG_RETRIEVAL_TIMEOUT_S
+            )
+            report[name] = {"hits": len(found)}
+        except asyncio.TimeoutError:
+            found = []
+            report[name] = {"error": "timeout"}
+        except Exception as e:
+            logger.warning(f"{name} retrieval failed: {e}")
+            found = []
+            report[name] = {"error": type(e).__name__}
+        report[name]["ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return name, found
+
+    results = await asyncio.gather(*(run(n, r) for n, r in retrievers.items()))
+    sources = rrf_fuse(dict(results), top_k)
+    # Partial results aren't cached, so a timed-out retriever gets another go
+    if all("error" not in r for r in report.values()):
+        cache.put(key, watermark, sources)
+    return sources, False, report
+
+
+def build_prompt(query, sources):
+    notes = []
+    budget = config.RAG_CONTEXT_CHARS
+    for i, source in enumerate(sources, 1):
+        if budget <= 0:
+            break
+        text = source.text[: min(MAX_SOURCE_CHARS, budget)]
+        budget -= len(text)
+        notes.append(f"[{i}] {source.iso_ts or 'undated'} ({source.collector}): {text}")
+    return (
+        "You answer questions using only the user's own captured notes below. "
+        "Cite the notes you use as [n]. If they don't contain the answer, say so.\n\n"
+        "Notes:\n" + "\n".join(notes) + f"\n\nQuestion: {query}\nAnswer:"
+    )
+
+
+def line(event):
+    return json.dumps(event, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+# --- Endpoints ---
+@app.on_event("startup")
+async def startup_event():
+    global pg_client, llm, embedder, graphiti
+    pg_client = PgClient()
+    if pg_client.pool is None:
+        raise RuntimeError("Could not connect to Postgres")
+    llm = load_plugin(config.RAG_LLM, LLMS)
+    embedder = load_plugin(config.RAG_EMBEDDER, EMBEDDERS)
+    retrievers["fulltext"] = retrieve_fulltext
+    if embedder is not None:
+        retrievers["vector"] = retrieve_vector
+    if config.RAG_GRAPH:
+        from core.stores.graphiti import build_graphiti
+        from core.stores.graphiti_ingest import IngestStats
+
+        graphiti = build_graphiti(IngestStats())
+        retrievers["graph"] = retrieve_graph
+    logger.info(f"RAG retrievers: {', '.join(retrievers)}; LLM: {config.RAG_LLM}")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if pg_client:
+        pg_client.close()
+    if graphiti:
+        await graphiti.close()
+
+
+@app.get("/health")
+async def health_check():
+    return {"status": "ok", "retrievers": list(retrievers), "cache": cache.stats()}
+
+
+class AskRequest(BaseModel):
+    query: str = Field(..., min_length=1)
+    top_k: int = Field(config.RAG_TOP_K, ge=1, le=50)
+
+
+@app.post("/ask")
+async def ask(request: AskRequest, client_id: str = Depends(is_auth)):
+    """
+    Streams NDJSON events: `sources` (the fused context, as soon as
+    retrieval finishes), then a `token` per LLM chunk, then `done` with
+    time-to-first-token and total time in ms.
+    """
+    start = time.perf_counter()
+    sources, cached, report = await retrieve(request.query, request.top_k)
+    retrieval_ms = round((time.perf_counter() - start) * 1000, 1)
+    prompt = build_prompt(request.query, sources)
+
+    async def events():
+        yield line(
+            {
+                "type": "sources",
+                "cached": cached,
+                "retrieval_ms": retrieval_ms,
+                "retrievers": report,
+                "sources": [
+                    {
+                        "n": i,
+                        "id": s.id,
+                        "iso_ts": s.iso_ts,
+                        "collector": s.collector,
+                        "score": round(s.score, 5),
+                        "retrievers": s.retrievers,
+                        "text": s.text[:MAX_SOURCE_CHARS],
+                    }
+                    for i, s in enumerate(sources, 1)
+                ],
+            }
+        )
+        ttft_ms = None
+        try:
+            async for token in llm.stream(prompt):
+                if ttft_ms is None:
+                    ttft_ms = round((time.perf_counter() - start) * 1000, 1)
+                yield line({"type": "token", "text": token})
+        except Exception as e:
+            logger.exception(f"LLM stream failed: {e}")
+            yield line({"type": "error", "detail": str(e)})
+        total_ms = round((time.perf_counter() - start) * 1000, 1)
+        yield line({"type": "done", "ttft_ms": ttft_ms, "total_ms": total_ms})
+
+    return StreamingResponse(events(), media_type=NDJSON)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Relic RAG service")
+    parser.add_argument("--port", type=int, default=config.RAG_PORT)
+    args = parser.parse_args()
+    uvicorn.run(app, host="0.0.0.0", port=args.port)
@@ -0,0 +1,88 @@
+import asyncio
+import importlib
+import re
+
+from core import config
+from core.pipeline.enrichment.base import iter_text
+
+SOURCE_RE = re.compile(r"^\[(\d+)\]", re.MULTILINE)
+
+
+def record_text(data_json):
+    """The text a record is embedded and quoted by: all its strings, whitespace collapsed."""
+    return " ".join(" ".join(t.split()) for t in iter_text(data_json))
+
+
+class StubLLM:
+    """
+    Offline stand-in for tests and local runs: streams a canned answer that
+    cites every numbered source in the prompt, one word at a time.
+    """
+
+    def __init__(self, delay_s=0.0):
+        self.delay_s = delay_s
+
+    async def stream(self, prompt):
+        sources = SOURCE_RE.findall(prompt)
+        answer = f"Stub answer from {len(sources)} sources: " + " ".join(
+            f"[{s}]" for s in sources
+        )
+        for word in answer.split(" "):
+            if self.delay_s:
+                await asyncio.sleep(self.delay_s)
+            yield word + " "
+
+
+class GeminiLLM:
+    def __init__(self, model=config.RAG_LLM_MODEL, api_key=config.GRAPHITI_LLM_API_KEY):
+        from google import genai
+
+        self.client = genai.Client(api_key=api_key)
+        self.model = model
+
+    async def stream(self, prompt):
+        response = await self.client.aio.models.generate_content_stream(
+            model=self.model, contents=prompt
+        )
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+
+class GeminiEmbedder:
+    """Query/document embeddings from the same Gemini model Graphiti uses."""
+
+    def __init__(
+        self, model=config.RAG_EMBEDDING_MODEL, api_key=config.GRAPHITI_LLM_API_KEY
+    ):
+        from graphiti_core.embedder.gemini import (
+            GeminiEmbedder as Embedder,
+            GeminiEmbedderConfig,
+        )
+
+        self.client = Embedder(
+            config=GeminiEmbedderConfig(api_key=api_key, embedding_model=model)
+        )
+
+    async def embed(self, texts):
+        return await self.client.create_batch(texts)
+
+
+LLMS = {"stub": StubLLM, "gemini": GeminiLLM}
+EMBEDDERS = {"none": lambda: None, "gemini": GeminiEmbedder}
+
+
+def load_plugin(spec, builtins):
+    """
+    A built-in model by name, or `package.module:factory` for your own.
+    LLMs provide `async stream(prompt)` yielding text chunks; embedders
+    provide `async embed(texts)` returning one vector per text.
+    """
+    if spec in builtins:
+        return builtins[spec]()
+    module, _, factory = spec.partition(":")
+    if not factory:
+        raise ValueError(
+            f"Unknown model {spec!r}: use one of {sorted(builtins)} or module:factory"
+        )
+    return getattr(importlib.import_module(module), factory)()
@@ -0,0 +1,79 @@
+from typing import Iterator, Optional, Protocol
+
+from loguru import logger
+
+from core import config
+
+# Record rows are (uuid, unix_ts, iso_ts, collector, source_type,
+# data_json_text); search rows add (rank, headline) with higher ranks first.
+
+
+class Store(Protocol):
+    """
+    The record store the pipeline and the data API are written against.
+    Implemented by PgClient (core/stores/postgres.py) and SqliteClient
+    (core/stores/sqlite.py); pick one with STORE_BACKEND.
+    """
+
+    def init_schema(self, partitioned: bool = False) -> None: ...
+
+    def is_partitioned(self) -> bool: ...
+
+    def maintain_partitions(self) -> None: ...
+
+    def insert_datum(self, datum_data) -> None: ...
+
+    def insert_engram(self, engram_data) -> None: ...
+
+    def insert_batch(self, datums, engrams) -> None:
+        """Insert datums and engrams in one transaction: all or nothing."""
+
+    def insert_error(self, error_data) -> None: ...
+
+    def query_page(
+        self,
+        ts_start: int,
+        ts_end: int,
+        table: str = "datum",
+        limit: int = 100,
+        **filters,
+    ) -> list:
+        """One keyset page; filters are collector, source_type, after, descending, fields."""
+
+    def stream_records(
+        self, ts_start: int, ts_end: int, table: str = "datum", **filters
+    ) -> Iterator[tuple]: ...
+
+    def search(
+        self, query: str, table: str = "datum", limit: int = 20, **filters
+    ) -> list:
+        """Ranked full-text search in web search syntax ("phrase", or, -excluded)."""
+
+    def get_record(self, uuid: str, table: str = "datum") -> Optional[tuple]: ...
+
+    def get_records(self, uuids, table: str = "datum") -> list: ...
+
+    def watermark(self) -> tuple:
+        """A value that changes whenever records are inserted."""
+
+    def close(self) -> None: ...
+
+
+def open_store(backend=config.STORE_BACKEND):
+    """The configured record store, or None if it can't be opened."""
+    if backend == "sqlite":
+        import sqlite3
+
+        from core.stores.sqlite import SqliteClient
+
+        try:
+            return SqliteClient()
+        except sqlite3.Error as e:
+            logger.error(f"Error opening SQLite store at {config.SQLITE_PATH}: {e}")
+            return None
+    if backend == "postgres":
+        from core.stores.postgres import PgClient
+
+        pg_client = PgClient()
+        return pg_client if pg_client.pool else None
+    raise ValueError(f"Unknown STORE_BACKEND: {backend!r}")
@@ -0,0 +1,103 @@
+import hashlib
+import mmap
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+
+from core import config
+
+# data_json key under which a datum references its blob
+BLOB_KEY = "blob"
+DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class BlobTooLarge(Exception):
+    pass
+
+
+def blob_ref(data_json):
+    """The blob reference of a datum's data_json, or None."""
+    ref = data_json.get(BLOB_KEY) if isinstance(data_json, dict) else None
+    if isinstance(ref, dict) and DIGEST_RE.match(str(ref.get("sha256", ""))):
+        return ref
+    return None
+
+
+class BlobWriter:
+    """
+    Streams chunks into a temporary file in the store while hashing them,
+    so an upload is never held in memory. `commit()` moves the file to its
+    content address, or drops it if that content is already stored.
+    """
+
+    def __init__(self, store, max_bytes):
+        self.store = store
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hash = hashlib.sha256()
+        fd, self.tmp_path = tempfile.mkstemp(dir=store.tmp_dir)
+        self.file = os.fdopen(fd, "wb")
+
+    def write(self, chunk):
+        self.size += len(chunk)
+        if self.max_bytes and self.size > self.max_bytes:
+            raise BlobTooLarge(f"Blob exceeds {self.max_bytes} bytes.")
+        self.hash.update(chunk)
+        self.file.write(chunk)
+
+    def commit(self):
+        """Returns ({"sha256", "size"}, deduplicated)."""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        digest = self.hash.hexdigest()
+        path = self.store.path(digest)
+        if os.path.exists(path):
+            os.remove(self.tmp_path)
+            return {"sha256": digest, "size": self.size}, True
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(self.tmp_path, path)
+        return {"sha256": digest, "size": self.size}, False
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class BlobStore:
+    """
+    Content-addressed blobs on the local filesystem, stored as
+    `root/ab/cd/<sha256>`. Identical uploads share one file, and a blob is
+    only visible at its address once it has been fully written and synced.
+    """
+
+    def __init__(self, root=config.BLOB_STORE_PATH):
+        self.root = root
+        self.tmp_dir = os.path.join(root, "tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def path(self, digest):
+        if not DIGEST_RE.match(digest):
+            raise ValueError(f"Invalid blob digest: {digest!r}")
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def writer(self, max_bytes=config.BLOB_MAX_BYTES):
+        return BlobWriter(self, max_bytes)
+
+    @contextmanager
+    def open(self, digest):
+        """
+        Memory-maps a blob read-only. Pages are read from disk only as they
+        are touched, so inspecting a header doesn't load the whole file.
+        """
+        with open(self.path(digest), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield b""
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped
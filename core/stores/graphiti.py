@@ -8,6 +8,7 @@ from graphiti_core.llm_client.gemini_client import GeminiClient, LLMConfig
 
 # Add the parent directory to the Python path to allow for absolute imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+import argparse
 import asyncio
 import json
 import logging
@@ -18,31 +19,89 @@ from dotenv import load_dotenv
 from graphiti_core import Graphiti
 from graphiti_core.nodes import EpisodeType
 from graphiti_core.search.search_config_recipes import NODE_HYBRID_SEARCH_RRF
+from graphiti_core.utils.bulk_utils import RawEpisode
 from loguru import logger
 
 from core import config
+from core.stores.graphiti_ingest import (
+    Checkpoint,
+    IngestStats,
+    RateLimiter,
+    ingest_episodes,
+    ingest_episodes_bulk,
+    rate_limit_client,
+)
+from core.stores.llm_cache import cache_client, open_cache
+from core.stores.replay import iter_replay
 
 # Google API key configuration
 api_key = config.GRAPHITI_LLM_API_KEY
 
-# Initialize Graphiti with Gemini clients
-graphiti = Graphiti(
-    config.NEO4J_URI,
-    config.NEO4J_USER,
-    config.NEO4J_PASSWORD,
-    llm_client=GeminiClient(
+
+def build_graphiti(
+    stats,
+    llm_rpm=config.GRAPHITI_LLM_RPM,
+    embed_rpm=config.GRAPHITI_EMBED_RPM,
+    llm_client=None,
+    embedder=None,
+    cross_encoder=None,
+    cache=None,
+):
+    """
+    Graphiti with Gemini clients (or the given stand-ins, e.g. stubs in
+    tests), each rate limited and counted in `stats`. With a `cache` (see
+    core.stores.llm_cache), repeat calls are answered locally before they
+    reach the rate limiter.
+    """
+    llm_client = llm_client or GeminiClient(
         config=LLMConfig(api_key=api_key, model="gemini-2.0-flash")
-    ),
-    embedder=GeminiEmbedder(
+    )
+    embedder = embedder or GeminiEmbedder(
         config=GeminiEmbedderConfig(api_key=api_key, embedding_model="embedding-001")
-    ),
-    cross_encoder=GeminiRerankerClient(
+    )
+    cross_encoder = cross_encoder or GeminiRerankerClient(
         config=LLMConfig(api_key=api_key, model="gemini-2.5-flash-lite-preview-06-17")
-    ),
-)
+    )
+    # The reranker shares the LLM quota
+    llm_limiter = RateLimiter(llm_rpm)
+    clients = {
+        "llm": rate_limit_client(llm_client, "llm", llm_limiter, stats),
+        "embedder": rate_limit_client(
+            embedder, "embedder", RateLimiter(embed_rpm), stats
+        ),
+        "cross_encoder": rate_limit_client(
+            cross_encoder, "cross_encoder", llm_limiter, stats
+        ),
+    }
+    if cache is not None:
+        clients = {kind: cache_client(c, kind, cache) for kind, c in clients.items()}
+    return Graphiti(
+        config.NEO4J_URI,
+        config.NEO4J_USER,
+        config.NEO4J_PASSWORD,
+        llm_client=clients["llm"],
+        embedder=clients["embedder"],
+        cross_encoder=clients["cross_encoder"],
+    )
+
+
+def episode_fields(replay_name, index, episode):
+    episode = episode.get("data_json", episode)  # --full replays
+    return dict(
+        name=f"Replay: {replay_name} {index}",
+        episode_body=(episode["form_text"]),
+        source=EpisodeType.text,
+        source_description=f"quicklog from {episode["device"]} at {json.dumps(episode["location"])}",
+        reference_time=datetime.now(timezone.utc),
+    )
 
 
-async def main():
+async def main(args):
+    stats = IngestStats()
+    cache = None if args.no_cache else open_cache()
+    graphiti = build_graphiti(
+        stats, llm_rpm=args.llm_rpm, embed_rpm=args.embed_rpm, cache=cache
+    )
     #################################################
     # INITIALIZATION
     #################################################
@@ -62,22 +121,39 @@ async def main():
         # and relationships.
         #################################################
 
-        # Example: Add Episodes
-        # Episodes list containing both text and JSON episodes
-        with open("devtools/replays/20250824-234750.json", "r") as file:
-            episodes = json.load(file)
-        # Add episodes to the graph
-        for i, episode in enumerate(episodes):
-            await graphiti.add_episode(
-                name=f"Replay: 20250824-234750.json {i}",
-                episode_body=(episode["form_text"]),
-                source=EpisodeType.text,
-                source_description=f"quicklog from {episode["device"]} at {json.dumps(episode["location"])}",
-                reference_time=datetime.now(timezone.utc),
+        # Episodes are streamed from the replay and added with bounded
+        # concurrency; completed indices are checkpointed so an interrupted
+        # run resumes where it stopped
+        replay_name = os.path.basename(args.replay)
+        checkpoint = Checkpoint(
+            args.checkpoint or f"{args.replay}.checkpoint.json", replay_name
+        )
+        episodes = enumerate(iter_replay(args.replay))
+
+        if args.bulk:
+
+            async def add_episode_bulk(chunk):
+                await graphiti.add_episode_bulk(
+                    [RawEpisode(**episode_fields(replay_name, i, e)) for i, e in chunk]
+                )
+
+            await ingest_episodes_bulk(
+                episodes, add_episode_bulk, checkpoint, stats, args.chunk_size
             )
-            print(
-                f'Added episode {i + 1}/{len(episodes)}: {episode["form_text"][:50]}...'
+        else:
+
+            async def add_episode(index, episode):
+                fields = episode_fields(replay_name, index, episode)
+                await graphiti.add_episode(**fields)
+                print(f"Added episode {index + 1}: {fields['episode_body'][:50]}...")
+
+            await ingest_episodes(
+                episodes, add_episode, checkpoint, stats, args.concurrency
             )
+        summary = stats.summary()
+        if cache is not None:
+            summary["cache"] = cache.stats()
+        print(json.dumps(summary, indent=2))
 
         # #################################################
         # # BASIC SEARCH
@@ -188,8 +264,34 @@ async def main():
 
         # Close the connection
         await graphiti.close()
+        if cache is not None:
+            cache.close()
         print("\nConnection closed")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Load a replay into Graphiti.")
+    parser.add_argument(
+        "replay",
+        nargs="?",
+        default="devtools/replays/20250824-234750.json",
+        help="Replay from devtools/get_replay.py (.ndjson[.gz|.zst]) or a legacy .json.",
+    )
+    parser.add_argument("--concurrency", type=int, default=config.GRAPHITI_CONCURRENCY)
+    parser.add_argument("--llm-rpm", type=float, default=config.GRAPHITI_LLM_RPM)
+    parser.add_argument("--embed-rpm", type=float, default=config.GRAPHITI_EMBED_RPM)
+    parser.add_argument(
+        "--checkpoint", help="Checkpoint file (default: <replay>.checkpoint.json)."
+    )
+    parser.add_argument(
+        "--bulk",
+        action="store_true",
+        help="Use add_episode_bulk in chunks (skips edge invalidation).",
+    )
+    parser.add_argument("--chunk-size", type=int, default=20)
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Bypass the LLM/embedding cache (LLM_CACHE_BACKEND).",
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,232 @@
+import asyncio
+import functools
+import json
+import os
+import time
+from collections import Counter
+
+from loguru import logger
+
+# Coroutine methods Graphiti calls on each client kind
+CLIENT_METHODS = {
+    "llm": ("generate_response",),
+    "embedder": ("create", "create_batch"),
+    "cross_encoder": ("rank",),
+}
+
+
+class RateLimiter:
+    """
+    Async token bucket allowing `rate_per_minute` acquisitions per minute,
+    with bursts up to `burst` (defaults to one second's worth, at least 1).
+    A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate_per_minute, burst=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst or max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class IngestStats:
+    """Episode throughput and per-client call counters (the cost drivers)."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.episodes = 0
+        self.failed = 0
+        self.skipped = 0
+        self.calls = Counter()
+        self.call_errors = Counter()
+        self.input_chars = Counter()
+        self.wait_s = Counter()
+
+    def episodes_per_minute(self):
+        elapsed = time.monotonic() - self.started
+        return self.episodes / elapsed * 60 if elapsed > 0 else 0.0
+
+    def summary(self):
+        return {
+            "episodes": self.episodes,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "episodes_per_minute": round(self.episodes_per_minute(), 2),
+            "elapsed_s": round(time.monotonic() - self.started, 1),
+            "calls": dict(self.calls),
+            "call_errors": dict(self.call_errors),
+            # Rough token estimate (~4 chars per token) for cost accounting
+            "est_input_tokens": {k: v // 4 for k, v in self.input_chars.items()},
+            "rate_limit_wait_s": {k: round(v, 1) for k, v in self.wait_s.items()},
+        }
+
+
+def _text_size(value):
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_text_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_text_size(v) for v in value)
+    return len(getattr(value, "content", "") or "")
+
+
+def rate_limit_client(client, kind, limiter, stats):
+    """
+    Wraps the coroutine methods Graphiti uses on `client` (see CLIENT_METHODS)
+    so every call waits on `limiter` and is counted in `stats`. Methods are
+    patched on the instance so the client keeps its type for Graphiti.
+    """
+    for method_name in CLIENT_METHODS[kind]:
+        method = getattr(client, method_name, None)
+        if method is None:
+            continue
+
+        @functools.wraps(method)
+        async def limited(*args, _method=method, **kwargs):
+            waited = time.monotonic()
+            await limiter.acquire()
+            stats.wait_s[kind] += time.monotonic() - waited
+            stats.calls[kind] += 1
+            stats.input_chars[kind] += _text_size(args) + _text_size(kwargs)
+            try:
+                return await _method(*args, **kwargs)
+            except Exception:
+                stats.call_errors[kind] += 1
+                raise
+
+        setattr(client, method_name, limited)
+    return client
+
+
+class Checkpoint:
+    """
+    Set of completed episode indices for one replay, persisted as JSON after
+    every change. Writes go through a temp file and os.replace so a crash
+    never leaves a truncated checkpoint behind.
+    """
+
+    def __init__(self, path, replay):
+        self.path = path
+        self.replay = replay
+        self.done = set()
+        if path and os.path.exists(path):
+            with open(path, "r") as f:
+                state = json.load(f)
+            if state.get("replay") == replay:
+                self.done = set(state.get("done", []))
+            else:
+                logger.warning(
+                    f"Checkpoint {path} belongs to {state.get('replay')}, starting fresh."
+                )
+
+    def mark(self, *indices):
+        self.done.update(indices)
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"replay": self.replay, "done": sorted(self.done)}, f)
+        os.replace(tmp, self.path)
+
+
+async def ingest_episodes(
+    episodes,
+    add_episode,
+    checkpoint,
+    stats,
+    concurrency=4,
+    report_every=25,
+):
+    """
+    Feeds `(index, episode)` pairs to `add_episode(index, episode)` with at
+    most `concurrency` in flight. Indices already in `checkpoint` are
+    skipped; each success is checkpointed as it completes. Failed episodes
+    are logged and left out of the checkpoint so a rerun retries them.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    pending = set()
+
+    async def run(index, episode):
+        try:
+            await add_episode(index, episode)
+        except Exception as e:
+            stats.failed += 1
+            logger.error(f"Episode {index} failed: {e}")
+        else:
+            checkpoint.mark(index)
+            stats.episodes += 1
+            if stats.episodes % report_every == 0:
+                logger.info(
+                    f"{stats.episodes} episodes, {stats.episodes_per_minute():.1f}/min, "
+                    f"calls {dict(stats.calls)}"
+                )
+        finally:
+            semaphore.release()
+
+    for index, episode in episodes:
+        if index in checkpoint.done:
+            stats.skipped += 1
+            continue
+        # Acquire before creating the task so the replay is read lazily
+        await semaphore.acquire()
+        task = asyncio.create_task(run(index, episode))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    if pending:
+        await asyncio.gather(*pending)
+    return stats
+
+
+async def ingest_episodes_bulk(
+    episodes, add_episode_bulk, checkpoint, stats, chunk_size=20
+):
+    """
+    Bulk variant: hands chunks of `(index, episode)` pairs to
+    `add_episode_bulk(chunk)` one chunk at a time and checkpoints whole
+    chunks. Faster, but Graphiti's bulk API skips edge invalidation, so use
+    it for first loads rather than incremental updates.
+    """
+
+    async def flush(chunk):
+        try:
+            await add_episode_bulk(chunk)
+        except Exception as e:
+            stats.failed += len(chunk)
+            logger.error(f"Chunk starting at episode {chunk[0][0]} failed: {e}")
+            return
+        checkpoint.mark(*(index for index, _ in chunk))
+        stats.episodes += len(chunk)
+        logger.info(
+            f"{stats.episodes} episodes, {stats.episodes_per_minute():.1f}/min, "
+            f"calls {dict(stats.calls)}"
+        )
+
+    chunk = []
+    for index, episode in episodes:
+        if index in checkpoint.done:
+            stats.skipped += 1
+            continue
+        chunk.append((index, episode))
+        if len(chunk) >= chunk_size:
+            await flush(chunk)
+            chunk = []
+    if chunk:
+        await flush(chunk)
+    return stats
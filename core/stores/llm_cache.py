@@ -0,0 +1,268 @@
+import enum
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import Counter
+
+from loguru import logger
+
+from core import config
+
+CREATE_CACHE_TABLE = """ CREATE TABLE IF NOT EXISTS cache (
+                            key TEXT PRIMARY KEY,
+                            value BLOB NOT NULL,
+                            size INTEGER NOT NULL,
+                            created REAL NOT NULL,
+                            accessed REAL NOT NULL
+                        ); """
+# Eviction is checked every EVICT_EVERY writes rather than on each one
+EVICT_EVERY = 100
+
+
+def _canonical(value):
+    """Reduces client arguments (pydantic messages, response models...) to JSON."""
+    if isinstance(value, type) and hasattr(value, "model_json_schema"):
+        return {"schema": value.model_json_schema()}
+    if hasattr(value, "model_dump"):
+        return _canonical(value.model_dump())
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return repr(value)
+
+
+def cache_key(kind, model, args, kwargs=None):
+    """sha256 over the client kind, model name and canonicalised call arguments."""
+    payload = json.dumps(
+        [kind, model, _canonical(args), _canonical(kwargs or {})],
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _Cache:
+    def __init__(self):
+        self.hits = Counter()
+        self.misses = Counter()
+
+    def stats(self):
+        kinds = set(self.hits) | set(self.misses)
+        total_hits = sum(self.hits.values())
+        total = total_hits + sum(self.misses.values())
+        return {
+            "hits": dict(self.hits),
+            "misses": dict(self.misses),
+            "hit_rate": round(total_hits / total, 3) if total else 0.0,
+            "hit_rate_by_kind": {
+                k: round(self.hits[k] / (self.hits[k] + self.misses[k]), 3)
+                for k in kinds
+            },
+        }
+
+
+class SqliteCache(_Cache):
+    """
+    Cache in a local SQLite file. Entries older than `max_age_s` are dropped,
+    and once the stored values exceed `max_bytes` the least recently used
+    ones are evicted.
+    """
+
+    def __init__(self, path, max_bytes, max_age_s):
+        super().__init__()
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(CREATE_CACHE_TABLE)
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS cache_accessed ON cache(accessed)"
+        )
+        self.conn.commit()
+        self._writes = 0
+
+    def get(self, key):
+        row = self.conn.execute(
+            "SELECT value, created FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, created = row
+        now = time.time()
+        if self.max_age_s and now - created > self.max_age_s:
+            self.conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self.conn.commit()
+            return None
+        self.conn.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+        self.conn.commit()
+        return value
+
+    def put(self, key, value):
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+            (key, value, len(value), now, now),
+        )
+        self.conn.commit()
+        self._writes += 1
+        if self._writes % EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self):
+        if self.max_age_s:
+            self.conn.execute(
+                "DELETE FROM cache WHERE created < ?", (time.time() - self.max_age_s,)
+            )
+        total = self.conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM cache"
+        ).fetchone()[0]
+        if self.max_bytes and total > self.max_bytes:
+            # Trim to 90% so eviction doesn't run again on the next write
+            excess = total - int(self.max_bytes * 0.9)
+            keys = []
+            for key, size in self.conn.execute(
+                "SELECT key, size FROM cache ORDER BY accessed"
+            ):
+                keys.append((key,))
+                excess -= size
+                if excess <= 0:
+                    break
+            self.conn.executemany("DELETE FROM cache WHERE key = ?", keys)
+            logger.info(f"LLM cache evicted {len(keys)} entries.")
+        self.conn.commit()
+
+    def stats(self):
+        entries, size = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+        ).fetchone()
+        return {**super().stats(), "entries": entries, "bytes": size}
+
+    def close(self):
+        self.conn.close()
+
+
+class RedisCache(_Cache):
+    """
+    Cache in Redis. Age is enforced with key TTLs; size-based eviction is
+    left to the server's `maxmemory` / `allkeys-lru` policy.
+    """
+
+    def __init__(self, connection, max_age_s, prefix="llm-cache:"):
+        super().__init__()
+        self.connection = connection
+        self.max_age_s = max_age_s
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.connection.get(self.prefix + key)
+
+    def put(self, key, value):
+        self.connection.set(self.prefix + key, value, ex=self.max_age_s or None)
+
+    def close(self):
+        self.connection.close()
+
+
+def open_cache(backend=config.LLM_CACHE_BACKEND):
+    """The cache configured by LLM_CACHE_*, or None when disabled."""
+    if backend == "sqlite":
+        return SqliteCache(
+            config.LLM_CACHE_PATH,
+            max_bytes=config.LLM_CACHE_MAX_MB * 1024 * 1024,
+            max_age_s=config.LLM_CACHE_MAX_AGE_DAYS * 86400,
+        )
+    if backend == "redis":
+        import redis
+
+        return RedisCache(
+            redis.Redis(host=config.REDIS_HOST, port=config.REDIS_PORT),
+            max_age_s=config.LLM_CACHE_MAX_AGE_DAYS * 86400,
+        )
+    if backend == "none":
+        return None
+    raise ValueError(f"Unknown LLM cache backend: {backend}")
+
+
+def client_model(client):
+    """Best-effort model name, so switching models never serves stale results."""
+    for owner in (client, getattr(client, "config", None)):
+        for attr in ("model", "embedding_model"):
+            value = getattr(owner, attr, None)
+            if isinstance(value, str):
+                return value
+    return type(client).__name__
+
+
+def _dumps(value):
+    return json.dumps(_canonical(value)).encode("utf-8")
+
+
+def cache_client(client, kind, cache):
+    """
+    Serves repeat calls on `client` from `cache`. Patches `generate_response`
+    (LLM), `create` / `create_batch` (embedder; batches are cached per item
+    and only the misses are sent) and `rank` (reranker) on the instance.
+    Apply after rate limiting so cache hits skip the limiter. Results are
+    stored as JSON.
+    """
+    model = client_model(client)
+
+    def wrap(method_name, wrapper):
+        method = getattr(client, method_name, None)
+        if method is not None:
+            setattr(client, method_name, functools.wraps(method)(wrapper(method)))
+
+    def cached(method, restore=None):
+        async def call(*args, **kwargs):
+            key = cache_key(kind, model, args, kwargs)
+            value = cache.get(key)
+            if value is not None:
+                cache.hits[kind] += 1
+                value = json.loads(value)
+                return restore(value) if restore else value
+            cache.misses[kind] += 1
+            result = await method(*args, **kwargs)
+            cache.put(key, _dumps(result))
+            return result
+
+        return call
+
+    def cached_batch(method):
+        async def call(input_data_list, *args, **kwargs):
+            keys = [cache_key(kind, model, (item,)) for item in input_data_list]
+            results = [cache.get(key) for key in keys]
+            missing = [i for i, value in enumerate(results) if value is None]
+            cache.hits[kind] += len(keys) - len(missing)
+            cache.misses[kind] += len(missing)
+            results = [json.loads(v) if v is not None else None for v in results]
+            if missing:
+                fresh = await method(
+                    [input_data_list[i] for i in missing], *args, **kwargs
+                )
+                for i, value in zip(missing, fresh):
+                    results[i] = value
+                    cache.put(keys[i], _dumps(value))
+            return results
+
+        return call
+
+    if kind == "llm":
+        wrap("generate_response", cached)
+    elif kind == "embedder":
+        # create(x) and create_batch([x]) hash to the same key
+        wrap("create", cached)
+        wrap("create_batch", cached_batch)
+    elif kind == "cross_encoder":
+        # rank returns [(passage, score)]
+        wrap("rank", lambda method: cached(method, lambda v: [tuple(p) for p in v]))
+    return client
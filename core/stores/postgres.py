@@ -1,46 +1,150 @@
-import json
+import random
+import re
+import threading
+import time
+import weakref
 import psycopg2
+from contextlib import contextmanager
+from datetime import datetime, timezone
 from functools import wraps
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
 from loguru import logger
 
 from core import config
+from core.metrics import REGISTRY
+from core.types.codec import data_json_text
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "relic_pipeline_stage_seconds",
+    "Time spent per pipeline stage.",
+    ("stage",),
+)
+
+CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+
+def backoff_delay(attempt, base, cap):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+def month_start(ts):
+    """UTC start of the month containing unix timestamp `ts`."""
+    dt = datetime.fromtimestamp(ts, timezone.utc)
+    return datetime(dt.year, dt.month, 1, tzinfo=timezone.utc)
+
+
+def add_months(dt, months):
+    index = dt.year * 12 + dt.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(table, start):
+    return f"{table}_p{start.year:04d}_{start.month:02d}"
+
+
+def create_partition_sql(table, start):
+    """DDL for the monthly partition of `table` starting at `start` (UTC)."""
+    end = add_months(start, 1)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, start)} PARTITION OF {table} "
+        f"FOR VALUES FROM ({int(start.timestamp())}) TO ({int(end.timestamp())})"
+    )
 
 
 def with_reconnect(func):
+    """
+    Retries an operation on connection errors with jittered exponential
+    backoff. The broken connection is dropped from the pool by
+    `PgClient.connection`, so each retry checks out a fresh one.
+    """
+
     @wraps(func)
     def wrapper(self, *args, **kwargs):
-        try:
-            return func(self, *args, **kwargs)
-        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
-            logger.warning(f"Connection error in {func.__name__}: {e}. Reconnecting...")
-            self.close()
-            self.conn = self._create_connection(self.host)
-            if self.conn:
-                logger.info("Reconnected successfully. Retrying operation.")
+        for attempt in range(self.max_retries + 1):
+            try:
                 return func(self, *args, **kwargs)
-            else:
-                logger.error("Failed to reconnect. Operation failed.")
-                raise e
+            except CONNECTION_ERRORS as e:
+                if attempt == self.max_retries:
+                    logger.error(
+                        f"Connection error in {func.__name__}: {e}. "
+                        f"Giving up after {attempt + 1} attempts."
+                    )
+                    raise e
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                logger.warning(
+                    f"Connection error in {func.__name__}: {e}. "
+                    f"Retrying in {delay:.2f}s ({attempt + 1}/{self.max_retries})..."
+                )
+                time.sleep(delay)
 
     return wrapper
 
 
+class KeepOpenPool(ThreadedConnectionPool):
+    """
+    ThreadedConnectionPool that keeps every returned connection open.
+    psycopg2's pool closes a returned connection once `minconn` are idle,
+    so above that every checkout would reconnect; `minconn` still sets how
+    many connections are opened up front.
+    """
+
+    def __init__(self, minconn, maxconn, *args, **kwargs):
+        super().__init__(minconn, maxconn, *args, **kwargs)
+        self.minconn = maxconn
+
+
 class PgClient:
-    def __init__(self, host=config.POSTGRES_HOST):
+    """
+    Postgres store backed by a bounded, thread-safe connection pool.
+    Connections are health-checked on checkout and the single-row insert
+    paths use per-connection prepared statements. Inserts skip records
+    that are already stored, so redelivered messages are harmless. Tables
+    are not created here; run `init_schema()` once at deploy time
+    (devtools/init_db.py).
+    """
+
+    PREPARED_STATEMENTS = {
+        "relic_insert_datum": """ INSERT INTO datum(uuid,unix_ts,iso_ts,collector,source_type,data_json)
+                                  VALUES($1,$2,$3,$4,$5,$6) ON CONFLICT DO NOTHING """,
+        "relic_insert_engram": """ INSERT INTO engram(uuid,unix_ts,iso_ts,collector,source_type,data_json)
+                                   VALUES($1,$2,$3,$4,$5,$6) ON CONFLICT DO NOTHING """,
+    }
+
+    def __init__(
+        self,
+        host=config.POSTGRES_HOST,
+        minconn=config.POSTGRES_POOL_MIN,
+        maxconn=config.POSTGRES_POOL_MAX,
+    ):
         self.host = host
-        self.conn = self._create_connection(host)
-        if self.conn:
-            self._initialize_tables()
+        self.max_retries = config.POSTGRES_RETRIES
+        self.backoff_base = config.POSTGRES_BACKOFF_BASE
+        self.backoff_max = config.POSTGRES_BACKOFF_MAX
+        self.healthcheck_idle = config.POSTGRES_HEALTHCHECK_IDLE_S
+        # ThreadedConnectionPool raises when exhausted; the semaphore makes
+        # callers wait for a free connection instead.
+        self._slots = threading.BoundedSemaphore(maxconn)
+        # Keyed by the connection itself: ids are reused once one is closed
+        self._last_used = weakref.WeakKeyDictionary()
+        self._prepared = weakref.WeakSet()
+        self._partitioned = None
+        self._known_partitions = set()
+        self._partition_lock = threading.Lock()
+        self.pool = self._create_pool(host, minconn, maxconn)
 
-    def _create_connection(self, host):
-        """Create a database connection to the PostgreSQL database."""
+    def _create_pool(self, host, minconn, maxconn):
+        """Create a connection pool for the PostgreSQL database."""
         try:
             if config.POSTGRES_CONNECTION_STRING:
                 logger.info("Using connection string for PostgreSQL connection.")
-                return psycopg2.connect(config.POSTGRES_CONNECTION_STRING)
+                return KeepOpenPool(minconn, maxconn, config.POSTGRES_CONNECTION_STRING)
             else:
                 logger.info("Using individual parameters for PostgreSQL connection.")
-                return psycopg2.connect(
+                return KeepOpenPool(
+                    minconn,
+                    maxconn,
                     dbname=config.POSTGRES_DB,
                     user=config.POSTGRES_USER,
                     password=config.POSTGRES_PASSWORD,
@@ -51,11 +155,63 @@ class PgClient:
             logger.error(f"Error connecting to PostgreSQL: {e}")
             return None
 
-    def _initialize_tables(self):
-        """Create tables if they don't exist."""
-        self.create_table(self.CREATE_DATUM_TABLE)
-        self.create_table(self.CREATE_ENGRAM_TABLE)
-        self.create_table(self.CREATE_ERROR_TABLE)
+    def _discard(self, conn):
+        self._last_used.pop(conn, None)
+        self._prepared.discard(conn)
+        self.pool.putconn(conn, close=True)
+
+    def _checkout(self):
+        """Get a pooled connection, replacing it if it is closed or fails a ping."""
+        conn = self.pool.getconn()
+        idle = time.monotonic() - self._last_used.get(conn, 0)
+        if conn.closed:
+            self._discard(conn)
+            return self.pool.getconn()
+        if idle > self.healthcheck_idle:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()
+            except CONNECTION_ERRORS:
+                logger.warning("Discarding stale PostgreSQL connection.")
+                self._discard(conn)
+                return self.pool.getconn()
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for one unit of work and return it afterwards."""
+        if not self.pool:
+            raise psycopg2.OperationalError("No database connection pool.")
+        with self._slots:
+            conn = self._checkout()
+            try:
+                yield conn
+            except CONNECTION_ERRORS:
+                self._discard(conn)
+                raise
+            except BaseException:
+                # Also covers GeneratorExit from abandoned streaming readers
+                if not conn.closed:
+                    conn.rollback()
+                self._last_used[conn] = time.monotonic()
+                self.pool.putconn(conn)
+                raise
+            else:
+                self._last_used[conn] = time.monotonic()
+                self.pool.putconn(conn)
+
+    def _prepare(self, conn):
+        """Prepare the insert statements once per connection."""
+        if conn in self._prepared:
+            return
+        with conn.cursor() as cur:
+            for name, sql in self.PREPARED_STATEMENTS.items():
+                cur.execute(
+                    f"PREPARE {name} (text, integer, text, text, text, jsonb) AS {sql}"
+                )
+        conn.commit()
+        self._prepared.add(conn)
 
     CREATE_DATUM_TABLE = """ CREATE TABLE IF NOT EXISTS datum (
                                 uuid text PRIMARY KEY,
@@ -75,6 +231,17 @@ class PgClient:
                                 data_json jsonb NOT NULL
                             ); """
 
+    # Monthly range partitions on unix_ts; the partition key must be part of the PK
+    CREATE_PARTITIONED_TABLE = """ CREATE TABLE IF NOT EXISTS {table} (
+                                uuid text NOT NULL,
+                                unix_ts integer NOT NULL,
+                                iso_ts text NOT NULL,
+                                collector text NOT NULL,
+                                source_type text NOT NULL,
+                                data_json jsonb NOT NULL,
+                                PRIMARY KEY (uuid, unix_ts)
+                            ) PARTITION BY RANGE (unix_ts); """
+
     CREATE_ERROR_TABLE = """ CREATE TABLE IF NOT EXISTS error (
                                 id text PRIMARY KEY,
                                 unix_ts integer NOT NULL,
@@ -83,111 +250,466 @@ class PgClient:
                                 error_message text NOT NULL
                             ); """
 
+    # Created on the parent, so partitions inherit them
+    CREATE_INDEXES = [
+        "CREATE INDEX IF NOT EXISTS {table}_unix_ts_brin ON {table} USING brin (unix_ts)",
+        # Keyset pagination on (unix_ts, uuid)
+        "CREATE INDEX IF NOT EXISTS {table}_unix_ts_uuid ON {table} (unix_ts, uuid)",
+        "CREATE INDEX IF NOT EXISTS {table}_collector_source_ts ON {table} (collector, source_type, unix_ts)",
+        "CREATE INDEX IF NOT EXISTS {table}_data_json_gin ON {table} USING gin (data_json jsonb_path_ops)",
+        "CREATE INDEX IF NOT EXISTS {table}_search_tsv_gin ON {table} USING gin (search_tsv)",
+    ]
+
+    # Full-text index over every string value in data_json. A stored generated
+    # column is kept up to date by Postgres on each insert, so the pipeline's
+    # write path doesn't change. Added by ALTER so existing tables get it too.
+    ADD_SEARCH_COLUMN = """ ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_tsv tsvector
+                            GENERATED ALWAYS AS (
+                                jsonb_to_tsvector('{fts_config}'::regconfig, data_json, '["string"]')
+                            ) STORED """
+
+    PARTITION_RE = re.compile(r"^(datum|engram)_p(\d{4})_(\d{2})$")
+
+    def init_schema(self, partitioned=config.POSTGRES_PARTITIONED):
+        """
+        Create tables and indexes if they don't exist. Run once at deploy
+        time. With `partitioned`, datum and engram are range-partitioned by
+        month on unix_ts; this only applies to tables that don't exist yet.
+        """
+        if partitioned:
+            for table in ("datum", "engram"):
+                self.create_table(self.CREATE_PARTITIONED_TABLE.format(table=table))
+        else:
+            self.create_table(self.CREATE_DATUM_TABLE)
+            self.create_table(self.CREATE_ENGRAM_TABLE)
+        self.create_table(self.CREATE_ERROR_TABLE)
+        for table in ("datum", "engram"):
+            self.create_table(
+                self.ADD_SEARCH_COLUMN.format(
+                    table=table, fts_config=config.POSTGRES_FTS_CONFIG
+                )
+            )
+            for sql in self.CREATE_INDEXES:
+                self.create_table(sql.format(table=table))
+        if partitioned:
+            self.ensure_partitions()
+
+    @with_reconnect
+    def is_partitioned(self):
+        """Whether the datum table is partitioned (checked once, then cached)."""
+        if self._partitioned is None:
+            with self.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT relkind FROM pg_class WHERE relname = 'datum'")
+                    row = cur.fetchone()
+                conn.rollback()
+            self._partitioned = bool(row and row[0] == "p")
+        return self._partitioned
+
+    @with_reconnect
+    def create_partition(self, table, start):
+        """Create the monthly partition of `table` starting at `start` (UTC)."""
+        with self._partition_lock, self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(create_partition_sql(table, start))
+            conn.commit()
+        self._known_partitions.add((table, start))
+        return partition_name(table, start)
+
+    def ensure_partitions(self, start_ts=None, months_ahead=None):
+        """
+        Make sure monthly partitions exist from the month of `start_ts`
+        (default: now) up to `months_ahead` months in the future.
+        """
+        if not self.is_partitioned():
+            return
+        months_ahead = (
+            config.POSTGRES_PARTITION_MONTHS_AHEAD
+            if months_ahead is None
+            else months_ahead
+        )
+        start = month_start(start_ts if start_ts is not None else time.time())
+        last = add_months(month_start(time.time()), months_ahead)
+        while start <= last:
+            for table in ("datum", "engram"):
+                if (table, start) not in self._known_partitions:
+                    self.create_partition(table, start)
+            start = add_months(start, 1)
+
+    def _ensure_partitions_for(self, records, table):
+        """Create any missing partitions for the months `records` fall in."""
+        if not self.is_partitioned():
+            return
+        for start in {month_start(r["unix_ts"]) for r in records}:
+            if (table, start) not in self._known_partitions:
+                self.create_partition(table, start)
+
+    @with_reconnect
+    def list_partitions(self):
+        """Returns [(table, partition_name, month_start)] for attached partitions."""
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(""" SELECT child.relname FROM pg_inherits
+                        JOIN pg_class parent ON pg_inherits.inhparent = parent.oid
+                        JOIN pg_class child ON pg_inherits.inhrelid = child.oid
+                        WHERE parent.relname IN ('datum', 'engram') """)
+                names = [r[0] for r in cur.fetchall()]
+            conn.rollback()
+        partitions = []
+        for name in names:
+            match = self.PARTITION_RE.match(name)
+            if match:
+                table, year, month = match.groups()
+                start = datetime(int(year), int(month), 1, tzinfo=timezone.utc)
+                partitions.append((table, name, start))
+        return partitions
+
+    @with_reconnect
+    def detach_partitions(self, retention_months):
+        """
+        Detach partitions that ended more than `retention_months` ago. The
+        detached tables are kept as plain tables for archiving or dropping,
+        renamed to `<partition>_detached_<unix time>` so that a late record
+        for that month gets a fresh partition instead of finding the name
+        taken. Returns the new names.
+        """
+        cutoff = add_months(month_start(time.time()), -retention_months)
+        detached = []
+        for table, name, start in self.list_partitions():
+            if add_months(start, 1) <= cutoff:
+                archived = f"{name}_detached_{int(time.time())}"
+                with self.connection() as conn:
+                    with conn.cursor() as cur:
+                        cur.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+                        cur.execute(f"ALTER TABLE {name} RENAME TO {archived}")
+                    conn.commit()
+                self._known_partitions.discard((table, start))
+                detached.append(archived)
+                logger.info(f"Detached partition {name} as {archived}.")
+        return detached
+
+    def maintain_partitions(self):
+        """Create upcoming partitions and detach expired ones (if retention is set)."""
+        if not self.is_partitioned():
+            return
+        self.ensure_partitions()
+        if config.POSTGRES_PARTITION_RETENTION_MONTHS > 0:
+            self.detach_partitions(config.POSTGRES_PARTITION_RETENTION_MONTHS)
+
     @with_reconnect
     def create_table(self, sql):
         """Create a table from the create_table_sql statement."""
-        if not self.conn:
-            logger.error("No database connection.")
-            return
-        try:
-            with self.conn.cursor() as c:
-                c.execute(sql)
-            self.conn.commit()
-            logger.info("Table created successfully.")
-        except psycopg2.Error as e:
-            logger.error(f"Error creating table: {e}")
-            self.conn.rollback()
-            raise e
+        with self.connection() as conn:
+            try:
+                with conn.cursor() as c:
+                    c.execute(sql)
+                conn.commit()
+                logger.info("Table created successfully.")
+            except psycopg2.Error as e:
+                logger.error(f"Error creating table: {e}")
+                raise e
 
     @with_reconnect
     def insert_datum(self, datum_data):
         """Insert a new datum record."""
-        if not self.conn:
-            logger.error("No database connection.")
-            return
-        if isinstance(datum_data.get("data_json"), dict):
-            datum_data["data_json"] = json.dumps(datum_data["data_json"])
-        sql = """ INSERT INTO datum(uuid,unix_ts,iso_ts,collector,source_type,data_json)
-                  VALUES(%s,%s,%s,%s,%s,%s) """
-        try:
-            with self.conn.cursor() as cur:
-                values = (
-                    datum_data["uuid"],
-                    datum_data["unix_ts"],
-                    datum_data["iso_ts"],
-                    datum_data["collector"],
-                    datum_data["source_type"],
-                    datum_data["data_json"],
-                )
-                cur.execute(sql, values)
-            self.conn.commit()
-        except psycopg2.Error as e:
-            logger.error(f"Error inserting datum: {e}")
-            self.conn.rollback()
-            raise e
+        self._ensure_partitions_for([datum_data], "datum")
+        with self.connection() as conn:
+            try:
+                self._prepare(conn)
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "EXECUTE relic_insert_datum (%s,%s,%s,%s,%s,%s)",
+                        self._record_values(datum_data),
+                    )
+                conn.commit()
+            except psycopg2.Error as e:
+                logger.error(f"Error inserting datum: {e}")
+                raise e
 
     @with_reconnect
     def insert_engram(self, engram_data):
         """Insert a new engram record."""
-        if not self.conn:
-            logger.error("No database connection.")
-            return
-        if isinstance(engram_data.get("data_json"), dict):
-            engram_data["data_json"] = json.dumps(engram_data["data_json"])
-        sql = """ INSERT INTO engram(uuid,unix_ts,iso_ts,collector,source_type,data_json)
-                  VALUES(%s,%s,%s,%s,%s,%s) """
-        try:
-            with self.conn.cursor() as cur:
-                values = (
-                    engram_data["uuid"],
-                    engram_data["unix_ts"],
-                    engram_data["iso_ts"],
-                    engram_data["collector"],
-                    engram_data["source_type"],
-                    engram_data["data_json"],
-                )
-                cur.execute(sql, values)
-            self.conn.commit()
-        except psycopg2.Error as e:
-            logger.error(f"Error inserting engram: {e}")
-            self.conn.rollback()
-            raise e
+        self._ensure_partitions_for([engram_data], "engram")
+        with self.connection() as conn:
+            try:
+                self._prepare(conn)
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "EXECUTE relic_insert_engram (%s,%s,%s,%s,%s,%s)",
+                        self._record_values(engram_data),
+                    )
+                conn.commit()
+            except psycopg2.Error as e:
+                logger.error(f"Error inserting engram: {e}")
+                raise e
+
+    @staticmethod
+    def _record_values(record):
+        """
+        Build an insert tuple for a datum/engram record without mutating it.
+        DatumRecords hand over their original data_json bytes as is.
+        """
+        data_json = data_json_text(record)
+        return (
+            record["uuid"],
+            record["unix_ts"],
+            record["iso_ts"],
+            record["collector"],
+            record["source_type"],
+            data_json,
+        )
+
+    @with_reconnect
+    def insert_batch(self, datums, engrams, page_size=500):
+        """
+        Insert a batch of datum and engram records in a single transaction
+        using multi-row inserts.
+        """
+        self._ensure_partitions_for(datums, "datum")
+        self._ensure_partitions_for(engrams, "engram")
+        with self.connection() as conn:
+            try:
+                with conn.cursor() as cur:
+                    if datums:
+                        with STAGE_SECONDS.time(stage="datum_insert"):
+                            execute_values(
+                                cur,
+                                """ INSERT INTO datum(uuid,unix_ts,iso_ts,collector,source_type,data_json)
+                                    VALUES %s ON CONFLICT DO NOTHING """,
+                                [self._record_values(d) for d in datums],
+                                page_size=page_size,
+                            )
+                    if engrams:
+                        with STAGE_SECONDS.time(stage="engram_insert"):
+                            execute_values(
+                                cur,
+                                """ INSERT INTO engram(uuid,unix_ts,iso_ts,collector,source_type,data_json)
+                                    VALUES %s ON CONFLICT DO NOTHING """,
+                                [self._record_values(e) for e in engrams],
+                                page_size=page_size,
+                            )
+                with STAGE_SECONDS.time(stage="commit"):
+                    conn.commit()
+            except psycopg2.Error as e:
+                logger.error(f"Error inserting batch: {e}")
+                raise e
 
     @with_reconnect
     def insert_error(self, error_data):
         """Insert a new error record."""
-        if not self.conn:
-            logger.error("No database connection.")
-            return
         sql = """ INSERT INTO error(id,unix_ts,iso_ts,input_data,error_message)
                   VALUES(%s,%s,%s,%s,%s) """
-        try:
-            with self.conn.cursor() as cur:
-                values = (
-                    error_data["id"],
-                    error_data["unix_ts"],
-                    error_data["iso_ts"],
-                    error_data["input_data"],
-                    error_data["error_message"],
+        with self.connection() as conn:
+            try:
+                with conn.cursor() as cur:
+                    values = (
+                        error_data["id"],
+                        error_data["unix_ts"],
+                        error_data["iso_ts"],
+                        error_data["input_data"],
+                        error_data["error_message"],
+                    )
+                    cur.execute(sql, values)
+                conn.commit()
+            except psycopg2.Error as e:
+                logger.error(f"Error inserting error: {e}")
+                raise e
+
+    @staticmethod
+    def _records_query(
+        table,
+        ts_start,
+        ts_end,
+        collector=None,
+        source_type=None,
+        after=None,
+        descending=False,
+        fields=None,
+    ):
+        """
+        SELECT for (uuid, unix_ts, iso_ts, collector, source_type,
+        data_json_text) rows ordered by (unix_ts, uuid). `after` is the
+        (unix_ts, uuid) keyset cursor of the last row already seen, and
+        `fields` projects data_json down to the given keys (dotted paths
+        for nested values) instead of returning the whole document.
+        """
+        if table not in ("datum", "engram"):
+            raise ValueError(f"Unknown table: {table}")
+        params = []
+        if fields:
+            pairs = []
+            for field in fields:
+                pairs.append("%s, data_json #> %s")
+                params.extend([field, field.split(".")])
+            data_sql = f"jsonb_build_object({', '.join(pairs)})::text"
+        else:
+            data_sql = "data_json::text"
+        sql = f""" SELECT uuid, unix_ts, iso_ts, collector, source_type, {data_sql}
+                   FROM {table} WHERE unix_ts BETWEEN %s AND %s """
+        params.extend([ts_start, ts_end])
+        if collector:
+            sql += " AND collector = %s"
+            params.append(collector)
+        if source_type:
+            sql += " AND source_type = %s"
+            params.append(source_type)
+        direction = "DESC" if descending else "ASC"
+        if after:
+            sql += f" AND (unix_ts, uuid) {'<' if descending else '>'} (%s, %s)"
+            params.extend(after)
+        sql += f" ORDER BY unix_ts {direction}, uuid {direction}"
+        return sql, params
+
+    @with_reconnect
+    def query_page(self, ts_start, ts_end, table="datum", limit=100, **filters):
+        """
+        One keyset page of `_records_query` rows. Seeks straight to the
+        cursor through the (unix_ts, uuid) index, so deep pages cost the
+        same as the first.
+        """
+        sql, params = self._records_query(table, ts_start, ts_end, **filters)
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql + " LIMIT %s", params + [limit])
+                rows = cur.fetchall()
+            conn.rollback()
+        return rows
+
+    def stream_records(self, ts_start, ts_end, table="datum", itersize=2000, **filters):
+        """
+        Yields `_records_query` rows through a server-side (named) cursor,
+        so only `itersize` rows are held in memory at a time. data_json is
+        returned as JSON text to avoid a decode/encode round trip.
+        """
+        sql, params = self._records_query(table, ts_start, ts_end, **filters)
+        with self.connection() as conn:
+            with conn.cursor(name=f"relic_stream_{table}") as cur:
+                cur.itersize = itersize
+                cur.execute(sql, params)
+                yield from cur
+            conn.rollback()
+
+    @with_reconnect
+    def search(
+        self,
+        query,
+        table="datum",
+        limit=20,
+        ts_start=None,
+        ts_end=None,
+        collector=None,
+        source_type=None,
+    ):
+        """
+        Ranked full-text search over `search_tsv`. `query` uses web search
+        syntax ("quoted phrases", `or`, `-excluded`). Returns (uuid, unix_ts,
+        iso_ts, collector, source_type, data_json_text, rank, headline)
+        rows, best match first; the headline marks matches with <b></b> and
+        is only built for the rows returned, as ts_headline re-parses text.
+        """
+        if table not in ("datum", "engram"):
+            raise ValueError(f"Unknown table: {table}")
+        params = [config.POSTGRES_FTS_CONFIG, query]
+        where = ""
+        if ts_start is not None:
+            where += " AND unix_ts >= %s"
+            params.append(ts_start)
+        if ts_end is not None:
+            where += " AND unix_ts <= %s"
+            params.append(ts_end)
+        if collector:
+            where += " AND collector = %s"
+            params.append(collector)
+        if source_type:
+            where += " AND source_type = %s"
+            params.append(source_type)
+        params.extend([limit, config.POSTGRES_FTS_CONFIG])
+        sql = f""" WITH hits AS (
+                       SELECT uuid, unix_ts, iso_ts, collector, source_type, data_json,
+                              ts_rank_cd(search_tsv, q) AS rank, q
+                       FROM {table}, websearch_to_tsquery(%s::regconfig, %s) q
+                       WHERE search_tsv @@ q {where}
+                       ORDER BY rank DESC, unix_ts DESC
+                       LIMIT %s
+                   )
+                   SELECT uuid, unix_ts, iso_ts, collector, source_type, data_json::text, rank,
+                          ts_headline(
+                              %s::regconfig,
+                              (SELECT string_agg(v #>> '{{}}', ' ... ')
+                               FROM jsonb_path_query(data_json, 'strict $.** ? (@.type() == "string")') v),
+                              q,
+                              'MaxFragments=2, MaxWords=20, MinWords=5'
+                          )
+                   FROM hits
+                   ORDER BY rank DESC, unix_ts DESC """
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                rows = cur.fetchall()
+            conn.rollback()
+        return rows
+
+    @with_reconnect
+    def get_record(self, uuid, table="datum"):
+        """A single (uuid, unix_ts, iso_ts, collector, source_type, data_json_text) row, or None."""
+        if table not in ("datum", "engram"):
+            raise ValueError(f"Unknown table: {table}")
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f""" SELECT uuid, unix_ts, iso_ts, collector, source_type, data_json::text
+                         FROM {table} WHERE uuid = %s """,
+                    (uuid,),
                 )
-                cur.execute(sql, values)
-            self.conn.commit()
-        except psycopg2.Error as e:
-            logger.error(f"Error inserting error: {e}")
-            self.conn.rollback()
-            raise e
+                row = cur.fetchone()
+            conn.rollback()
+        return row
+
+    @with_reconnect
+    def get_records(self, uuids, table="datum"):
+        """`get_record` rows for several uuids at once, in no particular order."""
+        if table not in ("datum", "engram"):
+            raise ValueError(f"Unknown table: {table}")
+        if not uuids:
+            return []
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f""" SELECT uuid, unix_ts, iso_ts, collector, source_type, data_json::text
+                         FROM {table} WHERE uuid = ANY(%s) """,
+                    (list(uuids),),
+                )
+                rows = cur.fetchall()
+            conn.rollback()
+        return rows
+
+    @with_reconnect
+    def watermark(self):
+        """
+        Marker that changes whenever datums or engrams are inserted: the
+        database's current transaction snapshot, which moves as soon as any
+        write transaction commits (in whatever order). Other writes to the
+        database move it too, which only costs a cache miss. Costs nothing
+        on the write path and needs no schema.
+        """
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT txid_current_snapshot()::text")
+                mark = cur.fetchone()
+            conn.rollback()
+        return tuple(mark)
 
     def close(self):
-        """Close the database connection."""
-        if self.conn:
-            self.conn.close()
-            logger.info("Database connection closed.")
+        """Close every pooled database connection."""
+        if self.pool:
+            self.pool.closeall()
+            logger.info("Database connection pool closed.")
 
 
 def main():
     pg_client = PgClient()
-    if pg_client.conn:
-        # The tables are already initialized in the constructor
+    if pg_client.pool:
+        pg_client.init_schema()
         pg_client.close()
     else:
         logger.error("Error! Cannot create the database connection.")
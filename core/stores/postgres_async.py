@@ -0,0 +1,136 @@
+import asyncio
+
+from loguru import logger
+
+from core import config
+from core.stores.postgres import STAGE_SECONDS, create_partition_sql, month_start
+from core.types.codec import data_json_text
+
+
+def _asyncpg():
+    try:
+        import asyncpg
+    except ImportError:
+        raise RuntimeError(
+            "The async pipeline's Postgres driver needs the 'asyncpg' package "
+            "(uv add asyncpg)."
+        )
+    return asyncpg
+
+
+class AsyncPgClient:
+    """
+    The pipeline's write path on asyncpg, for the asyncio worker: many
+    inserts in flight over a pool of connections without a thread each.
+    Reads, schema and partition maintenance stay with PgClient.
+    """
+
+    # Redelivered records are already stored; skip them
+    INSERT = """ INSERT INTO {table}(uuid,unix_ts,iso_ts,collector,source_type,data_json)
+                 VALUES($1,$2,$3,$4,$5,$6) ON CONFLICT DO NOTHING """
+
+    def __init__(self, pool, partitioned):
+        asyncpg = _asyncpg()
+        self.pool = pool
+        self.partitioned = partitioned
+        self._known_partitions = set()
+        self._partition_lock = asyncio.Lock()
+        # Failures a retry can't fix, and ones that mean the database is down
+        self.permanent_errors = (asyncpg.DataError,)
+        self.unavailable_errors = (
+            OSError,
+            asyncpg.PostgresConnectionError,
+            asyncpg.InterfaceError,
+            asyncpg.CannotConnectNowError,
+        )
+
+    def is_unavailable(self, error):
+        return isinstance(error, self.unavailable_errors)
+
+    @classmethod
+    async def connect(
+        cls,
+        host=config.POSTGRES_HOST,
+        min_size=config.POSTGRES_POOL_MIN,
+        max_size=config.POSTGRES_POOL_MAX,
+    ):
+        asyncpg = _asyncpg()
+        if config.POSTGRES_CONNECTION_STRING:
+            kwargs = {"dsn": config.POSTGRES_CONNECTION_STRING}
+        else:
+            kwargs = {
+                "host": host,
+                "port": config.POSTGRES_PORT,
+                "user": config.POSTGRES_USER,
+                "password": config.POSTGRES_PASSWORD,
+                "database": config.POSTGRES_DB,
+            }
+        try:
+            pool = await asyncpg.create_pool(
+                min_size=min_size, max_size=max_size, **kwargs
+            )
+        except (asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+            # Refused connections and timeouts are OSErrors already
+            raise ConnectionError(f"asyncpg could not connect: {e}") from e
+        # "char" comes back as bytes from asyncpg
+        relkind = await pool.fetchval(
+            "SELECT relkind::text FROM pg_class WHERE relname = 'datum'"
+        )
+        logger.info(f"asyncpg pool ready ({min_size}-{max_size} connections).")
+        return cls(pool, partitioned=relkind == "p")
+
+    @staticmethod
+    def _record_values(record):
+        return (
+            record["uuid"],
+            record["unix_ts"],
+            record["iso_ts"],
+            record["collector"],
+            record["source_type"],
+            data_json_text(record),
+        )
+
+    async def _ensure_partitions_for(self, conn, records, table):
+        """Create any missing monthly partitions, as PgClient does."""
+        if not self.partitioned:
+            return
+        for start in {month_start(r["unix_ts"]) for r in records}:
+            if (table, start) in self._known_partitions:
+                continue
+            async with self._partition_lock:
+                await conn.execute(create_partition_sql(table, start))
+                self._known_partitions.add((table, start))
+
+    async def insert_batch(self, datums, engrams):
+        """Insert datums and engrams in one transaction."""
+        async with self.pool.acquire() as conn:
+            await self._ensure_partitions_for(conn, datums, "datum")
+            await self._ensure_partitions_for(conn, engrams, "engram")
+            async with conn.transaction():
+                if datums:
+                    with STAGE_SECONDS.time(stage="datum_insert"):
+                        await conn.executemany(
+                            self.INSERT.format(table="datum"),
+                            [self._record_values(d) for d in datums],
+                        )
+                if engrams:
+                    with STAGE_SECONDS.time(stage="engram_insert"):
+                        await conn.executemany(
+                            self.INSERT.format(table="engram"),
+                            [self._record_values(e) for e in engrams],
+                        )
+
+    async def insert_error(self, error_data):
+        await self.pool.execute(
+            """ INSERT INTO error(id,unix_ts,iso_ts,input_data,error_message)
+                VALUES($1,$2,$3,$4,$5) """,
+            error_data["id"],
+            error_data["unix_ts"],
+            error_data["iso_ts"],
+            error_data["input_data"],
+            error_data["error_message"],
+        )
+
+    async def close(self):
+        await self.pool.close()
+        logger.info("asyncpg pool closed.")
@@ -1,11 +1,16 @@
 import json
+import time
 
 import redis
+import redis.asyncio as aioredis
+
+STREAM_FIELD = b"d"
 
 
 class RedisConnection:
-    def __init__(self, connection):
+    def __init__(self, connection, queue_backend="list"):
         self.conn = connection
+        self.queue_backend = queue_backend
 
     def read(self, table, key):
         """Reads a value from Redis using a 'table:key' pattern."""
@@ -28,15 +33,391 @@ class RedisConnection:
         """Writes a message to a Redis queue (list)."""
         self.conn.rpush(key, message)
 
+    def drain(self, key, max_items, linger_ms=0, timeout=0):
+        """
+        Blocks for the first message on a Redis list, then drains up to
+        `max_items` in total, waiting at most `linger_ms` for stragglers.
+        Returns a list of raw messages (empty if `timeout` expired).
+        """
+        first = self.conn.blpop(key, timeout=timeout)
+        if first is None:
+            return []
+        batch = [first[1]]
+        deadline = time.monotonic() + linger_ms / 1000
+        while len(batch) < max_items:
+            items = self.conn.lpop(key, max_items - len(batch))
+            if items:
+                batch.extend(items)
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            item = self.conn.blpop(key, timeout=remaining)
+            if item is None:
+                break
+            batch.append(item[1])
+        return batch
+
+    def enqueue(self, key, messages):
+        """
+        Writes messages to the hub queue using the configured backend:
+        a multi-value RPUSH for lists, pipelined XADDs for streams.
+        """
+        if not messages:
+            return
+        if self.queue_backend == "stream":
+            pipe = self.conn.pipeline(transaction=False)
+            for message in messages:
+                pipe.xadd(key, {STREAM_FIELD: message})
+            pipe.execute()
+        else:
+            self.conn.rpush(key, *messages)
+
+    def depth(self, key):
+        """Number of messages waiting in the hub queue."""
+        if self.queue_backend == "stream":
+            return self.conn.xlen(key)
+        return self.conn.llen(key)
+
+    def consumer_lag(self, key, group):
+        """
+        Messages not yet processed by the consumer group: undelivered plus
+        pending (delivered but not acked). For lists this is the depth.
+        """
+        if self.queue_backend != "stream":
+            return self.conn.llen(key)
+        return _group_lag(self.conn.xinfo_groups(key), group)
+
+
+def _group_lag(groups, group):
+    for info in groups:
+        name = info.get("name")
+        if isinstance(name, bytes):
+            name = name.decode()
+        if name == group:
+            return (info.get("lag") or 0) + (info.get("pending") or 0)
+    return 0
+
+
+class ListConsumer:
+    """Reads batches from a Redis list. Popping is the ack, so `ack` is a no-op."""
+
+    def __init__(self, redis_conn, key):
+        self.redis = redis_conn
+        self.key = key
+
+    def read(self, count, linger_ms=0, timeout=0):
+        """Returns up to `count` (message_id, payload) pairs; ids are None."""
+        messages = self.redis.drain(self.key, count, linger_ms, timeout)
+        return [(None, m) for m in messages]
+
+    def ack(self, ids):
+        pass
+
+    def nack(self, batch):
+        """Puts messages that weren't processed back at the head of the list."""
+        payloads = [m for _, m in batch]
+        if payloads:
+            self.redis.conn.lpush(self.key, *reversed(payloads))
+
+
+class StreamConsumer:
+    """
+    Reads a Redis stream through a consumer group. Messages stay pending
+    until `ack` is called, and messages left pending by dead consumers for
+    longer than `claim_idle_ms` are taken over with XAUTOCLAIM.
+    """
 
-def connect(host, port, db=0):
+    def __init__(self, redis_conn, key, group, consumer, claim_idle_ms=60000):
+        self.conn = redis_conn.conn
+        self.key = key
+        self.group = group
+        self.consumer = consumer
+        self.claim_idle_ms = claim_idle_ms
+        self._claim_cursor = "0-0"
+        # Walks the messages this consumer already owned at startup; None once done
+        self._pending_cursor = "0"
+
+    def ensure_group(self):
+        """Creates the consumer group (and the stream) if it does not exist."""
+        try:
+            self.conn.xgroup_create(self.key, self.group, id="0", mkstream=True)
+        except redis.exceptions.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def _read_group(self, stream_id, count, block_ms):
+        response = self.conn.xreadgroup(
+            self.group,
+            self.consumer,
+            {self.key: stream_id},
+            count=count,
+            block=block_ms,
+        )
+        if not response:
+            return []
+        _, entries = response[0]
+        return [(mid, fields[STREAM_FIELD]) for mid, fields in entries if fields]
+
+    def _read_pending(self, count):
+        """
+        The next page of messages this consumer already owns (after a
+        restart), continuing after the last one handed out so messages
+        still being processed aren't served again.
+        """
+        response = self.conn.xreadgroup(
+            self.group, self.consumer, {self.key: self._pending_cursor}, count=count
+        )
+        entries = response[0][1] if response else []
+        if not entries:
+            self._pending_cursor = None
+            return []
+        self._pending_cursor = entries[-1][0]
+        return [(mid, fields[STREAM_FIELD]) for mid, fields in entries if fields]
+
+    def reclaim(self, count):
+        """Takes over messages that other consumers left pending for too long."""
+        next_id, entries, *_ = self.conn.xautoclaim(
+            self.key,
+            self.group,
+            self.consumer,
+            self.claim_idle_ms,
+            start_id=self._claim_cursor,
+            count=count,
+        )
+        self._claim_cursor = next_id
+        return [(mid, fields[STREAM_FIELD]) for mid, fields in entries if fields]
+
+    def read(self, count, linger_ms=0, timeout=0):
+        """
+        Returns up to `count` (message_id, payload) pairs. Messages this
+        consumer already owns (after a restart) and stalled messages are
+        served before new ones. Blocks for `timeout` seconds (0 = forever)
+        for the first message, then lingers up to `linger_ms` to fill the batch.
+        """
+        while self._pending_cursor is not None:
+            batch = self._read_pending(count)
+            if batch:
+                return batch
+        batch = self.reclaim(count)
+        if batch:
+            return batch
+
+        batch = self._read_group(">", count, int(timeout * 1000))
+        if not batch:
+            return []
+        deadline = time.monotonic() + linger_ms / 1000
+        while len(batch) < count:
+            remaining_ms = int((deadline - time.monotonic()) * 1000)
+            if remaining_ms <= 0:
+                break
+            more = self._read_group(">", count - len(batch), remaining_ms)
+            if not more:
+                break
+            batch.extend(more)
+        return batch
+
+    def ack(self, ids):
+        """Acknowledges processed messages and removes them from the stream."""
+        ids = [i for i in ids if i is not None]
+        if not ids:
+            return
+        pipe = self.conn.pipeline(transaction=False)
+        pipe.xack(self.key, self.group, *ids)
+        pipe.xdel(self.key, *ids)
+        pipe.execute()
+
+    def nack(self, batch):
+        """Unacked messages stay pending and are reclaimed after `claim_idle_ms`."""
+        pass
+
+
+def connect(host, port, db=0, queue_backend="list"):
     """Connect to Redis and return a RedisConnection object."""
     try:
         pool = redis.BlockingConnectionPool(host=host, port=port, db=db)
         r = redis.Redis(connection_pool=pool, decode_responses=True)
         r.ping()
         print(f"Successfully connected to Redis at {host}:{port}")
-        return RedisConnection(r)
+        return RedisConnection(r, queue_backend)
+    except redis.exceptions.ConnectionError as e:
+        print(f"Could not connect to Redis: {e}")
+        return None
+
+
+class AsyncRedisConnection:
+    """asyncio counterpart of RedisConnection for use inside an event loop."""
+
+    def __init__(self, connection, queue_backend="list"):
+        self.conn = connection
+        self.queue_backend = queue_backend
+
+    async def put(self, key, message):
+        """Writes a message to a Redis queue (list)."""
+        await self.conn.rpush(key, message)
+
+    async def put_many(self, key, messages):
+        """Writes several messages to a Redis queue with one multi-value RPUSH."""
+        if messages:
+            await self.conn.rpush(key, *messages)
+
+    async def enqueue(self, key, messages):
+        """
+        Writes messages to the hub queue using the configured backend:
+        a multi-value RPUSH for lists, pipelined XADDs for streams.
+        """
+        if not messages:
+            return
+        if self.queue_backend == "stream":
+            pipe = self.conn.pipeline(transaction=False)
+            for message in messages:
+                pipe.xadd(key, {STREAM_FIELD: message})
+            await pipe.execute()
+        else:
+            await self.conn.rpush(key, *messages)
+
+    async def depth(self, key):
+        """Number of messages waiting in the hub queue."""
+        if self.queue_backend == "stream":
+            return await self.conn.xlen(key)
+        return await self.conn.llen(key)
+
+    async def consumer_lag(self, key, group):
+        """Messages not yet processed by the consumer group (see RedisConnection)."""
+        if self.queue_backend != "stream":
+            return await self.conn.llen(key)
+        return _group_lag(await self.conn.xinfo_groups(key), group)
+
+    async def close(self):
+        """Closes the client and disconnects its connection pool."""
+        await self.conn.aclose()
+
+
+class AsyncListConsumer:
+    """asyncio counterpart of ListConsumer."""
+
+    def __init__(self, redis_conn, key):
+        self.conn = redis_conn.conn
+        self.key = key
+
+    async def read(self, count, timeout=1):
+        """
+        Up to `count` (None, payload) pairs: blocks up to `timeout` seconds
+        for the first message, then takes whatever else is already queued.
+        """
+        first = await self.conn.blpop(self.key, timeout=timeout)
+        if first is None:
+            return []
+        batch = [first[1]]
+        if count > 1:
+            batch.extend(await self.conn.lpop(self.key, count - 1) or [])
+        return [(None, m) for m in batch]
+
+    async def ack(self, ids):
+        pass
+
+    async def nack(self, batch):
+        """Puts messages that weren't processed back at the head of the list."""
+        payloads = [m for _, m in batch]
+        if payloads:
+            await self.conn.lpush(self.key, *reversed(payloads))
+
+
+class AsyncStreamConsumer:
+    """asyncio counterpart of StreamConsumer, with the same recovery order."""
+
+    def __init__(self, redis_conn, key, group, consumer, claim_idle_ms=60000):
+        self.conn = redis_conn.conn
+        self.key = key
+        self.group = group
+        self.consumer = consumer
+        self.claim_idle_ms = claim_idle_ms
+        self._claim_cursor = "0-0"
+        # Walks the messages this consumer already owned at startup; None once done
+        self._pending_cursor = "0"
+
+    async def ensure_group(self):
+        try:
+            await self.conn.xgroup_create(self.key, self.group, id="0", mkstream=True)
+        except redis.exceptions.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def _read_group(self, stream_id, count, block_ms):
+        response = await self.conn.xreadgroup(
+            self.group,
+            self.consumer,
+            {self.key: stream_id},
+            count=count,
+            block=block_ms,
+        )
+        if not response:
+            return []
+        _, entries = response[0]
+        return [(mid, fields[STREAM_FIELD]) for mid, fields in entries if fields]
+
+    async def _read_pending(self, count):
+        response = await self.conn.xreadgroup(
+            self.group, self.consumer, {self.key: self._pending_cursor}, count=count
+        )
+        entries = response[0][1] if response else []
+        if not entries:
+            self._pending_cursor = None
+            return []
+        self._pending_cursor = entries[-1][0]
+        return [(mid, fields[STREAM_FIELD]) for mid, fields in entries if fields]
+
+    async def read(self, count, timeout=1):
+        """
+        Own pending messages first, then stalled ones, then new ones. The
+        own pending ones are walked once with a cursor: re-reading them from
+        the start would hand out those still in flight again and again.
+        """
+        while self._pending_cursor is not None:
+            batch = await self._read_pending(count)
+            if batch:
+                return batch
+        next_id, entries, *_ = await self.conn.xautoclaim(
+            self.key,
+            self.group,
+            self.consumer,
+            self.claim_idle_ms,
+            start_id=self._claim_cursor,
+            count=count,
+        )
+        self._claim_cursor = next_id
+        batch = [(mid, fields[STREAM_FIELD]) for mid, fields in entries if fields]
+        if batch:
+            return batch
+        return await self._read_group(">", count, int(timeout * 1000))
+
+    async def ack(self, ids):
+        ids = [i for i in ids if i is not None]
+        if not ids:
+            return
+        pipe = self.conn.pipeline(transaction=False)
+        pipe.xack(self.key, self.group, *ids)
+        pipe.xdel(self.key, *ids)
+        await pipe.execute()
+
+    async def nack(self, batch):
+        """Unacked messages stay pending and are reclaimed after `claim_idle_ms`."""
+        pass
+
+
+async def async_connect(host, port, db=0, max_connections=50, queue_backend="list"):
+    """
+    Connect to Redis and return an AsyncRedisConnection object.
+    Each process gets its own pool, so call this once per worker.
+    """
+    try:
+        pool = aioredis.BlockingConnectionPool(
+            host=host, port=port, db=db, max_connections=max_connections
+        )
+        r = aioredis.Redis(connection_pool=pool)
+        await r.ping()
+        print(f"Successfully connected to Redis at {host}:{port} (async)")
+        return AsyncRedisConnection(r, queue_backend)
     except redis.exceptions.ConnectionError as e:
         print(f"Could not connect to Redis: {e}")
         return None
@@ -0,0 +1,53 @@
+import gzip
+import io
+import json
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError(
+            "zstd replays need the 'zstandard' package (uv add zstandard)."
+        )
+    return zstandard
+
+
+def replay_suffix(compression):
+    return {"gzip": ".ndjson.gz", "zstd": ".ndjson.zst", "none": ".ndjson"}[compression]
+
+
+def open_replay_writer(path, compression="gzip"):
+    """Binary file object for writing an NDJSON replay with the given compression."""
+    if compression == "gzip":
+        return gzip.open(path, "wb", compresslevel=6)
+    if compression == "zstd":
+        return _zstandard().ZstdCompressor(level=6).stream_writer(open(path, "wb"))
+    if compression == "none":
+        return open(path, "wb")
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+def _open_reader(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".zst"):
+        raw = open(path, "rb")
+        return io.BufferedReader(_zstandard().ZstdDecompressor().stream_reader(raw))
+    return open(path, "rb")
+
+
+def iter_replay(path):
+    """
+    Streams records from a replay file in constant memory. Reads NDJSON
+    (plain, .gz or .zst) line by line; legacy `.json` replays (one JSON
+    array) are still accepted but loaded whole.
+    """
+    if path.endswith(".json"):
+        with open(path, "r") as f:
+            yield from json.load(f)
+        return
+    with _open_reader(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -1,7 +1,27 @@
+import json
+import os
+import queue
+import re
 import sqlite3
+import threading
 import uuid
+from concurrent.futures import Future
+from contextlib import contextmanager
 from datetime import datetime
 
+from loguru import logger
+
+from core import config
+from core.metrics import REGISTRY
+from core.pipeline.enrichment.base import iter_text
+from core.types.codec import data_json_text
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "relic_pipeline_stage_seconds",
+    "Time spent per pipeline stage.",
+    ("stage",),
+)
+
 
 def create_connection(db_file):
     """create a database connection to the SQLite database
@@ -47,6 +67,38 @@ CREATE_ERROR_TABLE = """ CREATE TABLE IF NOT EXISTS error (
                         ); """
 
 
+# Bumped in every transaction that inserts records, for `watermark()`
+CREATE_WATERMARK_TABLE = """ CREATE TABLE IF NOT EXISTS watermark (
+                                id integer PRIMARY KEY CHECK (id = 1),
+                                writes integer NOT NULL
+                            ); """
+
+
+# Full-text index over the string values of data_json. SqliteClient indexes
+# the records it inserts; triggers keep deletes and updates in step. Rows
+# are linked by uuid rather than rowid, which VACUUM may renumber.
+CREATE_FTS_TABLE = """ CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5(
+                            uuid UNINDEXED,
+                            text,
+                            tokenize = 'unicode61 remove_diacritics 2'
+                        ); """
+
+FTS_TEXT = """ (SELECT group_concat(value, ' ... ') FROM json_tree({row}.data_json)
+                WHERE type = 'text') """
+
+CREATE_FTS_TRIGGERS = [
+    """ CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN
+            DELETE FROM {table}_fts WHERE uuid = old.uuid;
+        END; """,
+    """ CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF data_json ON {table} BEGIN
+            DELETE FROM {table}_fts WHERE uuid = old.uuid;
+            INSERT INTO {table}_fts(uuid, text) VALUES (new.uuid, """
+    + FTS_TEXT.format(row="new")
+    + """);
+        END; """,
+]
+
+
 def create_table(conn, sql):
     """create a table from the create_table_sql statement
     :param conn: Connection object
@@ -96,9 +148,6 @@ def table_exists(conn, table_name):
         return False
 
 
-import json
-
-
 def insert_datum(conn, datum_data):
     """
     Create a new engram into the engram table
@@ -106,9 +155,6 @@ def insert_datum(conn, datum_data):
     :param datum_data:
     :return: datum id
     """
-    # Convert the JSON data to a string
-    if isinstance(datum_data["data_json"], dict):
-        datum_data["data_json"] = json.dumps(datum_data["data_json"])
     sql = """ INSERT INTO datum(uuid,unix_ts,iso_ts,collector,source_type,data_json)
               VALUES(?,?,?,?,?,?) """
     cur = conn.cursor()
@@ -118,7 +164,7 @@ def insert_datum(conn, datum_data):
         datum_data["iso_ts"],
         datum_data["collector"],
         datum_data["source_type"],
-        datum_data["data_json"],
+        data_json_text(datum_data),
     )
     cur.execute(sql, values)
     conn.commit()
@@ -132,9 +178,6 @@ def insert_engram(conn, engram_data):
     :param engram_data:
     :return: engram id
     """
-    # Convert the JSON data to a string
-    if isinstance(engram_data["data_json"], dict):
-        engram_data["data_json"] = json.dumps(engram_data["data_json"])
     sql = """ INSERT INTO engram(uuid,unix_ts,iso_ts,collector,source_type,data_json)
               VALUES(?,?,?,?,?,?) """
     cur = conn.cursor()
@@ -144,7 +187,7 @@ def insert_engram(conn, engram_data):
         engram_data["iso_ts"],
         engram_data["collector"],
         engram_data["source_type"],
-        engram_data["data_json"],
+        data_json_text(engram_data),
     )
     cur.execute(sql, values)
     conn.commit()
@@ -173,22 +216,476 @@ def insert_error(conn, error_data):
     return cur.lastrowid
 
 
-def main():
-    database = "core/stores/data/relic.db"
-
-    # create a database connection
-    conn = create_connection(database)
-
-    # create tables
-    if conn is not None:
-        # delete_table(conn, "engram")
-        # delete_table(conn, "error")
-        create_table(conn, CREATE_DATUM_TABLE)
-        create_table(conn, CREATE_ENGRAM_TABLE)
-        create_table(conn, CREATE_ERROR_TABLE)
+WEBSEARCH_TOKEN_RE = re.compile(r'-?"[^"]*"?|\S+')
+
+
+def websearch_query(text):
+    """
+    Translates Postgres web search syntax ("quoted phrases", `or`,
+    `-excluded`) into an FTS5 query, so both stores accept the same search
+    strings. Every term is quoted, so other punctuation is never syntax.
+    """
+    terms = []
+    excluded = []
+    for token in WEBSEARCH_TOKEN_RE.findall(text):
+        if token.lower() == "or":
+            if terms and terms[-1] != "OR":
+                terms.append("OR")
+            continue
+        negate = token.startswith("-") and len(token) > 1
+        token = token[1:] if negate else token
+        prefix = token.endswith("*")
+        words = token.strip('"*').replace('"', '""')
+        if not words.strip():
+            continue
+        term = f'"{words}"*' if prefix else f'"{words}"'
+        (excluded if negate else terms).append(term)
+    while terms and terms[-1] == "OR":
+        terms.pop()
+    if not terms:
+        return ""
+    query = " ".join(terms)
+    if excluded:
+        query = f"({query}) NOT " + " NOT ".join(excluded)
+    return query
+
+
+# Secondary indexes matching the Postgres ones the queries below rely on
+CREATE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS {table}_unix_ts_uuid ON {table} (unix_ts, uuid)",
+    "CREATE INDEX IF NOT EXISTS {table}_collector_source_ts ON {table} (collector, source_type, unix_ts)",
+]
+RECORD_COLUMNS = "uuid, unix_ts, iso_ts, collector, source_type, data_json"
+# Writes from concurrent callers committed together in one transaction
+MAX_GROUP_COMMIT = 256
+
+
+class SqliteClient:
+    """
+    SQLite store with the same interface as PgClient, for single-node
+    deployments and benchmarks that don't run a database server.
+
+    The database runs in WAL mode so readers never block the writer. All
+    writes go through one writer thread, which commits whatever is queued
+    at the time in a single transaction (a failing call doesn't take the
+    others with it); calls return once their data is committed. Reads use a small pool of read-only
+    connections. The schema is created on open, as there is no separate
+    server to run DDL against.
+    """
+
+    def __init__(
+        self,
+        path=config.SQLITE_PATH,
+        readers=config.SQLITE_READERS,
+        cache_mb=config.SQLITE_CACHE_MB,
+        mmap_mb=config.SQLITE_MMAP_MB,
+        synchronous=config.SQLITE_SYNCHRONOUS,
+    ):
+        self.path = path
+        self.pragmas = [
+            f"PRAGMA synchronous = {synchronous}",
+            f"PRAGMA cache_size = {-cache_mb * 1024}",
+            f"PRAGMA mmap_size = {mmap_mb * 1024 * 1024}",
+            "PRAGMA temp_store = MEMORY",
+            "PRAGMA busy_timeout = 5000",
+        ]
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._writes = queue.Queue()
+        self._started = threading.Event()
+        self._start_error = None
+        self._writer = threading.Thread(
+            target=self._write_loop, name="sqlite-writer", daemon=True
+        )
+        self._writer.start()
+        self._started.wait()
+        if self._start_error:
+            raise self._start_error
+        self._slots = threading.BoundedSemaphore(readers)
+        self._readers = []
+        self._readers_lock = threading.Lock()
+
+    def _connect(self, read_only=False):
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        for pragma in self.pragmas:
+            conn.execute(pragma)
+        if read_only:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    # --- Writer ---
+    def _write_loop(self):
+        try:
+            conn = self._connect()
+            conn.execute("PRAGMA journal_mode = WAL")
+            self._create_schema(conn)
+        except Exception as e:
+            self._start_error = e
+            self._started.set()
+            return
+        self._started.set()
+        running = True
+        while running:
+            jobs = [self._writes.get()]
+            while len(jobs) < MAX_GROUP_COMMIT:
+                try:
+                    jobs.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            if None in jobs:
+                running = False
+                jobs = [job for job in jobs if job is not None]
+            if jobs:
+                self._commit_group(conn, jobs)
         conn.close()
-    else:
-        print("Error! cannot create the database connection.")
+
+    @classmethod
+    def _commit_group(cls, conn, jobs):
+        """
+        Runs every job in one transaction. If one fails, the transaction is
+        rolled back and each job is replayed in a transaction of its own,
+        so only the failing call sees the error. (Savepoints per job would
+        do the same, but make FTS5 flush its pending index on each release.)
+        """
+        jobs = [job for job in jobs if job[1].set_running_or_notify_cancel()]
+        if len(jobs) > 1:
+            try:
+                results = cls._run(conn, [func for func, _ in jobs])
+            except Exception:
+                pass
+            else:
+                for (_, future), result in zip(jobs, results):
+                    future.set_result(result)
+                return
+        for func, future in jobs:
+            try:
+                [result] = cls._run(conn, [func])
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+    @staticmethod
+    def _run(conn, funcs):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            results = [func(conn) for func in funcs]
+            with STAGE_SECONDS.time(stage="commit"):
+                conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        return results
+
+    def _write(self, func):
+        """Runs `func(conn)` on the writer thread and waits for its commit."""
+        if not self._writer.is_alive():
+            raise sqlite3.OperationalError("SQLite store is closed.")
+        future = Future()
+        self._writes.put((func, future))
+        return future.result()
+
+    def _create_schema(self, conn):
+        for sql in (
+            CREATE_DATUM_TABLE,
+            CREATE_ENGRAM_TABLE,
+            CREATE_ERROR_TABLE,
+            CREATE_WATERMARK_TABLE,
+        ):
+            conn.execute(sql)
+        conn.execute("INSERT OR IGNORE INTO watermark(id, writes) VALUES (1, 0)")
+        for table in ("datum", "engram"):
+            for sql in CREATE_INDEXES:
+                conn.execute(sql.format(table=table))
+            fts_exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?",
+                (f"{table}_fts",),
+            ).fetchone()
+            conn.execute(CREATE_FTS_TABLE.format(table=table))
+            # Inserts are indexed by the client itself (see _fts_row); drop
+            # the insert trigger older databases were created with
+            conn.execute(f"DROP TRIGGER IF EXISTS {table}_fts_insert")
+            for sql in CREATE_FTS_TRIGGERS:
+                conn.execute(sql.format(table=table))
+            if not fts_exists:
+                conn.execute(
+                    f"INSERT INTO {table}_fts(uuid, text) SELECT uuid, "
+                    + FTS_TEXT.format(row=table)
+                    + f" FROM {table}"
+                )
+
+    def init_schema(self, partitioned=False):
+        """Tables and indexes already exist once the client is open."""
+        if partitioned:
+            logger.warning("SQLite tables are not partitioned; ignoring.")
+
+    def is_partitioned(self):
+        return False
+
+    def maintain_partitions(self):
+        pass
+
+    @staticmethod
+    def _record_values(record):
+        return (
+            record["uuid"],
+            record["unix_ts"],
+            record["iso_ts"],
+            record["collector"],
+            record["source_type"],
+            data_json_text(record),
+        )
+
+    @staticmethod
+    def _fts_row(record):
+        """
+        The search index row for a record: its string values, joined as the
+        FTS_TEXT subquery does. Built in the caller's thread from the
+        already-decoded data_json, which is much cheaper than json_tree in
+        a trigger and keeps the work off the writer thread.
+        """
+        data_json = record["data_json"]
+        if isinstance(data_json, (str, bytes)):
+            data_json = json.loads(data_json)
+        return (record["uuid"], " ... ".join(iter_text(data_json)))
+
+    @staticmethod
+    def _insert_records(conn, table, rows, fts_rows):
+        """
+        Inserts records that aren't stored yet, so redelivered messages are
+        skipped rather than failing, and indexes only the ones inserted.
+        """
+        if not rows:
+            return
+        seen = {
+            stored
+            for (stored,) in conn.execute(
+                f"SELECT uuid FROM {table} WHERE uuid IN (SELECT value FROM json_each(?))",
+                (json.dumps([row[0] for row in rows]),),
+            )
+        }
+        conn.executemany(
+            f"INSERT OR IGNORE INTO {table}({RECORD_COLUMNS}) VALUES(?,?,?,?,?,?)",
+            rows,
+        )
+        new_fts_rows = []
+        for fts_row in fts_rows:
+            if fts_row[0] not in seen:
+                seen.add(fts_row[0])
+                new_fts_rows.append(fts_row)
+        conn.executemany(
+            f"INSERT INTO {table}_fts(uuid, text) VALUES(?,?)", new_fts_rows
+        )
+
+    def insert_datum(self, datum_data):
+        """Insert a new datum record."""
+        self.insert_batch([datum_data], [])
+
+    def insert_engram(self, engram_data):
+        """Insert a new engram record."""
+        self.insert_batch([], [engram_data])
+
+    def insert_batch(self, datums, engrams, page_size=None):
+        """Insert a batch of datum and engram records in a single transaction."""
+        datum_rows = [self._record_values(d) for d in datums]
+        datum_fts = [self._fts_row(d) for d in datums]
+        engram_rows = [self._record_values(e) for e in engrams]
+        engram_fts = [self._fts_row(e) for e in engrams]
+
+        def insert(conn):
+            with STAGE_SECONDS.time(stage="datum_insert"):
+                self._insert_records(conn, "datum", datum_rows, datum_fts)
+            with STAGE_SECONDS.time(stage="engram_insert"):
+                self._insert_records(conn, "engram", engram_rows, engram_fts)
+            conn.execute("UPDATE watermark SET writes = writes + 1")
+
+        self._write(insert)
+
+    def insert_error(self, error_data):
+        """Insert a new error record."""
+        values = (
+            error_data["id"],
+            error_data["unix_ts"],
+            error_data["iso_ts"],
+            error_data["input_data"],
+            error_data["error_message"],
+        )
+        self._write(
+            lambda conn: conn.execute(
+                "INSERT INTO error(id,unix_ts,iso_ts,input_data,error_message) "
+                "VALUES(?,?,?,?,?)",
+                values,
+            )
+        )
+
+    # --- Readers ---
+    @contextmanager
+    def connection(self):
+        """Check out a read-only connection for one unit of work."""
+        with self._slots:
+            with self._readers_lock:
+                conn = self._readers.pop() if self._readers else None
+            if conn is None:
+                conn = self._connect(read_only=True)
+            try:
+                yield conn
+            finally:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                with self._readers_lock:
+                    self._readers.append(conn)
+
+    @staticmethod
+    def _records_query(
+        table,
+        ts_start,
+        ts_end,
+        collector=None,
+        source_type=None,
+        after=None,
+        descending=False,
+        fields=None,
+    ):
+        """SQLite version of `PgClient._records_query`, with the same row shape."""
+        if table not in ("datum", "engram"):
+            raise ValueError(f"Unknown table: {table}")
+        params = []
+        if fields:
+            pairs = []
+            for field in fields:
+                pairs.append("?, data_json -> ?")
+                params.extend([field, "$." + field])
+            data_sql = f"json_object({', '.join(pairs)})"
+        else:
+            data_sql = "data_json"
+        sql = f""" SELECT uuid, unix_ts, iso_ts, collector, source_type, {data_sql}
+                   FROM {table} WHERE unix_ts BETWEEN ? AND ? """
+        params.extend([ts_start, ts_end])
+        if collector:
+            sql += " AND collector = ?"
+            params.append(collector)
+        if source_type:
+            sql += " AND source_type = ?"
+            params.append(source_type)
+        direction = "DESC" if descending else "ASC"
+        if after:
+            sql += f" AND (unix_ts, uuid) {'<' if descending else '>'} (?, ?)"
+            params.extend(after)
+        sql += f" ORDER BY unix_ts {direction}, uuid {direction}"
+        return sql, params
+
+    def query_page(self, ts_start, ts_end, table="datum", limit=100, **filters):
+        """One keyset page of `_records_query` rows."""
+        sql, params = self._records_query(table, ts_start, ts_end, **filters)
+        with self.connection() as conn:
+            return conn.execute(sql + " LIMIT ?", params + [limit]).fetchall()
+
+    def stream_records(self, ts_start, ts_end, table="datum", itersize=2000, **filters):
+        """Yields `_records_query` rows, fetching `itersize` at a time."""
+        sql, params = self._records_query(table, ts_start, ts_end, **filters)
+        with self.connection() as conn:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(itersize)
+                if not rows:
+                    break
+                yield from rows
+
+    def search(
+        self,
+        query,
+        table="datum",
+        limit=20,
+        ts_start=None,
+        ts_end=None,
+        collector=None,
+        source_type=None,
+    ):
+        """
+        Ranked full-text search, taking the same web search syntax and
+        returning the same rows as `PgClient.search`. The rank is the
+        negated bm25 score, so higher is better as in Postgres.
+        """
+        if table not in ("datum", "engram"):
+            raise ValueError(f"Unknown table: {table}")
+        match = websearch_query(query)
+        if not match:
+            return []
+        sql = f""" SELECT t.uuid, t.unix_ts, t.iso_ts, t.collector, t.source_type, t.data_json,
+                          -bm25({table}_fts) AS rank,
+                          snippet({table}_fts, 1, '<b>', '</b>', ' ... ', 20)
+                   FROM {table}_fts JOIN {table} t ON t.uuid = {table}_fts.uuid
+                   WHERE {table}_fts MATCH ? """
+        params = [match]
+        if ts_start is not None:
+            sql += " AND t.unix_ts >= ?"
+            params.append(ts_start)
+        if ts_end is not None:
+            sql += " AND t.unix_ts <= ?"
+            params.append(ts_end)
+        if collector:
+            sql += " AND t.collector = ?"
+            params.append(collector)
+        if source_type:
+            sql += " AND t.source_type = ?"
+            params.append(source_type)
+        sql += " ORDER BY rank DESC, t.unix_ts DESC LIMIT ?"
+        params.append(limit)
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def get_record(self, uuid, table="datum"):
+        """A single record row, or None."""
+        if table not in ("datum", "engram"):
+            raise ValueError(f"Unknown table: {table}")
+        with self.connection() as conn:
+            return conn.execute(
+                f"SELECT {RECORD_COLUMNS} FROM {table} WHERE uuid = ?", (uuid,)
+            ).fetchone()
+
+    def get_records(self, uuids, table="datum", chunk_size=500):
+        """`get_record` rows for several uuids at once, in no particular order."""
+        if table not in ("datum", "engram"):
+            raise ValueError(f"Unknown table: {table}")
+        uuids = list(uuids)
+        rows = []
+        with self.connection() as conn:
+            for i in range(0, len(uuids), chunk_size):
+                chunk = uuids[i : i + chunk_size]
+                rows.extend(
+                    conn.execute(
+                        f"SELECT {RECORD_COLUMNS} FROM {table} "
+                        f"WHERE uuid IN ({','.join('?' * len(chunk))})",
+                        chunk,
+                    ).fetchall()
+                )
+        return rows
+
+    def watermark(self):
+        """
+        Count of insert transactions, kept in the same transaction as the
+        inserts by the single writer, so it moves exactly when new records
+        become visible.
+        """
+        with self.connection() as conn:
+            return tuple(conn.execute("SELECT writes FROM watermark").fetchone())
+
+    def close(self):
+        """Finish queued writes, stop the writer and close every connection."""
+        if self._writer.is_alive():
+            self._writes.put(None)
+            self._writer.join()
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+        logger.info("SQLite store closed.")
+
+
+def main():
+    SqliteClient(config.SQLITE_PATH).close()
+    print(f"SQLite store ready at {config.SQLITE_PATH}.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,421 @@
+import json
+import os
+
+import numpy as np
+from loguru import logger
+
+META_FILE = "index.json"
+VECTORS_FILE = "vectors.f32"
+IDS_FILE = "ids.txt"
+DELETED_FILE = "deleted.npy"
+CENTROIDS_FILE = "centroids.npy"
+ASSIGN_FILE = "assign.npy"
+INITIAL_CAPACITY = 1024
+# Rows scored per matrix product; bounds the (queries x rows) score matrix
+BLOCK_ROWS = 65536
+
+
+def _normalise(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def _topk(scores, rows, k):
+    """Top `k` of a (queries x n) score matrix and the matching rows."""
+    if scores.shape[1] > k:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, part, axis=1)
+        rows = np.take_along_axis(rows, part, axis=1)
+    return scores, rows
+
+
+def _write_atomic(path, write):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+class VectorIndex:
+    """
+    Exact nearest-neighbour index over float32 vectors kept in a
+    memory-mapped file under `path`, so the corpus doesn't have to fit in
+    RAM. Queries are scored BLOCK_ROWS rows at a time with one matrix
+    product per block. With metric "cosine" vectors are normalised on add
+    and scores are cosine similarities; "dot" scores raw inner products.
+
+    Adding an id that is already indexed replaces its vector. Deletes are
+    tombstones until `compact()` rewrites the file. Nothing is durable
+    until `save()`.
+    """
+
+    kind = "exact"
+
+    def __init__(self, path, dim=None, metric="cosine"):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        meta = self._read_meta()
+        if meta:
+            if meta["kind"] != self.kind:
+                raise ValueError(f"{path} holds a {meta['kind']} index")
+            if dim and dim != meta["dim"]:
+                raise ValueError(f"{path} holds {meta['dim']}-d vectors, not {dim}")
+            self.dim, self.metric, self.count = (
+                meta["dim"],
+                meta["metric"],
+                meta["count"],
+            )
+        else:
+            if not dim:
+                raise ValueError("dim is required to create an index")
+            if metric not in ("cosine", "dot"):
+                raise ValueError(f"Unknown metric: {metric}")
+            self.dim, self.metric, self.count = dim, metric, 0
+        self._open_vectors(max(self.count, INITIAL_CAPACITY))
+        self._load_ids()
+        self._load_state(meta or {})
+
+    # --- Storage ---
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _read_meta(self):
+        try:
+            with open(self._file(META_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _open_vectors(self, capacity):
+        path = self._file(VECTORS_FILE)
+        row_bytes = self.dim * 4
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        capacity = max(capacity, size // row_bytes)
+        if size < capacity * row_bytes:
+            with open(path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+        self.capacity = capacity
+        self.vectors = np.memmap(
+            path, dtype=np.float32, mode="r+", shape=(capacity, self.dim)
+        )
+
+    def _reserve(self, rows):
+        if rows <= self.capacity:
+            return
+        self.vectors.flush()
+        capacity = self.capacity
+        while capacity < rows:
+            capacity *= 2
+        self._open_vectors(capacity)
+        self.deleted = np.concatenate(
+            [self.deleted, np.ones(capacity - len(self.deleted), dtype=bool)]
+        )
+
+    def _load_ids(self):
+        ids = []
+        if os.path.exists(self._file(IDS_FILE)):
+            with open(self._file(IDS_FILE), encoding="utf-8") as f:
+                ids = f.read().splitlines()
+        if len(ids) != self.count:
+            # Lines appended by a save that didn't finish writing the metadata
+            ids = ids[: self.count]
+            with open(self._file(IDS_FILE), "w", encoding="utf-8") as f:
+                f.writelines(f"{i}\n" for i in ids)
+        self.ids = ids
+        self._saved_ids = len(ids)
+        self.deleted = np.ones(self.capacity, dtype=bool)
+        if os.path.exists(self._file(DELETED_FILE)):
+            saved = np.load(self._file(DELETED_FILE))
+            self.deleted[: self.count] = saved[: self.count]
+        self.rows = {id_: row for row, id_ in enumerate(ids) if not self.deleted[row]}
+
+    def _load_state(self, meta):
+        """Hook for subclasses to restore their own state."""
+
+    def _save_state(self, meta):
+        """Hook for subclasses to persist their own state into `meta`."""
+
+    def save(self):
+        """Flushes vectors, ids and tombstones; the metadata is written last."""
+        self.vectors.flush()
+        with open(self._file(IDS_FILE), "a", encoding="utf-8") as f:
+            f.writelines(f"{i}\n" for i in self.ids[self._saved_ids :])
+        self._saved_ids = len(self.ids)
+        _write_atomic(
+            self._file(DELETED_FILE), lambda f: np.save(f, self.deleted[: self.count])
+        )
+        meta = {
+            "kind": self.kind,
+            "dim": self.dim,
+            "metric": self.metric,
+            "count": self.count,
+        }
+        self._save_state(meta)
+        _write_atomic(
+            self._file(META_FILE), lambda f: f.write(json.dumps(meta).encode("utf-8"))
+        )
+
+    # --- Writes ---
+    def add(self, ids, vectors):
+        ids = [str(i) for i in ids]
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if len(ids) != len(vectors):
+            raise ValueError(f"{len(ids)} ids for {len(vectors)} vectors")
+        if any("\n" in i for i in ids):
+            raise ValueError("Ids can't contain newlines")
+        if self.metric == "cosine":
+            vectors = _normalise(vectors)
+        start = self.count
+        self._reserve(start + len(ids))
+        self.vectors[start : start + len(ids)] = vectors
+        self.deleted[start : start + len(ids)] = False
+        for row, id_ in enumerate(ids, start):
+            previous = self.rows.get(id_)
+            if previous is not None:
+                self.deleted[previous] = True
+            self.rows[id_] = row
+        self.ids.extend(ids)
+        self.count += len(ids)
+        self._added(start, vectors)
+
+    def _added(self, start, vectors):
+        """Hook for subclasses to index rows `start:start + len(vectors)`."""
+
+    def delete(self, ids):
+        """Tombstones `ids`; returns how many were indexed."""
+        deleted = 0
+        for id_ in ids:
+            row = self.rows.pop(str(id_), None)
+            if row is not None:
+                self.deleted[row] = True
+                deleted += 1
+        return deleted
+
+    def compact(self):
+        """Rewrites the vector file without deleted rows, then saves."""
+        live = np.flatnonzero(~self.deleted[: self.count])
+        tmp = self._file(VECTORS_FILE + ".compact")
+        capacity = max(len(live), INITIAL_CAPACITY)
+        compacted = np.memmap(
+            tmp, dtype=np.float32, mode="w+", shape=(capacity, self.dim)
+        )
+        for start in range(0, len(live), BLOCK_ROWS):
+            rows = live[start : start + BLOCK_ROWS]
+            compacted[start : start + len(rows)] = self.vectors[rows]
+        compacted.flush()
+        del compacted
+        self.vectors.flush()
+        del self.vectors
+        os.replace(tmp, self._file(VECTORS_FILE))
+        self._open_vectors(capacity)
+
+        self.ids = [self.ids[row] for row in live]
+        self.rows = {id_: row for row, id_ in enumerate(self.ids)}
+        self.count = len(live)
+        self.deleted = np.ones(self.capacity, dtype=bool)
+        self.deleted[: self.count] = False
+        self._compacted(live)
+        with open(self._file(IDS_FILE), "w", encoding="utf-8") as f:
+            f.writelines(f"{i}\n" for i in self.ids)
+        self._saved_ids = len(self.ids)
+        self.save()
+        logger.info(f"Compacted vector index {self.path} to {self.count} rows.")
+
+    def _compacted(self, live):
+        """Hook for subclasses; `live` holds the old row of each new row."""
+
+    # --- Reads ---
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, id_):
+        return str(id_) in self.rows
+
+    def get(self, id_):
+        row = self.rows.get(str(id_))
+        return None if row is None else np.array(self.vectors[row])
+
+    def _queries(self, queries):
+        queries = np.asarray(queries, dtype=np.float32)
+        single = queries.ndim == 1
+        queries = queries.reshape(-1, self.dim)
+        if self.metric == "cosine":
+            queries = _normalise(queries)
+        return queries, single
+
+    def _search_exact(self, queries, k):
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, self.count, BLOCK_ROWS):
+            end = min(start + BLOCK_ROWS, self.count)
+            scores = queries @ self.vectors[start:end].T
+            scores[:, self.deleted[start:end]] = -np.inf
+            rows = np.broadcast_to(np.arange(start, end), scores.shape)
+            scores, rows = _topk(scores, rows, k)
+            best_scores, best_rows = _topk(
+                np.concatenate([best_scores, scores], axis=1),
+                np.concatenate([best_rows, rows], axis=1),
+                k,
+            )
+        return best_scores, best_rows
+
+    def _search(self, queries, k):
+        return self._search_exact(queries, k)
+
+    def search(self, queries, k=10):
+        """
+        The `k` nearest ids to each query as [(id, score)], best first. A
+        single 1-d query returns one list, a (n, dim) batch a list per row.
+        """
+        queries, single = self._queries(queries)
+        scores, rows = self._search(queries, k)
+        results = []
+        for query_scores, query_rows in zip(scores, rows):
+            order = np.argsort(-query_scores)
+            results.append(
+                [
+                    (self.ids[query_rows[i]], float(query_scores[i]))
+                    for i in order
+                    if query_scores[i] > -np.inf
+                ]
+            )
+        return results[0] if single else results
+
+
+class IVFIndex(VectorIndex):
+    """
+    Approximate index: vectors are bucketed by their nearest of `nlist`
+    k-means centroids and a query only scores the rows in its `nprobe`
+    nearest buckets, trading recall for latency (raise `nprobe` for more
+    recall). Rows added after `train()` are assigned to the existing
+    centroids; retrain once the corpus has grown well past the training
+    set (`needs_training`). Untrained indexes search exactly.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, path, dim=None, metric="cosine", nprobe=8):
+        self.nprobe = nprobe
+        super().__init__(path, dim, metric)
+
+    def _load_state(self, meta):
+        self.trained_on = meta.get("trained_on", 0)
+        self.centroids = None
+        self.assign = np.full(self.capacity, -1, dtype=np.int32)
+        if self.trained_on and os.path.exists(self._file(CENTROIDS_FILE)):
+            self.centroids = np.load(self._file(CENTROIDS_FILE))
+            self.assign[: self.count] = np.load(self._file(ASSIGN_FILE))[: self.count]
+        self._build_lists()
+
+    def _save_state(self, meta):
+        meta["trained_on"] = self.trained_on
+        if self.centroids is not None:
+            _write_atomic(
+                self._file(CENTROIDS_FILE), lambda f: np.save(f, self.centroids)
+            )
+            _write_atomic(
+                self._file(ASSIGN_FILE), lambda f: np.save(f, self.assign[: self.count])
+            )
+
+    def _build_lists(self):
+        self.lists = None
+        if self.centroids is None:
+            return
+        assigned = self.assign[: self.count]
+        order = np.argsort(assigned, kind="stable")
+        bounds = np.searchsorted(assigned[order], np.arange(len(self.centroids) + 1))
+        self.lists = [
+            order[bounds[c] : bounds[c + 1]] for c in range(len(self.centroids))
+        ]
+
+    @property
+    def needs_training(self):
+        return self.centroids is None or len(self) > 2 * self.trained_on
+
+    def _nearest_centroid(self, vectors):
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    def train(self, nlist=None, iters=20, sample_size=None, seed=0):
+        """
+        k-means over a sample of the live rows (spherical k-means for
+        cosine), then assigns every row to its nearest centroid.
+        """
+        live = np.flatnonzero(~self.deleted[: self.count])
+        if not len(live):
+            return
+        nlist = nlist or max(1, int(np.sqrt(len(live))))
+        nlist = min(nlist, len(live))
+        rng = np.random.default_rng(seed)
+        sample_size = min(len(live), sample_size or nlist * 64)
+        sample = np.sort(rng.choice(live, sample_size, replace=False))
+        data = np.asarray(self.vectors[sample])
+        centroids = data[rng.choice(len(data), nlist, replace=False)].copy()
+        for _ in range(iters):
+            self.centroids = centroids
+            labels = self._nearest_centroid(data)
+            order = np.argsort(labels, kind="stable")
+            present, starts = np.unique(labels[order], return_index=True)
+            sums = np.zeros_like(centroids)
+            sums[present] = np.add.reduceat(data[order], starts, axis=0)
+            counts = np.bincount(labels, minlength=nlist)[:, None]
+            # Empty clusters keep their previous centroid
+            centroids = np.where(counts > 0, sums / np.maximum(counts, 1), centroids)
+            if self.metric == "cosine":
+                centroids = _normalise(centroids)
+        self.centroids = centroids.astype(np.float32)
+        for start in range(0, self.count, BLOCK_ROWS):
+            end = min(start + BLOCK_ROWS, self.count)
+            self.assign[start:end] = self._nearest_centroid(self.vectors[start:end])
+        self.trained_on = len(live)
+        self._build_lists()
+        logger.info(f"Trained {nlist} IVF lists on {sample_size} of {len(live)} rows.")
+
+    def _reserve(self, rows):
+        super()._reserve(rows)
+        if len(self.assign) < self.capacity:
+            self.assign = np.concatenate(
+                [self.assign, np.full(self.capacity - len(self.assign), -1, np.int32)]
+            )
+
+    def _added(self, start, vectors):
+        if self.centroids is None:
+            return
+        labels = self._nearest_centroid(vectors)
+        self.assign[start : start + len(vectors)] = labels
+        rows = np.arange(start, start + len(vectors))
+        for c in np.unique(labels):
+            self.lists[c] = np.concatenate([self.lists[c], rows[labels == c]])
+
+    def _compacted(self, live):
+        assign = self.assign[live]
+        self.assign = np.full(self.capacity, -1, dtype=np.int32)
+        self.assign[: self.count] = assign
+        self._build_lists()
+
+    def _search(self, queries, k):
+        if self.centroids is None:
+            return self._search_exact(queries, k)
+        nprobe = min(self.nprobe, len(self.centroids))
+        probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)
+        best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), k), dtype=np.int64)
+        for i, query in enumerate(queries):
+            rows = np.concatenate([self.lists[c] for c in probes[i, :nprobe]])
+            rows = rows[~self.deleted[rows]]
+            if not len(rows):
+                continue
+            rows.sort()  # sequential reads from the memmap
+            scores, top = _topk((self.vectors[rows] @ query)[None], rows[None], k)
+            best_scores[i, : scores.shape[1]] = scores[0]
+            best_rows[i, : top.shape[1]] = top[0]
+        return best_scores, best_rows
+
+
+def open_index(path, dim=None, metric="cosine", kind="exact", **kwargs):
+    """Opens the index under `path`, or creates a `kind` one if there is none."""
+    if os.path.exists(os.path.join(path, META_FILE)):
+        with open(os.path.join(path, META_FILE)) as f:
+            kind = json.load(f)["kind"]
+    cls = {"exact": VectorIndex, "ivf": IVFIndex}[kind]
+    return cls(path, dim, metric, **kwargs)
@@ -1,8 +1,10 @@
+import os
 import time
 from datetime import datetime, timezone
 from uuid import uuid4
 
 from pydantic import BaseModel, Field  # Import Field
+from pydantic_core import from_json, to_json
 
 
 class Datum(BaseModel):
@@ -12,7 +14,180 @@ class Datum(BaseModel):
     collector: str = ""
     source_type: str = ""
     data_json: dict = {}
+    # Transport metadata set by ingress (dedup flags...); not stored on the datum row
+    meta: dict = {}
 
 
 class Engram(BaseModel):
     placeholder: str = "engram"
+
+
+def fast_uuid4():
+    """str(uuid4()) without building a UUID object."""
+    b = bytearray(os.urandom(16))
+    b[6] = b[6] & 0x0F | 0x40
+    b[8] = b[8] & 0x3F | 0x80
+    h = b.hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+_iso_second = (None, "")
+
+
+def iso_utc(ts):
+    """
+    datetime.fromtimestamp(ts, timezone.utc).isoformat(), several times
+    faster: the formatted second is reused until the clock moves on.
+    """
+    global _iso_second
+    second = int(ts)
+    # Same rounding as datetime.fromtimestamp
+    micros = round((ts - second) * 1_000_000)
+    if micros >= 1_000_000:
+        second += 1
+        micros -= 1_000_000
+    cached_second, prefix = _iso_second
+    if second != cached_second:
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+        _iso_second = (second, prefix)
+    return f"{prefix}.{micros:06d}+00:00" if micros else f"{prefix}+00:00"
+
+
+class DatumRecord:
+    """
+    Slotted datum used on the hot path (ingress to queue to pipeline to
+    store) instead of the pydantic `Datum`. `data_json` is kept as the
+    encoded JSON bytes it arrived as and only parsed when something reads
+    it, so stores can write the original bytes without re-serialising.
+    Supports `record["field"]` / `record.get(...)` so code written against
+    datum dicts keeps working.
+    """
+
+    FIELDS = ("uuid", "unix_ts", "iso_ts", "collector", "source_type", "data_json")
+    __slots__ = (
+        "uuid",
+        "unix_ts",
+        "iso_ts",
+        "collector",
+        "source_type",
+        "meta",
+        "_data",
+        "_raw",
+    )
+
+    def __init__(
+        self,
+        uuid,
+        unix_ts,
+        iso_ts,
+        collector="",
+        source_type="",
+        data_json=None,
+        raw=None,
+        meta=None,
+    ):
+        self.uuid = uuid
+        self.unix_ts = unix_ts
+        self.iso_ts = iso_ts
+        self.collector = collector
+        self.source_type = source_type
+        self.meta = meta if meta is not None else {}
+        self._data = data_json
+        self._raw = raw
+
+    @classmethod
+    def new(cls, collector, source_type, data_json, meta=None):
+        """A fresh datum stamped with a new uuid and the current time."""
+        now = time.time()
+        return cls(
+            fast_uuid4(),
+            int(now),
+            iso_utc(now),
+            collector,
+            source_type,
+            data_json=data_json,
+            meta=meta,
+        )
+
+    @classmethod
+    def from_dict(cls, d):
+        data_json = d.get("data_json", {})
+        raw = None
+        if isinstance(data_json, (str, bytes)):
+            data_json, raw = None, data_json
+        return cls(
+            d["uuid"],
+            d["unix_ts"],
+            d["iso_ts"],
+            d.get("collector", ""),
+            d.get("source_type", ""),
+            data_json=data_json,
+            raw=raw,
+            meta=d.get("meta") or {},
+        )
+
+    @property
+    def data_json(self):
+        if self._data is None:
+            self._data = from_json(self._raw) if self._raw else {}
+        return self._data
+
+    @property
+    def data_json_raw(self):
+        """data_json as UTF-8 JSON bytes (encoded once, then cached)."""
+        if self._raw is None:
+            self._raw = to_json(self._data or {})
+        elif isinstance(self._raw, str):
+            self._raw = self._raw.encode("utf-8")
+        return self._raw
+
+    def data_json_text(self):
+        return self.data_json_raw.decode("utf-8")
+
+    def to_dict(self):
+        return {
+            **{name: self[name] for name in self.FIELDS},
+            "meta": self.meta,
+        }
+
+    def keys(self):
+        return self.FIELDS + ("meta",)
+
+    def __getitem__(self, key):
+        if key in self.FIELDS or key == "meta":
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __getstate__(self):
+        # Ship the encoded bytes only (e.g. to enrichment worker processes)
+        raw = self._raw if self._raw is not None else self.data_json_raw
+        return (
+            self.uuid,
+            self.unix_ts,
+            self.iso_ts,
+            self.collector,
+            self.source_type,
+            self.meta,
+            raw,
+        )
+
+    def __setstate__(self, state):
+        (
+            self.uuid,
+            self.unix_ts,
+            self.iso_ts,
+            self.collector,
+            self.source_type,
+            self.meta,
+            self._raw,
+        ) = state
+        self._data = None
+
+    def __repr__(self):
+        return f"DatumRecord(uuid={self.uuid!r}, collector={self.collector!r})"
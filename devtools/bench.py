@@ -0,0 +1,544 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+# Add the parent directory to the Python path to allow for absolute imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core import config
+from core.ingress.src import main as ingress
+from core.ingress.src.dedup import Deduplicator
+from core.ingress.src.limits import LimitResult
+from core.pipeline.enrichment.base import EnrichmentRunner, load_enrichers
+from core.pipeline.main import process_batch
+from core.stores import redis
+from core.stores.sqlite import SqliteClient
+from core.types.codec import decode_message, encode_datum
+
+RESULTS_PATH = "devtools/bench_results"
+
+
+# --- In-process stand-ins ---
+class FakeRedis:
+    """Thread-safe in-memory stand-in for the redis-py list commands we use."""
+
+    def __init__(self):
+        self.lists = {}
+        self.cond = threading.Condition()
+
+    def rpush(self, key, *values):
+        with self.cond:
+            self.lists.setdefault(key, deque()).extend(values)
+            self.cond.notify_all()
+            return len(self.lists[key])
+
+    def lpop(self, key, count=None):
+        with self.cond:
+            items = self.lists.get(key)
+            if not items:
+                return None
+            if count is None:
+                return items.popleft()
+            return [items.popleft() for _ in range(min(count, len(items)))]
+
+    def blpop(self, key, timeout=0):
+        deadline = time.monotonic() + timeout if timeout else None
+        with self.cond:
+            while not self.lists.get(key):
+                remaining = deadline - time.monotonic() if deadline else None
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.cond.wait(remaining)
+            return key, self.lists[key].popleft()
+
+    def llen(self, key):
+        with self.cond:
+            return len(self.lists.get(key, ()))
+
+    def delete(self, key):
+        with self.cond:
+            self.lists.pop(key, None)
+
+
+class AsyncFakeRedis:
+    """Async facade over FakeRedis for driving the ingress app in-process."""
+
+    def __init__(self, fake):
+        self.fake = fake
+
+    async def rpush(self, key, *values):
+        return self.fake.rpush(key, *values)
+
+    async def llen(self, key):
+        return self.fake.llen(key)
+
+    async def aclose(self):
+        pass
+
+
+class NullSink:
+    def insert_batch(self, datums, engrams):
+        pass
+
+
+class NullLimiter:
+    """Admits everything; the list-only fake has no Lua for the token bucket."""
+
+    async def check(self, client_id, cost=1):
+        return LimitResult(True)
+
+
+def open_queue(args):
+    if args.fake:
+        return redis.RedisConnection(FakeRedis(), "list")
+    conn = redis.connect(args.redis_host, args.redis_port, queue_backend="list")
+    if conn is None:
+        sys.exit("Could not connect to Redis.")
+    conn.conn.delete(args.queue)
+    return conn
+
+
+def open_store(args):
+    if args.store == "postgres":
+        from core.stores.postgres import PgClient
+
+        return PgClient()
+    if args.store == "sqlite":
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.sqlite_path + suffix):
+                os.remove(args.sqlite_path + suffix)
+        return SqliteClient(args.sqlite_path)
+    return NullSink()
+
+
+# --- Stats ---
+def summarize(samples_ms):
+    """p50/p95/p99/mean/max of latency samples in milliseconds."""
+    if not samples_ms:
+        return {}
+    if len(samples_ms) == 1:
+        v = round(samples_ms[0], 3)
+        return {"p50": v, "p95": v, "p99": v, "mean": v, "max": v, "n": 1}
+    q = statistics.quantiles(samples_ms, n=100, method="inclusive")
+    return {
+        "p50": round(q[49], 3),
+        "p95": round(q[94], 3),
+        "p99": round(q[98], 3),
+        "mean": round(statistics.fmean(samples_ms), 3),
+        "max": round(max(samples_ms), 3),
+        "n": len(samples_ms),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(args, results):
+    report = {
+        "mode": args.mode,
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "params": {
+            k: v for k, v in vars(args).items() if k not in ("func", "baseline")
+        },
+        "results": results,
+    }
+    out = args.out
+    if not out:
+        os.makedirs(RESULTS_PATH, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        out = f"{RESULTS_PATH}/{args.mode}-{stamp}-{report['commit'] or 'nogit'}.json"
+    with open(out, "w") as f:
+        json.dump(report, f, indent=4)
+    print(json.dumps(results, indent=4))
+    print(f"Results written to {out}")
+
+
+# --- Modes ---
+def bench_enqueue(args):
+    """Enqueue mock datums straight into the queue from N threads."""
+    conn = open_queue(args)
+    latencies = []
+    lock = threading.Lock()
+    per_thread = args.count // args.concurrency
+
+    def worker():
+        local = []
+        for _ in range(per_thread):
+            message = encode_datum(ingress.mock_collector())
+            start = time.perf_counter()
+            conn.enqueue(args.queue, [message])
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(local)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return {
+        "enqueue_latency_ms": summarize(latencies),
+        "messages": len(latencies),
+        "throughput_msg_s": round(len(latencies) / elapsed, 1),
+    }
+
+
+async def _drive_http(args, client):
+    semaphore = asyncio.Semaphore(args.concurrency)
+    headers = {"X-CLIENT-ID": args.client_id, "X-API-KEY": args.api_key}
+    latencies = []
+    statuses = {}
+
+    async def send_one():
+        datum = ingress.mock_collector()
+        payload = {
+            "collector": datum.collector,
+            "source_type": datum.source_type,
+            "data_json": datum.data_json,
+        }
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.post("/send", json=payload, headers=headers)
+                status = response.status_code
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send_one() for _ in range(args.count)))
+    elapsed = time.perf_counter() - start
+    return {
+        "request_latency_ms": summarize(latencies),
+        "statuses": statuses,
+        "throughput_msg_s": round(args.count / elapsed, 1),
+    }
+
+
+def bench_http(args):
+    """Drive the /send endpoint with bounded concurrency."""
+    import httpx
+
+    async def run():
+        if args.url:
+            async with httpx.AsyncClient(base_url=args.url, timeout=30) as client:
+                return await _drive_http(args, client)
+        # In-process: the real FastAPI app on top of the fake queue
+        config.INGRESS_CREDENTIALS[args.client_id] = args.api_key
+        ingress.redis_client = redis.AsyncRedisConnection(
+            AsyncFakeRedis(FakeRedis()), "list"
+        )
+        # Dedup and rate limits need more of Redis than the fake has
+        ingress.app.dependency_overrides[ingress.get_limiter] = NullLimiter
+        ingress.app.dependency_overrides[ingress.get_deduplicator] = (
+            lambda: Deduplicator(None, mode="off")
+        )
+        transport = httpx.ASGITransport(app=ingress.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            return await _drive_http(args, client)
+
+    return asyncio.run(run())
+
+
+def bench_pipeline(args):
+    """
+    Produce mock datums with run_mock_sender() while the pipeline batch
+    path consumes them into the store; measures capture-to-commit latency.
+    """
+    conn = open_queue(args)
+    store = open_store(args)
+    runner = EnrichmentRunner(
+        load_enrichers(args.enrichers), max_workers=args.enrichment_workers
+    )
+    consumer = redis.ListConsumer(conn, args.queue)
+    config.QUEUE_NAME = args.queue
+    sent_at = {}
+
+    producer = threading.Thread(
+        target=ingress.run_mock_sender,
+        kwargs={
+            "conn": conn,
+            "count": args.count,
+            "interval": 1 / args.rate if args.rate else 0,
+            "on_sent": lambda d: sent_at.__setitem__(d.uuid, time.perf_counter()),
+            "verbose": False,
+        },
+        daemon=True,
+    )
+    e2e = []
+    batch_ms = []
+    received = 0
+    start = time.perf_counter()
+    producer.start()
+    while received < args.count:
+        batch = consumer.read(args.batch_size, args.linger_ms, timeout=5)
+        if not batch:
+            print(f"Queue idle with {received}/{args.count} received, stopping.")
+            break
+        messages = [m for _, m in batch]
+        t0 = time.perf_counter()
+        process_batch(store, runner, messages)
+        committed = time.perf_counter()
+        batch_ms.append((committed - t0) * 1000)
+        for m in messages:
+            sent = sent_at.get(decode_message(m)["uuid"])
+            if sent is not None:
+                e2e.append((committed - sent) * 1000)
+        received += len(messages)
+    elapsed = time.perf_counter() - start
+    producer.join(timeout=1)
+    runner.close()
+    return {
+        "e2e_latency_ms": summarize(e2e),
+        "batch_commit_ms": summarize(batch_ms),
+        "messages": received,
+        "throughput_msg_s": round(received / elapsed, 1),
+    }
+
+
+def compare(args):
+    """Print the relative change of every numeric result between two runs."""
+    with open(args.baseline) as f:
+        old = json.load(f)
+    with open(args.candidate) as f:
+        new = json.load(f)
+    print(f"{old.get('commit')} -> {new.get('commit')} ({new['mode']})")
+
+    def walk(a, b, prefix=""):
+        for key, value in b.items():
+            if isinstance(value, dict):
+                walk(a.get(key, {}), value, f"{prefix}{key}.")
+            elif isinstance(value, (int, float)) and a.get(key):
+                change = (value - a[key]) / a[key] * 100
+                print(f"  {prefix}{key}: {a[key]} -> {value} ({change:+.1f}%)")
+
+    walk(old["results"], new["results"])
+
+
+def bench_codec(args):
+    """
+    Per-message CPU of the ingress (build + encode) and pipeline (decode +
+    parse for enrichers + store-ready data_json) halves of the message path,
+    for the legacy pydantic/JSON path and the DatumRecord envelope.
+    """
+    from core.types.base import Datum, DatumRecord
+
+    text = "lorem ipsum dolor sit amet " * (args.payload_bytes // 27 + 1)
+    payloads = [
+        {"form_text": text[: args.payload_bytes], "n": i, "tags": ["a", "b"]}
+        for i in range(args.count)
+    ]
+
+    def legacy_ingress(p):
+        return Datum(
+            collector="bench", source_type="text", data_json=p
+        ).model_dump_json()
+
+    def legacy_pipeline(m):
+        d = json.loads(m)
+        return d["data_json"], json.dumps(d["data_json"])
+
+    def envelope_ingress(p):
+        return encode_datum(DatumRecord.new("bench", "text", p))
+
+    def envelope_pipeline(m):
+        r = decode_message(m)
+        return r.data_json, r.data_json_text()
+
+    results = {}
+    for name, ingress_fn, pipeline_fn in (
+        ("json", legacy_ingress, legacy_pipeline),
+        ("envelope", envelope_ingress, envelope_pipeline),
+    ):
+        start = time.process_time()
+        messages = [ingress_fn(p) for p in payloads]
+        ingress_s = time.process_time() - start
+        start = time.process_time()
+        for m in messages:
+            pipeline_fn(m)
+        pipeline_s = time.process_time() - start
+        results[name] = {
+            "ingress_us_per_msg": round(ingress_s / args.count * 1e6, 2),
+            "pipeline_us_per_msg": round(pipeline_s / args.count * 1e6, 2),
+            "message_bytes": round(statistics.fmean(len(m) for m in messages), 1),
+        }
+    return results
+
+
+def bench_vectors(args):
+    """
+    Recall@k and per-query latency of the IVF index against the exact
+    memmap baseline on clustered synthetic embeddings, at each --nprobe.
+    """
+    import shutil
+
+    import numpy as np
+
+    from core.stores.vectors import IVFIndex, VectorIndex
+
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((args.clusters, args.dim)).astype(np.float32)
+
+    def sample(n):
+        # Overlapping clusters, so neighbours straddle IVF buckets as in real embeddings
+        points = centers[rng.integers(0, args.clusters, n)] * args.spread
+        return points + rng.standard_normal((n, args.dim)).astype(np.float32)
+
+    vectors = sample(args.count)
+    queries = sample(args.queries)
+    ids = [str(i) for i in range(args.count)]
+
+    def timed_queries(index):
+        latencies, found = [], []
+        for q in queries:
+            start = time.perf_counter()
+            hits = index.search(q, k=args.k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found.append({h[0] for h in hits})
+        return latencies, found
+
+    shutil.rmtree(args.path, ignore_errors=True)
+    exact = VectorIndex(f"{args.path}/exact", args.dim)
+    start = time.perf_counter()
+    for i in range(0, args.count, 10000):
+        exact.add(ids[i : i + 10000], vectors[i : i + 10000])
+    exact.save()
+    add_s = time.perf_counter() - start
+    latencies, truth = timed_queries(exact)
+    start = time.perf_counter()
+    exact.search(queries, k=args.k)
+    batch_ms = (time.perf_counter() - start) * 1000
+    results = {
+        "exact": {
+            "add_s": round(add_s, 3),
+            "latency_ms": summarize(latencies),
+            "batch_ms_per_query": round(batch_ms / args.queries, 3),
+        }
+    }
+
+    ivf = IVFIndex(f"{args.path}/ivf", args.dim)
+    ivf.add(ids, vectors)
+    start = time.perf_counter()
+    ivf.train(nlist=args.nlist or None)
+    results["ivf_train_s"] = round(time.perf_counter() - start, 3)
+    for nprobe in args.nprobe:
+        ivf.nprobe = nprobe
+        latencies, found = timed_queries(ivf)
+        recall = statistics.fmean(len(f & t) / len(t) for f, t in zip(found, truth))
+        results[f"ivf_nprobe_{nprobe}"] = {
+            "recall_at_k": round(recall, 4),
+            "latency_ms": summarize(latencies),
+        }
+    shutil.rmtree(args.path, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Throughput and latency benchmarks for ingress -> queue -> pipeline -> store."
+    )
+    sub = parser.add_subparsers(dest="mode", required=True)
+
+    def common(p):
+        p.add_argument("--count", type=int, default=10000)
+        p.add_argument("--concurrency", type=int, default=8)
+        p.add_argument("--queue", type=str, default="bench-inbox")
+        p.add_argument(
+            "--fake", action="store_true", help="Use an in-process fake Redis."
+        )
+        p.add_argument("--redis-host", type=str, default="localhost")
+        p.add_argument("--redis-port", type=int, default=config.REDIS_PORT)
+        p.add_argument("--out", type=str, help="Where to write the JSON results.")
+
+    p = sub.add_parser("enqueue", help="Raw enqueue latency into the queue.")
+    common(p)
+    p.set_defaults(func=bench_enqueue)
+
+    p = sub.add_parser("http", help="Drive /send over HTTP.")
+    common(p)
+    p.add_argument(
+        "--url",
+        type=str,
+        help="Ingress base URL; omit to run the app in-process on a fake queue.",
+    )
+    p.add_argument("--client-id", type=str, default=os.getenv("CLIENT_ID", "bench"))
+    p.add_argument("--api-key", type=str, default=os.getenv("CLIENT_API_KEY", "bench"))
+    p.set_defaults(func=bench_http)
+
+    p = sub.add_parser("pipeline", help="Capture-to-commit through the pipeline.")
+    common(p)
+    p.add_argument("--store", choices=["postgres", "sqlite", "null"], default="sqlite")
+    p.add_argument("--sqlite-path", type=str, default="/tmp/relic-bench.db")
+    p.add_argument("--batch-size", type=int, default=config.PIPELINE_BATCH_SIZE)
+    p.add_argument("--linger-ms", type=int, default=config.PIPELINE_LINGER_MS)
+    p.add_argument(
+        "--rate", type=float, default=0, help="Producer msgs/s (0 = unthrottled)."
+    )
+    p.add_argument(
+        "--enrichers", type=lambda s: s.split(","), default=config.PIPELINE_ENRICHERS
+    )
+    p.add_argument("--enrichment-workers", type=int, default=0)
+    p.set_defaults(func=bench_pipeline)
+
+    p = sub.add_parser("codec", help="Per-message encode/decode CPU.")
+    p.add_argument("--count", type=int, default=20000)
+    p.add_argument("--payload-bytes", type=int, default=1024)
+    p.add_argument("--out", type=str, help="Where to write the JSON results.")
+    p.set_defaults(func=bench_codec)
+
+    p = sub.add_parser("vectors", help="Vector index recall vs latency.")
+    p.add_argument("--count", type=int, default=100000)
+    p.add_argument("--dim", type=int, default=384)
+    p.add_argument("--queries", type=int, default=200)
+    p.add_argument("--k", type=int, default=10)
+    p.add_argument("--clusters", type=int, default=200)
+    p.add_argument(
+        "--spread", type=float, default=0.4, help="Cluster centre scale vs noise."
+    )
+    p.add_argument("--nlist", type=int, default=0, help="0 = sqrt(count).")
+    p.add_argument(
+        "--nprobe",
+        type=lambda s: [int(n) for n in s.split(",")],
+        default=[1, 4, 8, 16, 32],
+    )
+    p.add_argument("--path", type=str, default="/tmp/relic-bench-vectors")
+    p.add_argument("--out", type=str, help="Where to write the JSON results.")
+    p.set_defaults(func=bench_vectors)
+
+    p = sub.add_parser("compare", help="Compare two result files.")
+    p.add_argument("baseline", type=str)
+    p.add_argument("candidate", type=str)
+    p.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    if args.mode == "compare":
+        compare(args)
+    else:
+        write_results(args, args.func(args))
+
+
+if __name__ == "__main__":
+    main()
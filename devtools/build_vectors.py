@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core import config
+from core.services.rag.models import EMBEDDERS, load_plugin, record_text
+from core.stores.postgres import PgClient
+from core.stores.vectors import META_FILE, IVFIndex, open_index
+
+FETCH_SIZE = 2000
+
+
+async def embed_rows(pg_client, index, embedder, ts_start, ts_end, batch_size):
+    """Embeds datums in the range that aren't indexed yet, `batch_size` at a time."""
+    added = 0
+    batch = []
+
+    async def flush():
+        nonlocal added
+        vectors = await embedder.embed([text for _, text in batch])
+        index.add([uuid for uuid, _ in batch], vectors)
+        added += len(batch)
+        batch.clear()
+
+    for row in pg_client.stream_records(ts_start, ts_end, itersize=FETCH_SIZE):
+        if row[0] in index:
+            continue
+        text = record_text(json.loads(row[5]))
+        if text:
+            batch.append((row[0], text))
+        if len(batch) >= batch_size:
+            await flush()
+    if batch:
+        await flush()
+    return added
+
+
+def main(args):
+    embedder = load_plugin(args.embedder, EMBEDDERS)
+    if embedder is None:
+        raise SystemExit("Set --embedder (or RAG_EMBEDDER) to build the index.")
+    pg_client = PgClient(minconn=1, maxconn=1)
+    if pg_client.pool is None:
+        raise RuntimeError("Could not connect to Postgres")
+    start = time.perf_counter()
+    try:
+        if os.path.exists(os.path.join(args.path, META_FILE)):
+            index = open_index(args.path)
+        else:
+            # A new index takes its dimension from the embedder
+            [probe] = asyncio.run(embedder.embed(["dimension probe"]))
+            index = open_index(args.path, dim=len(probe), kind=args.kind)
+        added = asyncio.run(
+            embed_rows(
+                pg_client, index, embedder, args.start, args.end, args.batch_size
+            )
+        )
+        if isinstance(index, IVFIndex) and index.needs_training:
+            index.train()
+        index.save()
+    finally:
+        pg_client.close()
+    print(
+        f"Added {added} vectors to {args.path} ({len(index)} total, "
+        f"{time.perf_counter() - start:.1f}s)."
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Embed datums into the local vector index used by the RAG service."
+    )
+    parser.add_argument("--path", type=str, default=config.VECTOR_INDEX_PATH)
+    parser.add_argument(
+        "--kind", choices=("exact", "ivf"), default="ivf", help="For a new index."
+    )
+    parser.add_argument("--embedder", type=str, default=config.RAG_EMBEDDER)
+    parser.add_argument("--start", type=int, default=0)
+    parser.add_argument("--end", type=int, default=int(time.time()))
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,81 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core import config
+from core.auth import list_clients, register_client, revoke_client
+from core.stores.redis import connect as redis_connect
+
+MIN_KEY_LENGTH = 24
+
+
+def main(args):
+    redis_client = redis_connect(config.REDIS_HOST, config.REDIS_PORT)
+    if not redis_client:
+        raise SystemExit(1)
+    conn = redis_client.conn
+
+    if args.command == "list":
+        clients = list_clients(conn)
+        for client_id, record in sorted(clients.items()):
+            rotated = record.get("rotated_at")
+            print(
+                f"{client_id}  {record.get('label', '')!r}  created {record['created_at']}"
+                + (f"  rotated {rotated}" if rotated else "")
+            )
+        bootstrap = ", ".join(config.INGRESS_CREDENTIALS) or "none"
+        print(f"{len(clients)} registered clients (bootstrap from env: {bootstrap}).")
+        return
+
+    if not args.client_id:
+        raise SystemExit(f"{args.command} needs a client id.")
+    exists = args.client_id in list_clients(conn)
+
+    if args.command == "revoke":
+        if revoke_client(conn, args.client_id):
+            print(f"Revoked {args.client_id}.")
+        else:
+            raise SystemExit(f"No registered client {args.client_id!r}.")
+        return
+
+    if args.command == "add" and exists:
+        raise SystemExit(f"{args.client_id!r} is already registered; use rotate.")
+    if args.command == "rotate" and not exists:
+        raise SystemExit(f"No registered client {args.client_id!r}.")
+    if args.key and len(args.key) < MIN_KEY_LENGTH:
+        # Stored with a fast hash, so a key has to be unguessable on its own
+        raise SystemExit(f"--key must be at least {MIN_KEY_LENGTH} characters.")
+    api_key = register_client(conn, args.client_id, args.label, args.key)
+    print(f"{'Registered' if args.command == 'add' else 'Rotated'} {args.client_id}.")
+    print(f"{'X-CLIENT-ID':<12} {args.client_id}")
+    print(f"{'X-API-KEY':<12} {api_key}")
+    print("The key is stored hashed and can't be shown again.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Register, rotate and revoke ingress clients (one per device or collector)."
+    )
+    parser.add_argument(
+        "command",
+        choices=("list", "add", "rotate", "revoke"),
+        help="list clients, register one, give one a new key, or remove one",
+    )
+    parser.add_argument("client_id", nargs="?")
+    parser.add_argument(
+        "--label", type=str, default="", help="What the client is, e.g. 'Pixel 8'."
+    )
+    parser.add_argument(
+        "--key", type=str, help="Use this API key instead of generating one."
+    )
+    parser.add_argument(
+        "--network",
+        type=str,
+        help="Network configuration (e.g., 'localhost' for local Redis)",
+    )
+    args = parser.parse_args()
+    if args.network == "localhost":
+        config.REDIS_HOST = "localhost"
+    main(args)
@@ -1,74 +1,156 @@
+import argparse
 import json
 import os
 import sqlite3
+import sys
+import time
 from datetime import datetime
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.stores.replay import open_replay_writer, replay_suffix
+
 # Assuming the SQLite database is located at core/stores/data/relic.db
 DATABASE_PATH = "core/stores/data/relic.db"
 SAVE_REPLAY_PATH = "devtools/replays"
+FETCH_SIZE = 2000
+COLUMNS = ("uuid", "unix_ts", "iso_ts", "collector", "source_type")
+
+
+def iter_sqlite_rows(ts_start, ts_end, table="datum", collector=None, source_type=None):
+    """Same row shape as PgClient.stream_records, read in FETCH_SIZE chunks."""
+    if table not in ("datum", "engram"):
+        raise ValueError(f"Unknown table: {table}")
+    sql = f"SELECT uuid, unix_ts, iso_ts, collector, source_type, data_json FROM {table} WHERE unix_ts BETWEEN ? AND ?"
+    params = [ts_start, ts_end]
+    if collector:
+        sql += " AND collector = ?"
+        params.append(collector)
+    if source_type:
+        sql += " AND source_type = ?"
+        params.append(source_type)
+    sql += " ORDER BY unix_ts"
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        cursor = conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+
+def iter_postgres_rows(
+    ts_start, ts_end, table="datum", collector=None, source_type=None
+):
+    from core.stores.postgres import PgClient
+
+    pg_client = PgClient(minconn=1, maxconn=1)
+    if pg_client.pool is None:
+        raise RuntimeError("Could not connect to Postgres")
+    try:
+        yield from pg_client.stream_records(
+            ts_start,
+            ts_end,
+            table=table,
+            collector=collector,
+            source_type=source_type,
+            itersize=FETCH_SIZE,
+        )
+    finally:
+        pg_client.close()
 
 
-def generate_replay_file(ts_start: int, ts_end: int):
+def to_line(row, full=False):
     """
-    Reads all rows from the sqlite `datum` table within a given timestamp range
-    and saves the `data_json` column into a list of JSON dicts.
-    The file is saved as YYYYMMDD_HHMMSS_runtime.json.
+    One NDJSON line per row. data_json is spliced in as stored, so records
+    are never decoded and re-encoded on the way out.
+    """
+    data_json = row[5]
+    if isinstance(data_json, bytes):
+        data_json = data_json.decode("utf-8")
+    if not full:
+        return data_json.encode("utf-8") + b"\n"
+    meta = ",".join(
+        f'"{name}":{json.dumps(value)}' for name, value in zip(COLUMNS, row[:5])
+    )
+    return f'{{{meta},"data_json":{data_json}}}\n'.encode("utf-8")
+
+
+def generate_replay_file(
+    ts_start: int,
+    ts_end: int,
+    backend="sqlite",
+    table="datum",
+    collector=None,
+    source_type=None,
+    compression="gzip",
+    full=False,
+):
+    """
+    Streams rows of the `datum` (or `engram`) table within a timestamp range
+    into a compressed NDJSON replay, one `data_json` object per line (or the
+    whole row with `full`). Memory use is bounded by FETCH_SIZE regardless of
+    the size of the range. The file is saved as YYYYMMDD-HHMMSS.ndjson[.gz|.zst].
 
     Args:
         ts_start (int): The start timestamp (inclusive) for filtering data.
         ts_end (int): The end timestamp (inclusive) for filtering data.
     """
-    data_list = []
-    conn = None
-    try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
+    iter_rows = iter_postgres_rows if backend == "postgres" else iter_sqlite_rows
+    current_time = datetime.now().strftime("%Y%m%d-%H%M%S")
+    filename = f"{current_time}{replay_suffix(compression)}"
+    path = f"{SAVE_REPLAY_PATH}/{filename}"
+    os.makedirs(SAVE_REPLAY_PATH, exist_ok=True)
 
-        # Query for data_json where timestamp is between ts_start and ts_end
-        cursor.execute(
-            "SELECT data_json FROM datum WHERE unix_ts BETWEEN ? AND ?",
-            (ts_start, ts_end),
-        )
-        rows = cursor.fetchall()
-
-        for row in rows:
-            try:
-                # Parse the JSON string from data_json column
-                json_data = json.loads(row[0])
-                data_list.append(json_data)
-            except json.JSONDecodeError as e:
-                print(f"Error decoding JSON from database: {e} in row: {row[0]}")
-                continue
-
-        # Generate filename with current timestamp
-        current_time = datetime.now().strftime("%Y%m%d-%H%M%S")
-        filename = f"{current_time}.json"
-
-        # Save the list of JSON dicts to the file
-        with open(f"{SAVE_REPLAY_PATH}/{filename}", "w") as f:
-            json.dump(data_list, f, indent=4)
-
-        print(
-            f"Successfully generated replay file: {filename} with {len(data_list)} records."
-        )
-
-    except sqlite3.Error as e:
-        print(f"SQLite error: {e}")
+    count = 0
+    start = time.perf_counter()
+    try:
+        with open_replay_writer(path, compression) as f:
+            for row in iter_rows(ts_start, ts_end, table, collector, source_type):
+                f.write(to_line(row, full))
+                count += 1
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-    finally:
-        if conn:
-            conn.close()
+        print(f"Error generating replay: {e}")
+        if os.path.exists(path):
+            os.remove(path)
+        return None
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"Successfully generated replay file: {filename} with {count} records "
+        f"({os.path.getsize(path)} bytes, {elapsed:.2f}s)."
+    )
+    return path
 
 
 if __name__ == "__main__":
-    # Example usage:
-    # You would typically call generate_replay_file with actual start and end timestamps.
-    # For demonstration, using arbitrary timestamps.
-    # Replace with actual timestamp values for testing.
-    # For example, to get data from the last hour:
-    from time import time
-
-    end_ts = int(time())
-    start_ts = end_ts - 3600  # 1 hour ago
-    generate_replay_file(start_ts, end_ts)
+    end_ts = int(time.time())
+    parser = argparse.ArgumentParser(description="Export a replay file.")
+    parser.add_argument("--backend", choices=("sqlite", "postgres"), default="sqlite")
+    parser.add_argument("--table", choices=("datum", "engram"), default="datum")
+    parser.add_argument("--start", type=int, default=end_ts - 3600)  # 1 hour ago
+    parser.add_argument("--end", type=int, default=end_ts)
+    parser.add_argument("--collector", help="Only rows from this collector.")
+    parser.add_argument("--source-type", help="Only rows of this source type.")
+    parser.add_argument(
+        "--compression", choices=("gzip", "zstd", "none"), default="gzip"
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Write whole rows (uuid, timestamps, collector...) not just data_json.",
+    )
+    args = parser.parse_args()
+    generate_replay_file(
+        args.start,
+        args.end,
+        backend=args.backend,
+        table=args.table,
+        collector=args.collector,
+        source_type=args.source_type,
+        compression=args.compression,
+        full=args.full,
+    )
@@ -5,28 +5,45 @@ import argparse
 # Add the parent directory to the Python path to allow for absolute imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from core.stores import postgres
+from core import config
+from core.stores import postgres, sqlite
 
 
 def main():
     """Initializes the database by creating necessary tables."""
-    parser = argparse.ArgumentParser(description="Initialize the PostgreSQL database.")
+    parser = argparse.ArgumentParser(description="Initialize the record store.")
+    parser.add_argument(
+        "--backend",
+        choices=("postgres", "sqlite"),
+        default=config.STORE_BACKEND,
+        help="Store to initialize (default: STORE_BACKEND).",
+    )
     parser.add_argument(
         "--host",
         type=str,
         default="localhost",
         help="The host of the database to connect to.",
     )
+    parser.add_argument(
+        "--partitioned",
+        action="store_true",
+        default=config.POSTGRES_PARTITIONED,
+        help="Range-partition datum/engram by month (new databases only).",
+    )
     args = parser.parse_args()
 
+    if args.backend == "sqlite":
+        # The SQLite client creates its schema when it opens the file
+        sqlite.SqliteClient(config.SQLITE_PATH).close()
+        print(f"SQLite store ready at {config.SQLITE_PATH}.")
+        return
+
     print(f"Connecting to the database at {args.host}...")
-    conn = postgres.create_connection(args.host)
-    if conn:
+    pg_client = postgres.PgClient(args.host, minconn=1, maxconn=1)
+    if pg_client.pool:
         print("Connection successful. Creating tables...")
-        postgres.create_table(conn, postgres.CREATE_DATUM_TABLE)
-        postgres.create_table(conn, postgres.CREATE_ENGRAM_TABLE)
-        postgres.create_table(conn, postgres.CREATE_ERROR_TABLE)
-        conn.close()
+        pg_client.init_schema(partitioned=args.partitioned)
+        pg_client.close()
         print("Database initialization complete.")
     else:
         print("Failed to connect to the database.")
@@ -0,0 +1,110 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core import config
+from core.pipeline.retry import RetryQueue
+from core.stores.redis import connect as redis_connect
+from core.types.codec import decode_message
+
+PAGE_SIZE = 500
+
+
+def describe(entry):
+    try:
+        record = decode_message(entry["payload"])
+        what = f"{record.uuid[:8]} {record.collector}/{record.source_type}"
+    except Exception:
+        what = "<undecodable>"
+    error = (entry["error"] or "").strip().splitlines()
+    return (
+        f"{entry['id']}  {entry['failed_at']}  {what}  "
+        f"attempts={entry['attempts']}  {error[-1] if error else ''}"
+    )
+
+
+def matching(retries, args):
+    """Dead letters in order, filtered by --id/--grep, up to --limit."""
+    found = 0
+    start = "-"
+    while args.limit is None or found < args.limit:
+        page = retries.dead_letters(count=PAGE_SIZE, start=start)
+        for entry in page:
+            if args.id and entry["id"] not in args.id:
+                continue
+            if args.grep and args.grep not in (entry["error"] or ""):
+                continue
+            yield entry
+            found += 1
+            if args.limit is not None and found >= args.limit:
+                return
+        if len(page) < PAGE_SIZE:
+            return
+        # Exclusive start after the last entry of this page
+        start = "(" + page[-1]["id"]
+
+
+def main(args):
+    redis_client = redis_connect(
+        config.REDIS_HOST, config.REDIS_PORT, queue_backend=config.QUEUE_BACKEND
+    )
+    if not redis_client:
+        raise SystemExit(1)
+    retries = RetryQueue(redis_client, args.queue)
+
+    if args.command == "list":
+        for entry in matching(retries, args):
+            print(describe(entry))
+        print(
+            f"{retries.dead_count()} dead-lettered, "
+            f"{retries.pending()} waiting for a retry."
+        )
+        return
+
+    entries = list(matching(retries, args))
+    if args.dry_run:
+        for entry in entries:
+            print(describe(entry))
+        print(f"Would {args.command} {len(entries)} messages.")
+        return
+    total = 0
+    for i in range(0, len(entries), PAGE_SIZE):
+        chunk = entries[i : i + PAGE_SIZE]
+        if args.command == "redrive":
+            total += retries.redrive(chunk)
+        else:
+            retries.discard(chunk)
+            total += len(chunk)
+    done = "Re-enqueued" if args.command == "redrive" else "Discarded"
+    print(f"{done} {total} messages ({retries.dead_count()} left in the DLQ).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Inspect the pipeline's dead-letter queue and push messages back."
+    )
+    parser.add_argument(
+        "command",
+        choices=("list", "redrive", "discard"),
+        help="list dead letters, re-enqueue them on the hub queue, or delete them",
+    )
+    parser.add_argument("--queue", type=str, default=config.QUEUE_NAME)
+    parser.add_argument(
+        "--id", action="append", help="Only this DLQ entry id (repeatable)."
+    )
+    parser.add_argument(
+        "--grep", type=str, help="Only entries whose error contains this text."
+    )
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument(
+        "--network",
+        type=str,
+        help="Network configuration (e.g., 'localhost' for local Redis)",
+    )
+    args = parser.parse_args()
+    if args.network == "localhost":
+        config.REDIS_HOST = "localhost"
+    main(args)